@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+On-disk cache for conversation recordings
+
+Recordings never change once a call has ended, so each one is downloaded from
+ElevenLabs once and then served from local disk. Files are content-addressed
+(stored under the SHA-256 of their bytes) and indexed by conversation ID. Writes
+go to a temporary file that is renamed into place only once complete, and the
+least recently used recordings are evicted when the cache grows past its byte
+budget. Streamed writes do their disk I/O in worker threads, so the index is
+guarded by a lock.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import AsyncGenerator, AsyncIterator, BinaryIO, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIO_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'audio')
+DEFAULT_AUDIO_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+INDEX_FILENAME = 'index.json'
+
+class AudioCacheEntry:
+    __slots__ = ('conversation_id', 'content_hash', 'size_bytes', 'content_type', 'last_access', 'path')
+
+    def __init__(self, conversation_id: str, content_hash: str, size_bytes: int, content_type: str, last_access: float, path: str):
+        self.conversation_id = conversation_id
+        self.content_hash = content_hash
+        self.size_bytes = size_bytes
+        self.content_type = content_type
+        self.last_access = last_access
+        self.path = path
+
+    @property
+    def filename(self) -> str:
+        content_type = self.content_type
+        return f"conversation_{self.conversation_id}.{content_type.split('/')[-1] if '/' in content_type else 'audio'}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'conversation_id': self.conversation_id,
+            'content_hash': self.content_hash,
+            'size_bytes': self.size_bytes,
+            'content_type': self.content_type,
+            'last_access': self.last_access
+        }
+
+class AudioCacheWriter:
+    """
+    Streams one recording into a temporary file, hashing it on the way
+
+    The temporary file is only created by the first write, so opening a writer
+    does no disk I/O and can happen on the event loop.
+    """
+
+    def __init__(self, cache: "AudioCache", conversation_id: str, content_type: str):
+        self.cache = cache
+        self.conversation_id = conversation_id
+        self.content_type = content_type
+        self.size_bytes = 0
+        self._hash = hashlib.sha256()
+        self.temp_path: Optional[str] = None
+        self._file: Optional[BinaryIO] = None
+        self._closed = False
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            fd, self.temp_path = tempfile.mkstemp(dir=self.cache.tmp_dir, suffix='.part')
+            self._file = os.fdopen(fd, 'wb')
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size_bytes += len(chunk)
+
+    def commit(self) -> Optional[AudioCacheEntry]:
+        """Move the finished file into the cache; returns its entry (None if it was not kept)"""
+        if self._closed:
+            return None
+        self._closed = True
+        if self._file is None:
+            # Nothing was written; empty recordings are not kept
+            self.cache._abort(self.conversation_id, None)
+            return None
+        self._file.close()
+        return self.cache._commit(self.conversation_id, self.content_type, self.temp_path, self._hash.hexdigest(), self.size_bytes)
+
+    def abort(self) -> None:
+        """Discard the partial file"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._file is not None:
+            self._file.close()
+        self.cache._abort(self.conversation_id, self.temp_path)
+
+class AudioCacheTee:
+    """
+    Relays a recording's chunks unchanged while writing them to the cache
+
+    The writer is opened as soon as the tee is created, so the recording counts as
+    being filled (is_filling) before the first byte arrives. All disk work runs in
+    worker threads: the first chunk write creates the temporary file, and the
+    final commit renames it into place. The recording is only kept if the stream
+    ran to completion (and matched expected_size when given); a client that
+    disconnects part way leaves nothing behind. Cache write failures never
+    interrupt the stream itself.
+    """
+
+    def __init__(
+        self,
+        cache: "AudioCache",
+        conversation_id: str,
+        content_type: str,
+        chunks: AsyncIterator[bytes],
+        expected_size: Optional[int] = None
+    ):
+        self.conversation_id = conversation_id
+        self.expected_size = expected_size
+        self._chunks = chunks
+        self._relay: Optional[AsyncGenerator[bytes, None]] = None
+        self._writer: Optional[AudioCacheWriter] = cache.open_writer(conversation_id, content_type)
+
+    def __aiter__(self) -> AsyncGenerator[bytes, None]:
+        # One underlying stream, so a partly read tee can be drained later
+        if self._relay is None:
+            self._relay = self._relay_chunks()
+        return self._relay
+
+    async def _relay_chunks(self) -> AsyncGenerator[bytes, None]:
+        completed = False
+        try:
+            async for chunk in self._chunks:
+                if self._writer is not None:
+                    try:
+                        await asyncio.to_thread(self._writer.write, chunk)
+                    except OSError as e:
+                        logger.warning(f"Stopped caching audio for {self.conversation_id}: {e}")
+                        await self._finish(False)
+                yield chunk
+            completed = True
+        finally:
+            await self._finish(completed)
+
+    async def _finish(self, completed: bool) -> None:
+        writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        if completed and (self.expected_size is None or writer.size_bytes == self.expected_size):
+            await asyncio.to_thread(writer.commit)
+        else:
+            await asyncio.to_thread(writer.abort)
+
+    async def drain(self) -> None:
+        """Read the rest of the stream into the cache without relaying it anywhere"""
+        async for _ in self:
+            pass
+
+    async def aclose(self) -> None:
+        """Stop relaying; a recording not yet written in full is discarded"""
+        if self._relay is not None:
+            await self._relay.aclose()
+        await self._finish(False)
+
+class AudioCache:
+    """Size-bounded, content-addressed LRU cache of recordings on local disk"""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.getenv('AUDIO_CACHE_DIR') or DEFAULT_AUDIO_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('AUDIO_CACHE_MAX_BYTES', str(DEFAULT_AUDIO_CACHE_MAX_BYTES)))
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        self.index_path = os.path.join(self.root, INDEX_FILENAME)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        # Least recently used first
+        self._entries: "OrderedDict[str, AudioCacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._filling: Set[str] = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash)
+
+    def _load_index(self) -> None:
+        """Read the persisted index, dropping entries whose file is missing or truncated"""
+        for name in os.listdir(self.tmp_dir):
+            # Leftovers from writes interrupted by a restart
+            try:
+                os.remove(os.path.join(self.tmp_dir, name))
+            except OSError:
+                pass
+
+        try:
+            with open(self.index_path, 'r') as f:
+                records = json.load(f).get('entries', [])
+        except FileNotFoundError:
+            records = []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable audio cache index {self.index_path}: {e}")
+            records = []
+
+        for record in records:
+            try:
+                entry = AudioCacheEntry(
+                    record['conversation_id'],
+                    record['content_hash'],
+                    int(record['size_bytes']),
+                    record.get('content_type') or 'audio/mpeg',
+                    float(record.get('last_access', 0)),
+                    self._object_path(record['content_hash'])
+                )
+                if os.path.getsize(entry.path) != entry.size_bytes:
+                    continue
+            except (KeyError, TypeError, ValueError, OSError):
+                continue
+            self._entries[entry.conversation_id] = entry
+            self._bytes += entry.size_bytes
+
+        # Files renamed into place just before a crash never made it into the index
+        referenced = {entry.content_hash for entry in self._entries.values()}
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(prefix_dir) if os.path.isdir(prefix_dir) else []:
+                if name not in referenced:
+                    try:
+                        os.remove(os.path.join(prefix_dir, name))
+                    except OSError:
+                        pass
+        self._evict()
+
+    def _save_index(self) -> None:
+        """Write the index atomically (temporary file + rename)"""
+        # Saves run one at a time so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                payload = {'entries': [entry.to_dict() for entry in self._entries.values()]}
+                self._dirty = False
+            fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.json.part')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(payload, f)
+                os.replace(temp_path, self.index_path)
+            except OSError as e:
+                logger.warning(f"Could not save audio cache index: {e}")
+                self._dirty = True
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def flush(self) -> None:
+        """Persist access order changes made since the last write"""
+        if self._dirty:
+            self._save_index()
+
+    def peek(self, conversation_id: str) -> Optional[AudioCacheEntry]:
+        """Entry for conversation_id without touching LRU order or counters"""
+        with self._lock:
+            return self._entries.get(conversation_id)
+
+    def get(self, conversation_id: str) -> Optional[AudioCacheEntry]:
+        """
+        Entry for conversation_id if its file is still on disk, marking it recently used
+
+        Checks the file system, so call it from a worker thread in async code.
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None and not os.path.exists(entry.path):
+                self._remove(conversation_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.last_access = time.time()
+            self._entries.move_to_end(conversation_id)
+            self._dirty = True
+            return entry
+
+    def is_filling(self, conversation_id: str) -> bool:
+        """Whether a write for conversation_id is already in progress"""
+        return conversation_id in self._filling
+
+    def open_writer(self, conversation_id: str, content_type: str) -> AudioCacheWriter:
+        """Writer for one recording; marks it as filling until committed or aborted"""
+        with self._lock:
+            self._filling.add(conversation_id)
+        return AudioCacheWriter(self, conversation_id, content_type)
+
+    def put(self, conversation_id: str, content_type: str, data: bytes) -> Optional[AudioCacheEntry]:
+        """Cache a recording that is already in memory"""
+        writer = self.open_writer(conversation_id, content_type)
+        try:
+            writer.write(data)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def tee(
+        self,
+        conversation_id: str,
+        content_type: str,
+        chunks: AsyncIterator[bytes],
+        expected_size: Optional[int] = None
+    ) -> AudioCacheTee:
+        """Relay chunks unchanged while writing them to the cache (see AudioCacheTee)"""
+        return AudioCacheTee(self, conversation_id, content_type, chunks, expected_size)
+
+    async def fill(
+        self,
+        conversation_id: str,
+        content_type: str,
+        chunks: AsyncIterator[bytes],
+        expected_size: Optional[int] = None
+    ) -> Optional[AudioCacheEntry]:
+        """Write a whole stream to the cache; returns the new entry if it was kept"""
+        tee = self.tee(conversation_id, content_type, chunks, expected_size)
+        try:
+            await tee.drain()
+        finally:
+            await tee.aclose()
+        return self.peek(conversation_id)
+
+    def _commit(self, conversation_id: str, content_type: str, temp_path: str, content_hash: str, size_bytes: int) -> Optional[AudioCacheEntry]:
+        with self._lock:
+            self._filling.discard(conversation_id)
+            if size_bytes == 0 or size_bytes > self.max_bytes:
+                os.remove(temp_path)
+                return None
+
+            path = self._object_path(content_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                # Same bytes already stored (e.g. by an earlier write for this conversation)
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, path)
+
+            previous = self._entries.pop(conversation_id, None)
+            if previous is not None:
+                self._bytes -= previous.size_bytes
+            entry = AudioCacheEntry(conversation_id, content_hash, size_bytes, content_type, time.time(), path)
+            self._entries[conversation_id] = entry
+            self._bytes += size_bytes
+            if previous is not None:
+                self._release_file(previous)
+            self.writes += 1
+            self._evict()
+        self._save_index()
+        logger.info(f"Cached audio for {conversation_id} ({size_bytes} bytes, sha256 {content_hash[:12]})")
+        return entry
+
+    def _abort(self, conversation_id: str, temp_path: Optional[str]) -> None:
+        with self._lock:
+            self._filling.discard(conversation_id)
+        if temp_path is None:
+            return
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def _remove(self, conversation_id: str) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size_bytes
+        self._dirty = True
+        self._release_file(entry)
+
+    def _release_file(self, entry: AudioCacheEntry) -> None:
+        # Identical recordings share one file, which is only deleted with its last reference
+        if any(other.content_hash == entry.content_hash for other in self._entries.values()):
+            return
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Drop least recently used recordings until the cache fits its byte budget"""
+        while self._entries and self._bytes > self.max_bytes:
+            conversation_id = next(iter(self._entries))
+            self._remove(conversation_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'filling': len(self._filling),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
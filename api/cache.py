@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+In-process TTL + LRU cache with stale-while-revalidate
+
+Entries are evicted least-recently-used first once either the entry count or the
+estimated byte size exceeds its limit. Each entry carries its own TTL; after it
+expires the stale value is still served for a grace period while a background
+task refreshes it.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory cost of a cached value in bytes (its JSON length)"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at', 'stale_until')
+
+    def __init__(self, value: Any, size: int, expires_at: float, stale_until: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTLs and stale-while-revalidate loading"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        stale_while_revalidate_secs: float = 60.0
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_while_revalidate_secs = stale_while_revalidate_secs
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._refreshing: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Value for key if present and not past its stale window, without touching LRU order or counters"""
+        entry = self._entries.get(key)
+        if entry is None or entry.stale_until <= time.monotonic():
+            return None
+        return entry.value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Value for key if it has not expired, marking it recently used; counts a hit or miss"""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl_secs: float) -> None:
+        """Store value for ttl_secs (plus the stale-while-revalidate window)"""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            self.delete(key)
+            return
+        now = time.monotonic()
+        self.delete(key)
+        self._entries[key] = CacheEntry(value, size, now + ttl_secs, now + ttl_secs + self.stale_while_revalidate_secs)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_for: Callable[[Any], float]
+    ) -> Any:
+        """
+        Return the cached value for key, loading it on a miss
+
+        A fresh entry is returned as is. An expired entry inside its stale window is
+        returned immediately while one background task reloads it. Anything else is
+        loaded inline. None results are never cached so failures are retried.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function producing the value
+            ttl_for: Returns the TTL in seconds for a loaded value
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.stale_until > now:
+            self._entries.move_to_end(key)
+            if entry.expires_at > now:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh_in_background(key, loader, ttl_for)
+            return entry.value
+
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            self.set(key, value, ttl_for(value))
+        return value
+
+    def _refresh_in_background(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_for: Callable[[Any], float]
+    ) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh() -> None:
+            try:
+                value = await loader()
+                if value is not None:
+                    self.set(key, value, ttl_for(value))
+                    self.refreshes += 1
+            except Exception as e:
+                logger.warning(f"Background refresh failed for cache key {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'refreshes': self.refreshes,
+            'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Columnar snapshot of conversations for dashboard analytics
+
+Holds one NumPy array per field (start time, duration, message count, success
+flag), sorted by start time, and dictionary-encodes the categorical fields
+(agent, status, direction, location) as integer codes into a list of distinct
+values. Time windows are slices found by binary search, group-bys are
+np.bincount over the codes, and histograms and percentiles count integer values,
+so a full dashboard over a million calls is a few dozen vectorized passes
+instead of a Python loop over conversation dicts.
+
+The snapshot is rebuilt from the store when conversations have changed and it
+is older than ANALYTICS_SNAPSHOT_MAX_AGE seconds.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Dictionary-encoded fields: snapshot name -> conversations column
+CATEGORICAL_COLUMNS = {
+    'agent': 'agent_name',
+    'status': 'status',
+    'direction': 'direction',
+    'location': 'location',
+}
+
+# Label for rows with no value in a categorical column
+UNKNOWN_KEY = 'unknown'
+
+# Upper edges (seconds) of the call duration histogram bins; the last bin is open-ended
+DURATION_BIN_EDGES = (30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+# Upper bound on volume buckets returned for one dashboard
+MAX_VOLUME_BUCKETS = 2000
+
+PERCENTILES = (50, 95, 99)
+
+# Integer columns whose values all lie in [0, this] are summarized by counting each value
+MAX_COUNTED_VALUE = 1_000_000
+
+class _Codes(dict):
+    """Value -> dictionary code, assigning the next code to values not seen before"""
+
+    def __missing__(self, value) -> int:
+        code = self[value] = len(self)
+        return code
+
+class ColumnarSnapshot:
+    """Conversations as parallel NumPy arrays, ordered by start time"""
+
+    def __init__(
+        self,
+        start_time: np.ndarray,
+        duration: np.ndarray,
+        messages: np.ndarray,
+        successful: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        categories: Dict[str, List[str]],
+        built_at: Optional[float] = None
+    ):
+        # Sorted by start time, a time window is a slice (views, no copying)
+        order = np.argsort(start_time, kind='stable')
+        self.start_time = start_time[order]
+        self.duration = duration[order]
+        self.messages = messages[order]
+        self.successful = successful[order]
+        # np.bincount works on intp; storing codes that way saves a conversion per group-by
+        self.codes = {name: values[order].astype(np.intp) for name, values in codes.items()}
+        self.categories = categories
+        self.built_at = built_at if built_at is not None else time.time()
+        # Derived once so dashboards only count them
+        self.hour_of_day = ((self.start_time % 86400) // 3600).astype(np.int8)
+        # 1970-01-01 was a Thursday; shift so that Monday is 0
+        self.day_of_week = ((self.start_time // 86400 + 3) % 7).astype(np.int8)
+        # bincount weights are float64; convert once instead of on every group-by
+        self._successful_weights = self.successful.astype(np.float64)
+        self._duration_weights = self.duration.astype(np.float64)
+        self._message_weights = self.messages.astype(np.float64)
+        # code * 2 + success flag: one unweighted bincount gives calls and successes per value
+        self._code_success = {name: values * 2 + self.successful for name, values in self.codes.items()}
+
+    def __len__(self) -> int:
+        return len(self.start_time)
+
+    @classmethod
+    def from_store(cls, store, batch_size: int = 50000) -> "ColumnarSnapshot":
+        """Read the snapshot columns of every stored conversation"""
+        names = list(CATEGORICAL_COLUMNS)
+        columns = ['start_time_unix_secs', 'call_duration_secs', 'message_count', 'call_successful']
+        columns += [CATEGORICAL_COLUMNS[name] for name in names]
+
+        lookups: Dict[str, _Codes] = {name: _Codes() for name in names}
+        numeric_parts: List[List[np.ndarray]] = [[], [], [], []]
+        code_parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+        for batch in store.scan_columns(columns, batch_size):
+            count = len(batch)
+            values = list(zip(*batch))
+            for part, dtype, column in zip(numeric_parts, (np.int64, np.int64, np.int64, np.bool_), values[:4]):
+                part.append(np.array(column, dtype=dtype))
+            for offset, name in enumerate(names, start=4):
+                # Dictionary encoding: each distinct value gets the next integer code
+                code_parts[name].append(np.fromiter(map(lookups[name].__getitem__, values[offset]), dtype=np.int32, count=count))
+
+        def join(parts: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+        codes: Dict[str, np.ndarray] = {}
+        categories: Dict[str, List[str]] = {}
+        for name in names:
+            # None and '' both read as unknown; fold their codes together
+            labels: Dict[str, int] = {}
+            remap = np.array([labels.setdefault(value or UNKNOWN_KEY, len(labels)) for value in lookups[name]], dtype=np.int32)
+            codes[name] = remap[join(code_parts[name], np.int32)] if len(remap) else join(code_parts[name], np.int32)
+            categories[name] = list(labels)
+
+        return cls(
+            start_time=join(numeric_parts[0], np.int64),
+            duration=join(numeric_parts[1], np.int64),
+            messages=join(numeric_parts[2], np.int64),
+            successful=join(numeric_parts[3], np.bool_),
+            codes=codes,
+            categories=categories
+        )
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None) -> slice:
+        """Rows whose call started in [start, end)"""
+        lo = int(np.searchsorted(self.start_time, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(self.start_time, end, side='left')) if end is not None else len(self)
+        return slice(lo, max(lo, hi))
+
+    @staticmethod
+    def _aggregates(count, successful, duration, messages) -> Dict:
+        count = int(count)
+        return {
+            "total_conversations": count,
+            "successful_calls": int(successful),
+            "success_rate": float(successful / count * 100) if count > 0 else 0,
+            "total_duration_seconds": int(duration),
+            "average_duration_seconds": float(duration / count) if count > 0 else 0,
+            "average_messages_per_conversation": float(messages / count) if count > 0 else 0
+        }
+
+    def group_by(self, name: str, rows: slice = slice(None)) -> List[Dict]:
+        """Aggregates per value of a categorical field, most calls first"""
+        codes = self.codes[name][rows]
+        size = len(self.categories[name])
+        outcomes = np.bincount(self._code_success[name][rows], minlength=2 * size).reshape(size, 2)
+        counts = outcomes.sum(axis=1)
+        successes = outcomes[:, 1]
+        durations = np.bincount(codes, weights=self._duration_weights[rows], minlength=size)
+        message_totals = np.bincount(codes, weights=self._message_weights[rows], minlength=size)
+        order = np.argsort(-counts, kind='stable')
+        return [
+            {"key": self.categories[name][code], **self._aggregates(counts[code], successes[code], durations[code], message_totals[code])}
+            for code in order if counts[code] > 0
+        ]
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> Dict[str, Optional[float]]:
+        """Nearest-rank percentiles of non-negative integers"""
+        if not len(values):
+            return {f"p{p}": None for p in PERCENTILES}
+        if values.min() < 0 or values.max() > MAX_COUNTED_VALUE:
+            return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES, method='inverted_cdf'))}
+        # Counting is linear time, unlike the selection behind np.percentile
+        cumulative = np.cumsum(np.bincount(values))
+        ranks = np.ceil(np.asarray(PERCENTILES) / 100 * len(values)).astype(np.int64)
+        return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.searchsorted(cumulative, np.maximum(ranks, 1)))}
+
+    def dashboard(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        bucket_seconds: int = 3600,
+        duration_bin_edges: Sequence[int] = DURATION_BIN_EDGES
+    ) -> Dict:
+        """
+        All dashboard metrics for calls started in [start, end)
+
+        Returns:
+            Dictionary with totals, percentiles of duration and message count,
+            breakdowns per categorical field, call volume per bucket_seconds window,
+            calls by hour of day and day of week (UTC), and a duration histogram
+
+        Raises:
+            ValueError: if the window needs more than MAX_VOLUME_BUCKETS volume buckets
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        rows = self.window(start, end)
+        start_time = self.start_time[rows]
+        duration = self.duration[rows]
+        messages = self.messages[rows]
+        count = len(start_time)
+
+        # Call volume per window, aligned to multiples of bucket_seconds. A given start
+        # or end fixes the series, so an empty window still gets its zero buckets.
+        if start is not None:
+            first = start // bucket_seconds * bucket_seconds
+        elif count:
+            first = int(start_time[0]) // bucket_seconds * bucket_seconds
+        else:
+            first = end if end is not None else 0
+        if end is not None:
+            last = end
+        elif count:
+            last = int(start_time[-1]) + 1
+        else:
+            last = first
+        buckets = max(0, -(-(last - first) // bucket_seconds))
+        if buckets > MAX_VOLUME_BUCKETS:
+            raise ValueError(f"Window needs {buckets} buckets of {bucket_seconds}s; at most {MAX_VOLUME_BUCKETS} are returned")
+        # Start times are sorted, so bucket boundaries are found by binary search instead of dividing every row
+        boundaries = np.searchsorted(start_time, first + bucket_seconds * np.arange(buckets + 1), side='left')
+        volume = np.diff(boundaries)
+        successful_running = np.concatenate(([0.0], np.cumsum(self._successful_weights[rows])))
+        duration_running = np.concatenate(([0.0], np.cumsum(self._duration_weights[rows])))
+        volume_successful = successful_running[boundaries[1:]] - successful_running[boundaries[:-1]]
+        volume_duration = duration_running[boundaries[1:]] - duration_running[boundaries[:-1]]
+
+        edges = np.asarray(list(duration_bin_edges), dtype=np.int64)
+        if count and 0 <= duration.min() and duration.max() <= MAX_COUNTED_VALUE:
+            per_second = np.bincount(duration, minlength=int(edges[-1]) + 1)
+            duration_bins = np.add.reduceat(per_second, np.concatenate(([0], edges)))
+        else:
+            duration_bins = np.bincount(np.searchsorted(edges, duration, side='right'), minlength=len(edges) + 1)
+
+        successful_total = successful_running[-1]
+        duration_total = duration_running[-1]
+        message_total = self._message_weights[rows].sum()
+        return {
+            "start": start,
+            "end": end,
+            "totals": {
+                **self._aggregates(count, successful_total, duration_total, message_total),
+                "total_messages": int(message_total)
+            },
+            "percentiles": {
+                "duration_seconds": self._percentiles(duration),
+                "message_count": self._percentiles(messages)
+            },
+            "breakdowns": {name: self.group_by(name, rows) for name in self.codes},
+            "volume": {
+                "bucket_seconds": bucket_seconds,
+                "buckets": [
+                    {
+                        "start": first + i * bucket_seconds,
+                        "calls": int(volume[i]),
+                        "successful_calls": int(volume_successful[i]),
+                        "average_duration_seconds": float(volume_duration[i] / volume[i]) if volume[i] else 0
+                    }
+                    for i in range(buckets)
+                ]
+            },
+            "hour_of_day": np.bincount(self.hour_of_day[rows], minlength=24).tolist(),
+            "day_of_week": np.bincount(self.day_of_week[rows], minlength=7).tolist(),
+            "duration_histogram": [
+                {
+                    "min_seconds": int(edges[i - 1]) if i > 0 else 0,
+                    "max_seconds": int(edges[i]) if i < len(edges) else None,
+                    "calls": int(duration_bins[i])
+                }
+                for i in range(len(edges) + 1)
+            ],
+            "snapshot": {"conversations": len(self), "built_at": self.built_at}
+        }
+
+class ColumnarSnapshotCache:
+    """Latest snapshot of a store, rebuilt on demand once it is stale"""
+
+    def __init__(self, store, max_age: Optional[float] = None):
+        self.store = store
+        self.max_age = max_age if max_age is not None else float(os.getenv('ANALYTICS_SNAPSHOT_MAX_AGE', '30'))
+        self._snapshot: Optional[ColumnarSnapshot] = None
+        self._changed = True
+        self._build_lock = threading.Lock()
+        store.add_listener(self._on_change)
+
+    def _on_change(self, old_row: Optional[Dict], new_row: Optional[Dict]) -> None:
+        self._changed = True
+
+    def get(self) -> ColumnarSnapshot:
+        """Current snapshot; rebuilt if conversations changed and it is older than max_age"""
+        with self._build_lock:
+            snapshot = self._snapshot
+            if snapshot is None or (self._changed and time.time() - snapshot.built_at >= self.max_age):
+                # Clear first, so changes made during the build mark the new snapshot stale
+                self._changed = False
+                self._snapshot = snapshot = ColumnarSnapshot.from_store(self.store)
+            return snapshot
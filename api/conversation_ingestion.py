@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Background ingestion of ElevenLabs conversations into the local ConversationStore
+
+Each sync pulls only conversations started after the stored watermark (minus a
+small overlap), then fetches details for new conversations and for calls that
+were still in progress last time. Transcripts are analyzed as their details are
+stored, so the API never has to re-scan them.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from conversation_store import ConversationStore
+from transcript_analysis import analysis_version, analyze_transcript
+
+logger = logging.getLogger(__name__)
+
+# Summaries written to the store per transaction while walking the conversation list
+UPSERT_BATCH_SIZE = 100
+# Conversations whose details are fetched (and stored) per round
+DETAILS_BATCH_SIZE = 500
+# Stored transcripts re-analyzed per worker-thread round after a rules change
+REANALYZE_BATCH_SIZE = 200
+
+async def fetch_conversation_details_concurrently(
+    api_client,
+    conversation_ids: List[str],
+    concurrency: int,
+    timeout: float
+) -> List[Optional[Dict]]:
+    """
+    Fetch details for many conversations concurrently
+
+    At most `concurrency` fetches run at once. Results come back in the same order as
+    conversation_ids; a failed or timed-out fetch yields None for that conversation
+    only, so the rest of the batch is unaffected.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch_one(conv_id: str) -> Optional[Dict]:
+        if not conv_id:
+            return None
+        async with semaphore:
+            try:
+                logger.info(f"Getting details for conversation: {conv_id}")
+                return await asyncio.wait_for(api_client.get_conversation_details(conv_id), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Timed out after {timeout}s getting details for conversation {conv_id}")
+            except Exception as e:
+                logger.error(f"Error getting details for conversation {conv_id}: {e}")
+            return None
+
+    return await asyncio.gather(*(fetch_one(conv_id) for conv_id in conversation_ids))
+
+class ConversationIngestor:
+    """Keeps a ConversationStore current with ElevenLabs from a background task"""
+
+    def __init__(
+        self,
+        api_client,
+        store: ConversationStore,
+        interval_secs: Optional[float] = None,
+        overlap_secs: Optional[int] = None,
+        details_concurrency: int = 10,
+        details_timeout: float = 15.0
+    ):
+        self.api_client = api_client
+        self.store = store
+        self.interval_secs = interval_secs if interval_secs is not None else float(os.getenv('INGEST_INTERVAL_SECS', '60'))
+        # Re-read calls that started shortly before the watermark in case they were listed late
+        self.overlap_secs = overlap_secs if overlap_secs is not None else int(os.getenv('INGEST_OVERLAP_SECS', '3600'))
+        self.details_concurrency = details_concurrency
+        self.details_timeout = details_timeout
+        self.last_sync: Dict = {}
+        self._first_sync_done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync_once(self) -> Dict:
+        """
+        Pull new conversations and missing or in-progress details into the store
+
+        The watermark only advances after the whole conversation list was walked, so a
+        failed sync is retried from the same point next time. Store calls run in worker
+        threads so the event loop keeps serving requests meanwhile.
+        """
+        analyses_updated = await self.reanalyze_stored()
+
+        watermark = await asyncio.to_thread(self.store.get_watermark)
+        call_start_after = max(0, watermark - self.overlap_secs) if watermark is not None else None
+        logger.info(f"Ingesting conversations started after {call_start_after}")
+
+        summaries_ingested = 0
+        batch = []
+        async for conversation in self.api_client.iter_conversations(call_start_after=call_start_after):
+            batch.append(conversation)
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                summaries_ingested += await asyncio.to_thread(self.store.upsert_summaries, batch)
+                batch = []
+        summaries_ingested += await asyncio.to_thread(self.store.upsert_summaries, batch)
+
+        newest = await asyncio.to_thread(self.store.newest_start_time)
+        if newest is not None:
+            await asyncio.to_thread(self.store.set_watermark, newest)
+
+        # Walk every conversation needing details (e.g. a whole account on the first
+        # sync) in batches; calls still in progress or failing are tried once per sync
+        details_ingested = 0
+        after = None
+        while True:
+            conversation_ids = await asyncio.to_thread(
+                self.store.conversation_ids_needing_details, DETAILS_BATCH_SIZE, after
+            )
+            if not conversation_ids:
+                break
+            details_list = await self.fetch_and_store_details(conversation_ids)
+            details_ingested += sum(1 for details in details_list if details)
+            if len(conversation_ids) < DETAILS_BATCH_SIZE:
+                break
+            after = conversation_ids[-1]
+
+        await asyncio.to_thread(self.store.optimize)
+
+        self.last_sync = {
+            'call_start_after': call_start_after,
+            'summaries_ingested': summaries_ingested,
+            'details_ingested': details_ingested,
+            'analyses_updated': analyses_updated,
+            'watermark': newest
+        }
+        logger.info(f"Ingestion finished: {self.last_sync}")
+        return self.last_sync
+
+    async def fetch_and_store_details(self, conversation_ids: List[str]) -> List[Optional[Dict]]:
+        """Fetch details for the given conversations, store the ones that arrived and return them in order"""
+        if not conversation_ids:
+            return []
+        details_list = await fetch_conversation_details_concurrently(
+            self.api_client, conversation_ids, self.details_concurrency, self.details_timeout
+        )
+        fetched = [(conversation_id, details) for conversation_id, details in zip(conversation_ids, details_list) if details]
+        if fetched:
+            # Analysis and the per-row writes (and their listeners) stay off the event loop
+            await asyncio.to_thread(self._store_details, fetched)
+        return details_list
+
+    def _store_details(self, fetched: List[Tuple[str, Dict]]) -> None:
+        for conversation_id, details in fetched:
+            self.store.save_details(conversation_id, details, analyze_transcript(details.get('transcript')))
+
+    async def reanalyze_stored(self) -> int:
+        """
+        Analyze stored transcripts that have no analysis yet or one from other rules; returns how many
+
+        After a rules change this covers the whole table, so it runs in worker threads
+        one batch at a time and the event loop keeps serving requests in between.
+        """
+        version = analysis_version()
+        updated = 0
+        while True:
+            batch_updated = await asyncio.to_thread(self._reanalyze_batch, version)
+            if not batch_updated:
+                return updated
+            updated += batch_updated
+
+    def _reanalyze_batch(self, version: int) -> int:
+        pending = self.store.conversations_needing_analysis(version, limit=REANALYZE_BATCH_SIZE)
+        for conversation_id, transcript in pending:
+            self.store.save_analysis(conversation_id, analyze_transcript(transcript))
+        return len(pending)
+
+    async def run_forever(self) -> None:
+        """Sync every interval_secs until cancelled"""
+        while True:
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Conversation ingestion failed: {e}")
+            finally:
+                # Readers stop waiting after the first attempt, even if it failed
+                self._first_sync_done.set()
+            await asyncio.sleep(self.interval_secs)
+
+    def start(self) -> None:
+        """Start the background sync loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the background sync loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_until_ready(self, timeout: float) -> bool:
+        """Wait (up to timeout seconds) for the first sync attempt; returns whether it has happened"""
+        if self._first_sync_done.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._first_sync_done.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
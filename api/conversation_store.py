@@ -0,0 +1,1090 @@
+#!/usr/bin/env python3
+"""
+Local conversation store
+
+SQLite-backed storage for ElevenLabs conversation summaries, details, transcripts
+and the fields derived from them. The API server reads from here instead of
+re-downloading the conversation list from ElevenLabs on every request.
+"""
+
+import os
+import re
+import html
+import json
+import zlib
+import base64
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
+from area_code_mapping import get_location_from_phone_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'conversations.db')
+
+# Conversation statuses that will not change any more
+FINAL_STATUSES = ('done', 'failed')
+
+# Schema migrations; entry N upgrades a database at PRAGMA user_version N to N+1
+MIGRATIONS = [
+    [
+        """
+        CREATE TABLE conversations (
+            conversation_id TEXT PRIMARY KEY,
+            agent_id TEXT,
+            agent_name TEXT,
+            status TEXT,
+            call_successful INTEGER NOT NULL DEFAULT 0,
+            start_time_unix_secs INTEGER NOT NULL DEFAULT 0,
+            call_duration_secs INTEGER NOT NULL DEFAULT 0,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            direction TEXT,
+            caller_phone TEXT,
+            location TEXT,
+            summary_json TEXT NOT NULL,
+            details_json TEXT,
+            transcript_json TEXT,
+            details_status TEXT,
+            details_fetched_at REAL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX idx_conversations_start_time ON conversations (start_time_unix_secs DESC, conversation_id DESC)",
+        "CREATE TABLE sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    ],
+    [
+        # Transcript analysis computed once at ingest (see transcript_analysis.py)
+        "ALTER TABLE conversations ADD COLUMN summary_text TEXT",
+        "ALTER TABLE conversations ADD COLUMN outcome TEXT",
+        "ALTER TABLE conversations ADD COLUMN sentiment TEXT",
+        "ALTER TABLE conversations ADD COLUMN rating REAL",
+        "ALTER TABLE conversations ADD COLUMN tags_json TEXT",
+        "ALTER TABLE conversations ADD COLUMN analysis_version INTEGER NOT NULL DEFAULT 0",
+    ],
+    [
+        # Stable integer keys for the full-text index (rowids of a TEXT-keyed table may change on VACUUM)
+        "CREATE TABLE conversation_search_ids (search_rowid INTEGER PRIMARY KEY, conversation_id TEXT NOT NULL UNIQUE)",
+        lambda conn: _create_search_index(conn),
+    ],
+    [
+        lambda conn: _create_message_index(conn),
+    ],
+    [
+        # Filter + newest-first order + LIMIT is answered by walking one of these, so a
+        # filtered page costs O(page), not O(table). Text columns are indexed
+        # case-insensitively to match the query language's comparisons.
+        "CREATE INDEX idx_conversations_status_start ON conversations "
+        "(status COLLATE NOCASE, start_time_unix_secs DESC, conversation_id DESC)",
+        "CREATE INDEX idx_conversations_agent_start ON conversations "
+        "(agent_id, start_time_unix_secs DESC, conversation_id DESC)",
+        "CREATE INDEX idx_conversations_direction_start ON conversations "
+        "(direction COLLATE NOCASE, start_time_unix_secs DESC, conversation_id DESC)",
+        "CREATE INDEX idx_conversations_location_start ON conversations "
+        "(location COLLATE NOCASE, start_time_unix_secs DESC, conversation_id DESC)",
+        "ANALYZE",
+    ],
+    [
+        # Paid phone geolocation lookups by E.164 number; location_json is NULL for
+        # numbers the providers had nothing for (cached for a shorter time)
+        """
+        CREATE TABLE phone_locations (
+            phone_number TEXT PRIMARY KEY,
+            location_json TEXT,
+            fetched_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+    ],
+    [
+        # Background geolocation enrichment updates conversations by caller number
+        "CREATE INDEX idx_conversations_caller_phone ON conversations (caller_phone)",
+    ],
+]
+
+# Full-text index over the searchable text of each conversation; bm25 weights per column
+SEARCH_COLUMNS = ('conversation_ref', 'agent_name', 'caller_phone', 'tags', 'transcript')
+SEARCH_WEIGHTS = (2.0, 4.0, 4.0, 2.0, 1.0)
+
+# Per-message full-text index: rowid = search_rowid * MESSAGE_ROWID_STRIDE + message index,
+# so one conversation's messages form a contiguous rowid range
+MESSAGE_ROWID_STRIDE = 100000
+
+# Markers around matched terms in search snippets
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# Private-use characters snippet() puts around matches, swapped for the markers
+# once the transcript text around them has been HTML-escaped
+_SNIPPET_START = '\ue000'
+_SNIPPET_END = '\ue001'
+
+# Columns read for the list view (everything but the transcript)
+LIST_COLUMNS = (
+    "summary_json, details_json, summary_text, outcome, sentiment, rating, tags_json, analysis_version"
+)
+
+# Columns passed to change listeners (see ConversationStore.add_listener)
+LISTENER_COLUMNS = (
+    'conversation_id', 'agent_id', 'agent_name', 'status', 'call_successful', 'start_time_unix_secs',
+    'call_duration_secs', 'message_count', 'direction', 'caller_phone', 'location',
+    'outcome', 'sentiment', 'rating'
+)
+
+# Called with (row before, row after) for each changed conversation; None means absent
+RowListener = Callable[[Optional[Dict], Optional[Dict]], None]
+
+def parse_call_successful(value: Any) -> bool:
+    """Convert the API's call_successful value ("success", "failure", "unknown", bool) to a boolean"""
+    if isinstance(value, str):
+        return value.lower() in ['success', 'true', '1', 'yes']
+    return bool(value)
+
+def extract_phone_call(summary: Dict, details: Optional[Dict]) -> Optional[Dict]:
+    """Get phone_call metadata from the conversation summary, falling back to the details payload"""
+    phone_call = (summary.get('metadata') or {}).get('phone_call')
+    if not phone_call and details:
+        phone_call = (details.get('metadata') or {}).get('phone_call')
+    return phone_call or None
+
+def _create_search_index(conn: sqlite3.Connection) -> None:
+    """Create the FTS5 table and index existing conversations; skipped if SQLite lacks FTS5"""
+    try:
+        conn.execute(
+            f"CREATE VIRTUAL TABLE conversation_fts USING fts5({', '.join(SEARCH_COLUMNS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    except sqlite3.OperationalError as e:
+        logger.warning(f"SQLite FTS5 unavailable, search falls back to LIKE matching: {e}")
+        return
+    conversation_ids = [row[0] for row in conn.execute("SELECT conversation_id FROM conversations")]
+    for conversation_id in conversation_ids:
+        _index_conversation(conn, conversation_id)
+
+def _create_message_index(conn: sqlite3.Connection) -> None:
+    """Create the per-message FTS5 table and index stored transcripts; skipped if SQLite lacks FTS5"""
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE message_fts USING fts5("
+            "message, role UNINDEXED, time_in_call_secs UNINDEXED, message_index UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except sqlite3.OperationalError as e:
+        logger.warning(f"SQLite FTS5 unavailable, transcript search is disabled: {e}")
+        return
+    conversation_ids = [row[0] for row in conn.execute("SELECT conversation_id FROM conversations WHERE transcript_json IS NOT NULL")]
+    for conversation_id in conversation_ids:
+        _index_messages(conn, conversation_id)
+
+def _search_rowid(conn: sqlite3.Connection, conversation_id: str) -> int:
+    conn.execute("INSERT OR IGNORE INTO conversation_search_ids (conversation_id) VALUES (?)", (conversation_id,))
+    return conn.execute(
+        "SELECT search_rowid FROM conversation_search_ids WHERE conversation_id = ?", (conversation_id,)
+    ).fetchone()[0]
+
+def _index_messages(conn: sqlite3.Connection, conversation_id: str) -> None:
+    """(Re)write the per-message index entries of one conversation's transcript"""
+    row = conn.execute("SELECT transcript_json FROM conversations WHERE conversation_id = ?", (conversation_id,)).fetchone()
+    if row is None:
+        return
+    base = _search_rowid(conn, conversation_id) * MESSAGE_ROWID_STRIDE
+    conn.execute("DELETE FROM message_fts WHERE rowid BETWEEN ? AND ?", (base, base + MESSAGE_ROWID_STRIDE - 1))
+    transcript = json.loads(row['transcript_json']) if row['transcript_json'] else []
+    conn.executemany(
+        "INSERT INTO message_fts (rowid, message, role, time_in_call_secs, message_index) VALUES (?, ?, ?, ?, ?)",
+        [
+            (base + index, msg.get('message') or '', msg.get('role'), msg.get('time_in_call_secs'), index)
+            for index, msg in enumerate(transcript[:MESSAGE_ROWID_STRIDE])
+            if msg.get('message')
+        ]
+    )
+
+def _phone_search_text(caller_phone: Optional[str]) -> str:
+    """The number as stored plus its digits, with and without a leading US country code"""
+    if not caller_phone:
+        return ''
+    digits = re.sub(r'\D', '', caller_phone)
+    variants = [caller_phone, digits]
+    if len(digits) == 11 and digits.startswith('1'):
+        variants.append(digits[1:])
+    return ' '.join(variants)
+
+def _search_document(row: sqlite3.Row) -> Tuple[str, ...]:
+    """Values for the SEARCH_COLUMNS of one conversations row"""
+    tags = json.loads(row['tags_json']) if row['tags_json'] else []
+    transcript = json.loads(row['transcript_json']) if row['transcript_json'] else []
+    return (
+        row['conversation_id'],
+        row['agent_name'] or '',
+        _phone_search_text(row['caller_phone']),
+        ' '.join(tags),
+        ' '.join(msg.get('message', '') or '' for msg in transcript)
+    )
+
+def _index_conversation(conn: sqlite3.Connection, conversation_id: str) -> None:
+    """(Re)write the full-text index entry of one conversation"""
+    row = conn.execute(
+        "SELECT conversation_id, agent_name, caller_phone, tags_json, transcript_json FROM conversations WHERE conversation_id = ?",
+        (conversation_id,)
+    ).fetchone()
+    if row is None:
+        return
+    search_rowid = _search_rowid(conn, conversation_id)
+    conn.execute("DELETE FROM conversation_fts WHERE rowid = ?", (search_rowid,))
+    conn.execute(
+        f"INSERT INTO conversation_fts (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+        (search_rowid,) + _search_document(row)
+    )
+
+def build_fts_query(search: str) -> Optional[str]:
+    """
+    Turn free-text user input into an FTS5 query
+
+    Every word must match (AND), each as a prefix, and FTS5 syntax characters in
+    the input are never interpreted. Returns None if the input has no words.
+    """
+    terms = re.findall(r'\w+', search.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def build_phrase_query(query: str, near: Optional[int] = None) -> Optional[str]:
+    """
+    Turn a transcript search into an FTS5 query
+
+    Text in double quotes is matched as an exact phrase; other words must all occur
+    (the last one may be a prefix). With near, all phrases and words must occur
+    within that many tokens of each other. Returns None if the input has no words.
+    """
+    parts = []
+    for quoted, bare in re.findall(r'"([^"]*)"|(\S+)', query):
+        if quoted:
+            words = re.findall(r'\w+', quoted.lower())
+            if words:
+                parts.append('"' + ' '.join(words) + '"')
+        else:
+            parts.extend(f'"{word}"' for word in re.findall(r'\w+', bare.lower()))
+    if not parts:
+        return None
+    if parts[-1].count(' ') == 0:
+        parts[-1] += '*'
+    if near is not None and len(parts) > 1:
+        return f"NEAR({' '.join(parts)}, {max(0, int(near))})"
+    return ' '.join(parts)
+
+def highlight_snippet(snippet: Optional[str]) -> str:
+    """HTML-escape a snippet() result, then turn its match sentinels into highlight markers"""
+    escaped = html.escape(snippet or '', quote=False)
+    return escaped.replace(_SNIPPET_START, HIGHLIGHT_START).replace(_SNIPPET_END, HIGHLIGHT_END)
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class InvalidCursor(ValueError):
+    """Raised for pagination cursors that cannot be decoded or do not fit the query"""
+
+def encode_cursor(position: Dict) -> str:
+    """Opaque, URL-safe pagination cursor for a list position"""
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Dict:
+    """Position encoded by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(position, dict):
+        raise InvalidCursor("Invalid cursor")
+    return position
+
+class ConversationStore:
+    """SQLite store of conversations, safe to share between the event loop and worker threads"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """Open (and create or migrate if needed) the database at db_path"""
+        self.db_path = db_path or os.getenv('CONVERSATION_DB_PATH') or DEFAULT_DB_PATH
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._listeners: List[RowListener] = []
+        # caller_phone -> location stored with new conversations; the app swaps in one
+        # that prefers cached provider lookups
+        self.location_resolver: Callable[[str], Optional[str]] = get_location_from_phone_number
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Apply any schema migrations the database has not seen yet"""
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(self._conn)
+                        else:
+                            self._conn.execute(statement)
+                    self._conn.execute(f"PRAGMA user_version = {target}")
+            tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self.has_fts = 'conversation_fts' in tables
+            self.has_message_fts = 'message_fts' in tables
+
+    def close(self) -> None:
+        with self._lock:
+            self.optimize()
+            self._conn.close()
+
+    def optimize(self) -> None:
+        """Refresh the query planner's statistics where they are stale (cheap when nothing changed)"""
+        with self._lock:
+            self._conn.execute("PRAGMA optimize")
+
+    # Sync state
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def get_watermark(self) -> Optional[int]:
+        """Start time of the newest conversation covered by a completed sync"""
+        value = self.get_state('watermark')
+        return int(value) if value is not None else None
+
+    def set_watermark(self, start_time_unix_secs: int) -> None:
+        self.set_state('watermark', str(int(start_time_unix_secs)))
+
+    # Phone geolocation cache
+
+    def get_phone_location(self, phone_number: str) -> Optional[Tuple[Optional[Dict], float]]:
+        """(cached location or None for a negative result, expiry time) if an unexpired lookup is stored"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT location_json, expires_at FROM phone_locations WHERE phone_number = ? AND expires_at > ?",
+                (phone_number, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return (json.loads(row['location_json']) if row['location_json'] is not None else None), row['expires_at']
+
+    def get_phone_locations(self, phone_numbers: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Cached locations (None for a negative result) of the numbers with an unexpired stored lookup"""
+        phone_numbers = list(dict.fromkeys(phone_numbers))
+        now = time.time()
+        locations: Dict[str, Optional[Dict]] = {}
+        for start in range(0, len(phone_numbers), 500):
+            chunk = phone_numbers[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT phone_number, location_json FROM phone_locations "
+                    f"WHERE phone_number IN ({placeholders}) AND expires_at > ?",
+                    chunk + [now]
+                ).fetchall()
+            for row in rows:
+                locations[row['phone_number']] = json.loads(row['location_json']) if row['location_json'] is not None else None
+        return locations
+
+    def save_phone_location(self, phone_number: str, location: Optional[Dict], ttl_secs: float) -> None:
+        """Store a provider lookup result (None when the providers had nothing) for ttl_secs"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO phone_locations (phone_number, location_json, fetched_at, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(phone_number) DO UPDATE SET location_json = excluded.location_json, "
+                "fetched_at = excluded.fetched_at, expires_at = excluded.expires_at",
+                (phone_number, json.dumps(location) if location is not None else None, now, now + ttl_secs)
+            )
+
+    # Change notification
+
+    def add_listener(self, listener: RowListener, initialize: Optional[Callable[[Iterable[Dict]], None]] = None) -> None:
+        """
+        Call listener(old_row, new_row) after every committed change to a conversation row
+
+        Rows are dicts of LISTENER_COLUMNS. initialize, when given, is first called with
+        every stored row while writes are held off, so the listener sees each change
+        exactly once on top of that starting state.
+        """
+        with self._lock:
+            if initialize is not None:
+                columns = ', '.join(LISTENER_COLUMNS)
+                initialize(dict(row) for row in self._conn.execute(f"SELECT {columns} FROM conversations"))
+            self._listeners.append(listener)
+
+    def _listener_rows(self, conversation_ids: List[str]) -> Dict[str, Dict]:
+        """Current listener rows for conversation_ids (missing IDs are left out)"""
+        if not self._listeners or not conversation_ids:
+            return {}
+        columns = ', '.join(LISTENER_COLUMNS)
+        rows: Dict[str, Dict] = {}
+        for start in range(0, len(conversation_ids), 500):
+            chunk = conversation_ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            for row in self._conn.execute(
+                f"SELECT {columns} FROM conversations WHERE conversation_id IN ({placeholders})", chunk
+            ):
+                rows[row['conversation_id']] = dict(row)
+        return rows
+
+    @contextmanager
+    def _tracked_write(self, conversation_ids: List[str]):
+        """Transaction that reports its changes to conversation_ids to the listeners once committed"""
+        with self._lock:
+            before = self._listener_rows(conversation_ids)
+            with self._conn:
+                yield
+            self._notify(conversation_ids, before)
+
+    def _notify(self, conversation_ids: List[str], before: Dict[str, Dict]) -> None:
+        """Report rows of conversation_ids that differ from before (called with the lock held, after commit)"""
+        if not self._listeners:
+            return
+        after = self._listener_rows(conversation_ids)
+        for conversation_id in dict.fromkeys(conversation_ids):
+            old_row, new_row = before.get(conversation_id), after.get(conversation_id)
+            if old_row == new_row:
+                continue
+            for listener in self._listeners:
+                try:
+                    listener(old_row, new_row)
+                except Exception as e:
+                    logger.error(f"Conversation change listener failed for {conversation_id}: {e}")
+
+    # Writes
+
+    def upsert_summaries(self, summaries: List[Dict]) -> int:
+        """
+        Insert or update conversation summaries from the list endpoint
+
+        Stored details and transcripts are kept; derived phone fields are only
+        filled from the summary when it carries phone_call metadata.
+
+        Returns:
+            Number of summaries written
+        """
+        now = time.time()
+        rows = []
+        for summary in summaries:
+            conversation_id = summary.get('conversation_id')
+            if not conversation_id:
+                continue
+            phone_call = extract_phone_call(summary, None) or {}
+            caller_phone = phone_call.get('external_number') or phone_call.get('agent_number')
+            rows.append((
+                conversation_id,
+                summary.get('agent_id', ''),
+                summary.get('agent_name', ''),
+                summary.get('status', 'unknown'),
+                int(parse_call_successful(summary.get('call_successful', False))),
+                summary.get('start_time_unix_secs', 0) or 0,
+                summary.get('call_duration_secs', 0) or 0,
+                summary.get('message_count', 0) or 0,
+                phone_call.get('direction'),
+                caller_phone,
+                self.location_resolver(caller_phone) if caller_phone else None,
+                json.dumps(summary),
+                now
+            ))
+
+        with self._tracked_write([row[0] for row in rows]):
+            self._conn.executemany(
+                """
+                INSERT INTO conversations (
+                    conversation_id, agent_id, agent_name, status, call_successful,
+                    start_time_unix_secs, call_duration_secs, message_count,
+                    direction, caller_phone, location, summary_json, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(conversation_id) DO UPDATE SET
+                    agent_id = excluded.agent_id,
+                    agent_name = excluded.agent_name,
+                    status = excluded.status,
+                    call_successful = excluded.call_successful,
+                    start_time_unix_secs = excluded.start_time_unix_secs,
+                    call_duration_secs = excluded.call_duration_secs,
+                    message_count = excluded.message_count,
+                    direction = COALESCE(excluded.direction, conversations.direction),
+                    caller_phone = COALESCE(excluded.caller_phone, conversations.caller_phone),
+                    location = COALESCE(excluded.location, conversations.location),
+                    summary_json = excluded.summary_json,
+                    updated_at = excluded.updated_at
+                """,
+                rows
+            )
+            if self.has_fts:
+                self._reindex_changed_summaries(rows)
+        return len(rows)
+
+    def _reindex_changed_summaries(self, rows: List[Tuple]) -> None:
+        """Refresh index entries whose agent name or phone number changed (or that are not indexed yet)"""
+        for row in rows:
+            conversation_id = row[0]
+            indexed = self._conn.execute(
+                "SELECT f.agent_name, f.caller_phone FROM conversation_search_ids s "
+                "JOIN conversation_fts f ON f.rowid = s.search_rowid WHERE s.conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+            current = self._conn.execute(
+                "SELECT agent_name, caller_phone FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+            if indexed is None or tuple(indexed) != (current['agent_name'] or '', _phone_search_text(current['caller_phone'])):
+                _index_conversation(self._conn, conversation_id)
+
+    def save_details(self, conversation_id: str, details: Dict, transcript_analysis: Optional[Dict] = None) -> None:
+        """
+        Store the details payload (and its transcript) for a conversation
+
+        Status, duration and success flags in the details are newer than the summary's,
+        so they overwrite the summary columns. The conversation row is created from the
+        details if the summary has not been ingested yet. The transcript analysis, when
+        given, is stored in the same transaction.
+        """
+        details = dict(details)
+        transcript = details.pop('transcript', None)
+        metadata = details.get('metadata') or {}
+        analysis = details.get('analysis') or {}
+
+        with self._tracked_write([conversation_id]):
+            row = self._conn.execute(
+                "SELECT summary_json FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+            summary = json.loads(row['summary_json']) if row else {
+                'conversation_id': conversation_id,
+                'agent_id': details.get('agent_id', ''),
+                'agent_name': details.get('agent_name', ''),
+                'start_time_unix_secs': metadata.get('start_time_unix_secs', 0),
+                'call_duration_secs': metadata.get('call_duration_secs', 0),
+                'message_count': len(transcript or []),
+                'status': details.get('status', 'unknown'),
+                'call_successful': analysis.get('call_successful', False),
+            }
+
+            # Fold the fresher values from the details back into the summary
+            if details.get('status'):
+                summary['status'] = details['status']
+            if metadata.get('call_duration_secs') is not None:
+                summary['call_duration_secs'] = metadata['call_duration_secs']
+            if analysis.get('call_successful') is not None:
+                summary['call_successful'] = analysis['call_successful']
+            if transcript is not None:
+                summary['message_count'] = max(summary.get('message_count', 0) or 0, len(transcript))
+
+            phone_call = extract_phone_call(summary, details) or {}
+            caller_phone = phone_call.get('external_number') or phone_call.get('agent_number')
+
+            self._conn.execute(
+                """
+                INSERT INTO conversations (
+                    conversation_id, agent_id, agent_name, status, call_successful,
+                    start_time_unix_secs, call_duration_secs, message_count,
+                    direction, caller_phone, location, summary_json,
+                    details_json, transcript_json, details_status, details_fetched_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(conversation_id) DO UPDATE SET
+                    status = excluded.status,
+                    call_successful = excluded.call_successful,
+                    call_duration_secs = excluded.call_duration_secs,
+                    message_count = excluded.message_count,
+                    direction = excluded.direction,
+                    caller_phone = excluded.caller_phone,
+                    location = excluded.location,
+                    summary_json = excluded.summary_json,
+                    details_json = excluded.details_json,
+                    transcript_json = excluded.transcript_json,
+                    details_status = excluded.details_status,
+                    details_fetched_at = excluded.details_fetched_at,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    conversation_id,
+                    summary.get('agent_id', ''),
+                    summary.get('agent_name', ''),
+                    summary.get('status', 'unknown'),
+                    int(parse_call_successful(summary.get('call_successful', False))),
+                    summary.get('start_time_unix_secs', 0) or 0,
+                    summary.get('call_duration_secs', 0) or 0,
+                    summary.get('message_count', 0) or 0,
+                    phone_call.get('direction'),
+                    caller_phone,
+                    self.location_resolver(caller_phone) if caller_phone else None,
+                    json.dumps(summary),
+                    json.dumps(details),
+                    json.dumps(transcript) if transcript is not None else None,
+                    summary.get('status', 'unknown'),
+                    time.time(),
+                    time.time()
+                )
+            )
+            if transcript_analysis is not None:
+                self._write_analysis(conversation_id, transcript_analysis)
+            if self.has_fts:
+                _index_conversation(self._conn, conversation_id)
+            if self.has_message_fts:
+                _index_messages(self._conn, conversation_id)
+
+    def _write_analysis(self, conversation_id: str, analysis: Dict) -> None:
+        self._conn.execute(
+            """
+            UPDATE conversations SET
+                summary_text = ?, outcome = ?, sentiment = ?, rating = ?, tags_json = ?, analysis_version = ?
+            WHERE conversation_id = ?
+            """,
+            (
+                analysis.get('summary'),
+                analysis.get('outcome'),
+                analysis.get('sentiment'),
+                analysis.get('rating'),
+                json.dumps(analysis.get('tags') or []),
+                analysis['version'],
+                conversation_id
+            )
+        )
+
+    def save_analysis(self, conversation_id: str, analysis: Dict) -> None:
+        """Store a (re)computed transcript analysis for a conversation"""
+        with self._tracked_write([conversation_id]):
+            self._write_analysis(conversation_id, analysis)
+            if self.has_fts:
+                _index_conversation(self._conn, conversation_id)
+
+    def set_caller_location(self, phone_numbers: List[str], location: str) -> int:
+        """
+        Set the location of every conversation from one of phone_numbers
+
+        Returns:
+            Number of conversations whose location changed
+        """
+        return self.set_caller_locations({phone_number: location for phone_number in phone_numbers})
+
+    def set_caller_locations(self, locations: Dict[str, str], batch_size: int = 500) -> int:
+        """
+        Set conversation locations by caller number
+
+        Only rows whose location actually changes are written (and reported to
+        the listeners), one transaction per batch_size numbers.
+
+        Args:
+            locations: caller_phone -> location
+
+        Returns:
+            Number of conversations whose location changed
+        """
+        phone_numbers = list(locations)
+        changed = 0
+        for start in range(0, len(phone_numbers), batch_size):
+            chunk = phone_numbers[start:start + batch_size]
+            placeholders = ', '.join('?' * len(chunk))
+            with self._lock:
+                updates = [
+                    (locations[caller_phone], conversation_id)
+                    for conversation_id, caller_phone, location in self._conn.execute(
+                        f"SELECT conversation_id, caller_phone, location FROM conversations "
+                        f"WHERE caller_phone IN ({placeholders})",
+                        chunk
+                    )
+                    if location != locations[caller_phone]
+                ]
+                if not updates:
+                    continue
+                with self._tracked_write([conversation_id for _, conversation_id in updates]):
+                    self._conn.executemany("UPDATE conversations SET location = ? WHERE conversation_id = ?", updates)
+            changed += len(updates)
+        return changed
+
+    def backfill_locations(self, resolve: Callable[[List[str]], List[str]]) -> int:
+        """
+        Recompute the location of every conversation with a caller number
+
+        Args:
+            resolve: Maps a list of distinct caller numbers to their locations in one call
+
+        Returns:
+            Number of conversations whose location changed
+        """
+        with self._lock:
+            phone_numbers = [
+                row[0] for row in self._conn.execute(
+                    "SELECT DISTINCT caller_phone FROM conversations WHERE caller_phone IS NOT NULL"
+                )
+            ]
+        if not phone_numbers:
+            return 0
+        return self.set_caller_locations(dict(zip(phone_numbers, resolve(phone_numbers))))
+
+    def conversations_needing_analysis(self, version: int, limit: int = 500) -> List[Tuple[str, List[Dict]]]:
+        """(conversation_id, transcript) for stored details whose analysis is missing or from another version"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT conversation_id, transcript_json FROM conversations "
+                "WHERE details_json IS NOT NULL AND analysis_version != ? LIMIT ?",
+                (version, limit)
+            ).fetchall()
+        return [
+            (row['conversation_id'], json.loads(row['transcript_json']) if row['transcript_json'] else [])
+            for row in rows
+        ]
+
+    # Reads
+
+    @staticmethod
+    def _details_from_row(row: sqlite3.Row) -> Optional[Dict]:
+        if row['details_json'] is None:
+            return None
+        details = json.loads(row['details_json'])
+        details['transcript'] = json.loads(row['transcript_json']) if row['transcript_json'] else []
+        return details
+
+    @staticmethod
+    def _analysis_from_row(row: sqlite3.Row) -> Optional[Dict]:
+        if not row['analysis_version']:
+            return None
+        return {
+            'version': row['analysis_version'],
+            'summary': row['summary_text'],
+            'outcome': row['outcome'],
+            'sentiment': row['sentiment'],
+            'rating': row['rating'],
+            'tags': json.loads(row['tags_json']) if row['tags_json'] else []
+        }
+
+    def list_conversations(
+        self,
+        status: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        query=None,
+        direction: Optional[str] = None,
+        location: Optional[str] = None,
+        start_after: Optional[int] = None,
+        start_before: Optional[int] = None,
+        cursor: Optional[str] = None,
+        count_total: bool = True
+    ) -> Tuple[List[Tuple[Dict, Optional[Dict], Optional[Dict]]], Optional[int], Optional[str]]:
+        """
+        Filter and paginate stored conversations, newest first
+
+        A search matches conversations containing every word of it (as a prefix) in
+        their transcript, agent name, phone number, tags or ID, best matches first.
+        A query (query_language.ParsedQuery) adds its predicates, free text, excluded
+        words and sort order to the same SQL statement. Status, direction and location match
+        case-insensitively; start_after is inclusive and start_before exclusive (Unix
+        seconds). Each equality filter is backed by an index on (column, start time).
+        Transcripts are not read; the list view uses the stored analysis instead.
+
+        A cursor (the next_cursor of a previous call with the same filters) continues
+        after the last row of that page instead of skipping offset rows: a keyset
+        seek on (sort value, conversation ID) that costs O(limit) and is not shifted
+        by conversations inserted meanwhile. Relevance-ranked searches have no
+        stable sort key, so their cursors carry an offset.
+
+        Raises:
+            InvalidCursor: if cursor is malformed or was issued for another sort order
+
+        Returns:
+            ((summary, details without transcript or None, analysis or None) for each
+            conversation on the page, total number of matches or None when count_total
+            is False, cursor for the next page or None on the last page)
+        """
+        source = "conversations c"
+        sort_key, descending = "c.start_time_unix_secs", True
+        ranked = False
+        clauses = []
+        params: List[Any] = []
+        if status:
+            clauses.append("c.status = ? COLLATE NOCASE")
+            params.append(status)
+        if agent_id:
+            clauses.append("c.agent_id = ?")
+            params.append(agent_id)
+        if direction:
+            clauses.append("c.direction = ? COLLATE NOCASE")
+            params.append(direction)
+        if location:
+            clauses.append("c.location = ? COLLATE NOCASE")
+            params.append(location)
+        if start_after is not None:
+            clauses.append("c.start_time_unix_secs >= ?")
+            params.append(start_after)
+        if start_before is not None:
+            clauses.append("c.start_time_unix_secs < ?")
+            params.append(start_before)
+        if query is not None:
+            clauses.extend(query.clauses)
+            params.extend(query.params)
+        text_query = query.text if query is not None else ''
+        excluded_terms = query.excluded_terms if query is not None else []
+        if self.has_fts:
+            fts_parts = [
+                part for part in (
+                    build_fts_query(search) if search else None,
+                    build_phrase_query(text_query) if text_query else None
+                ) if part
+            ]
+            if fts_parts:
+                source = (
+                    "conversation_fts JOIN conversation_search_ids s ON s.search_rowid = conversation_fts.rowid "
+                    "JOIN conversations c ON c.conversation_id = s.conversation_id"
+                )
+                clauses.append("conversation_fts MATCH ?")
+                params.append(' AND '.join(f"({part})" for part in fts_parts))
+                ranked = True
+            # FTS5's NOT needs a positive term on its left, so exclusions are a subquery
+            excluded_parts = [part for part in map(build_phrase_query, excluded_terms) if part]
+            if excluded_parts:
+                clauses.append(
+                    "c.conversation_id NOT IN (SELECT x.conversation_id FROM conversation_fts "
+                    "JOIN conversation_search_ids x ON x.search_rowid = conversation_fts.rowid "
+                    "WHERE conversation_fts MATCH ?)"
+                )
+                params.append(' OR '.join(f"({part})" for part in excluded_parts))
+        else:
+            like_text = ' '.join(part for part in (search, text_query) if part)
+            if like_text:
+                pattern = f"%{_escape_like(like_text)}%"
+                clauses.append("(c.agent_name LIKE ? ESCAPE '\\' OR c.conversation_id LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+            for term in excluded_terms:
+                pattern = "%" + _escape_like(term.strip('"')) + "%"
+                clauses.append("NOT (c.agent_name LIKE ? ESCAPE '\\' OR c.conversation_id LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+        if query is not None and query.sort:
+            sort_key, descending = query.sort
+            ranked = False
+        sort_direction = 'DESC' if descending else 'ASC'
+        order = f"{sort_key} {sort_direction}, c.conversation_id {sort_direction}"
+        if ranked:
+            weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+            order = f"bm25(conversation_fts, {weights}), {order}"
+        # Ties a cursor to the ordering it was issued for
+        signature = zlib.crc32(order.encode('utf-8'))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        total = None
+        if count_total:
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) FROM {source} {where}", params).fetchone()[0]
+
+        if cursor:
+            position = decode_cursor(cursor)
+            if position.get('s') != signature:
+                raise InvalidCursor("Cursor was issued for a different sort order")
+            if ranked:
+                offset = position.get('o')
+                if not isinstance(offset, int) or offset < 0:
+                    raise InvalidCursor("Invalid cursor")
+            else:
+                if 'v' not in position or not isinstance(position.get('id'), str):
+                    raise InvalidCursor("Invalid cursor")
+                # Row-value comparison, so the seek uses the (sort key, conversation ID) order of the index
+                clauses.append(f"({sort_key}, c.conversation_id) {'<' if descending else '>'} (?, ?)")
+                params = params + [position['v'], position['id']]
+                where = f"WHERE {' AND '.join(clauses)}"
+                offset = 0
+
+        columns = ', '.join(f"c.{column.strip()}" for column in LIST_COLUMNS.split(','))
+        with self._lock:
+            # One extra row tells whether there is a next page
+            rows = self._conn.execute(
+                f"SELECT {columns}, {sort_key} AS sort_value, c.conversation_id AS sort_id "
+                f"FROM {source} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [limit + 1, offset]
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            if ranked:
+                next_cursor = encode_cursor({'s': signature, 'o': offset + limit})
+            else:
+                next_cursor = encode_cursor({'s': signature, 'v': rows[-1]['sort_value'], 'id': rows[-1]['sort_id']})
+        return [
+            (
+                json.loads(row['summary_json']),
+                json.loads(row['details_json']) if row['details_json'] is not None else None,
+                self._analysis_from_row(row)
+            )
+            for row in rows
+        ], total, next_cursor
+
+    def search_messages(
+        self,
+        query: str,
+        near: Optional[int] = None,
+        conversation_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[List[Dict], int]:
+        """
+        Find transcript messages matching a phrase/proximity query (see build_phrase_query)
+
+        Args:
+            query: Search text; "quoted text" is matched as a phrase
+            near: Maximum distance in tokens between the query's phrases and words
+            conversation_id: Only search this conversation's transcript
+            limit: Maximum number of hits returned
+            offset: Number of hits skipped
+
+        Returns:
+            (hits, total number of matching messages). Each hit has conversation_id,
+            agent_name, start_time_unix_secs, message_index, role, time_in_call_secs and
+            a snippet of HTML-escaped text with the matched terms wrapped in
+            HIGHLIGHT_START/HIGHLIGHT_END.
+        """
+        fts_query = build_phrase_query(query, near)
+        if not self.has_message_fts or not fts_query:
+            return [], 0
+
+        clauses = ["message_fts MATCH ?"]
+        params: List[Any] = [fts_query]
+        if conversation_id:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT search_rowid FROM conversation_search_ids WHERE conversation_id = ?", (conversation_id,)
+                ).fetchone()
+            if row is None:
+                return [], 0
+            clauses.append("message_fts.rowid BETWEEN ? AND ?")
+            params.extend([row[0] * MESSAGE_ROWID_STRIDE, (row[0] + 1) * MESSAGE_ROWID_STRIDE - 1])
+        where = ' AND '.join(clauses)
+        source = (
+            "message_fts JOIN conversation_search_ids s ON s.search_rowid = message_fts.rowid / ? "
+            "JOIN conversations c ON c.conversation_id = s.conversation_id"
+        )
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM message_fts WHERE {where}", params
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT c.conversation_id, c.agent_name, c.start_time_unix_secs, message_fts.message_index, "
+                f"message_fts.role, message_fts.time_in_call_secs, "
+                f"snippet(message_fts, 0, ?, ?, '…', 16) AS snippet "
+                f"FROM {source} WHERE {where} "
+                "ORDER BY bm25(message_fts), c.start_time_unix_secs DESC, message_fts.message_index LIMIT ? OFFSET ?",
+                [_SNIPPET_START, _SNIPPET_END, MESSAGE_ROWID_STRIDE] + params + [limit, offset]
+            ).fetchall()
+        hits = []
+        for row in rows:
+            hit = dict(row)
+            hit['snippet'] = highlight_snippet(hit['snippet'])
+            hits.append(hit)
+        return hits, total
+
+    def get_details(self, conversation_id: str) -> Optional[Dict]:
+        """Stored details payload (with transcript) or None if not ingested yet"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT details_json, transcript_json FROM conversations WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+        return self._details_from_row(row) if row else None
+
+    def get_analysis(self, conversation_id: str) -> Optional[Dict]:
+        """Stored transcript analysis or None if it has not been computed yet"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary_text, outcome, sentiment, rating, tags_json, analysis_version "
+                "FROM conversations WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+        return self._analysis_from_row(row) if row else None
+
+    def get_analyses(self, conversation_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """get_analysis for many conversations at once, by conversation ID (unknown IDs are left out)"""
+        analyses: Dict[str, Optional[Dict]] = {}
+        for start in range(0, len(conversation_ids), 500):
+            chunk = conversation_ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT conversation_id, summary_text, outcome, sentiment, rating, tags_json, analysis_version "
+                    f"FROM conversations WHERE conversation_id IN ({placeholders})",
+                    chunk
+                ).fetchall()
+            for row in rows:
+                analyses[row['conversation_id']] = self._analysis_from_row(row)
+        return analyses
+
+    def get_transcript(self, conversation_id: str) -> Optional[List[Dict]]:
+        """Stored transcript messages or None if the details have not been ingested yet"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT details_json, transcript_json FROM conversations WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+        if not row or row['details_json'] is None:
+            return None
+        return json.loads(row['transcript_json']) if row['transcript_json'] else []
+
+    def conversation_ids_needing_details(self, limit: int = 500, after: Optional[str] = None) -> List[str]:
+        """
+        Conversations with no stored details, or whose call had not finished when the details were fetched
+
+        Newest first. Pass the last ID of the previous batch as after to continue from
+        it, so each conversation is visited once even if its details are still missing.
+        """
+        placeholders = ', '.join('?' for _ in FINAL_STATUSES)
+        params: List[Any] = list(FINAL_STATUSES) * 2
+        keyset = ""
+        if after is not None:
+            keyset = (
+                "AND (start_time_unix_secs, conversation_id) < "
+                "((SELECT start_time_unix_secs FROM conversations WHERE conversation_id = ?), ?) "
+            )
+            params += [after, after]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT conversation_id FROM conversations "
+                f"WHERE (details_json IS NULL OR details_status NOT IN ({placeholders}) OR status NOT IN ({placeholders})) "
+                f"{keyset}ORDER BY start_time_unix_secs DESC, conversation_id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [row['conversation_id'] for row in rows]
+
+    def newest_start_time(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute("SELECT MAX(start_time_unix_secs) FROM conversations").fetchone()[0]
+
+    def scan_columns(self, columns: Iterable[str], batch_size: int = 50000) -> Iterator[List[Tuple]]:
+        """
+        Values of columns (from LISTENER_COLUMNS) for every conversation, in batches
+
+        Each batch is read separately under the lock, so writes are not held off for a
+        whole scan of a large table.
+        """
+        columns = list(columns)
+        unknown = set(columns) - set(LISTENER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot scan columns: {', '.join(sorted(unknown))}")
+        last_rowid = 0
+        while True:
+            with self._lock:
+                cursor = self._conn.cursor()
+                # Plain tuples; building sqlite3.Row objects dominates large scans
+                cursor.row_factory = None
+                rows = cursor.execute(
+                    f"SELECT rowid, {', '.join(columns)} FROM conversations WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [row[1:] for row in rows]
@@ -8,18 +8,188 @@ with their transcripts and call details.
 
 import os
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
 import json
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
+from cache import TTLCache
+from singleflight import SingleFlight
 
 # Load environment variables
 load_dotenv()
 
+# Conversations requested per page when walking /convai/conversations (upstream maximum is 100)
+CONVERSATIONS_PAGE_SIZE = 100
+
+def _conversation_page_params(call_start_after: Optional[int], page_size: int) -> Dict:
+    """Query parameters for the first page of a conversation list walk"""
+    params = {'page_size': page_size}
+    if call_start_after is not None:
+        params['call_start_after_unix'] = int(call_start_after)
+    return params
+
+def _extract_phone_info(conversation_id: str, data: Dict) -> Dict:
+    """Print metadata details and attach extracted_phone_info to a conversation details payload"""
+    # Print detailed metadata information
+    metadata = data.get('metadata', {})
+    print(f"📋 METADATA DETAILS for conversation {conversation_id}:")
+    print(f"   Metadata keys: {list(metadata.keys())}")
+    print(f"   Full metadata: {metadata}")
+    
+    # Extract phone number information if available (from metadata)
+    phone_call = metadata.get('phone_call', {})
+    if phone_call:
+        print(f"📞 Found phone_call data: {phone_call}")
+        phone_info = {
+            'direction': phone_call.get('direction'),
+            'phone_number_id': phone_call.get('phone_number_id'),
+            'agent_number': phone_call.get('agent_number'),
+            'external_number': phone_call.get('external_number'),
+            'type': phone_call.get('type'),
+            'stream_sid': phone_call.get('stream_sid'),
+            'call_sid': phone_call.get('call_sid')
+        }
+        data['extracted_phone_info'] = phone_info
+    else:
+        print(f"❌ No phone_call data found in metadata")
+    
+    # Also check for phone_number data (from phone_numbers endpoint)
+    phone_number_data = metadata.get('phone_number', {})
+    if phone_number_data:
+        print(f"📱 Found phone_number data:")
+        print(f"   Phone Number: {phone_number_data.get('phone_number', 'N/A')}")
+        print(f"   Label: {phone_number_data.get('label', 'N/A')}")
+        print(f"   Supports Inbound: {phone_number_data.get('supports_inbound', 'N/A')}")
+        print(f"   Supports Outbound: {phone_number_data.get('supports_outbound', 'N/A')}")
+        print(f"   Provider: {phone_number_data.get('provider', 'N/A')}")
+        if phone_number_data.get('assigned_agent'):
+            agent = phone_number_data.get('assigned_agent', {})
+            print(f"   Assigned Agent: {agent.get('agent_name', 'N/A')} (ID: {agent.get('agent_id', 'N/A')})")
+    else:
+        print(f"❌ No phone_number data found in metadata")
+    
+    return data
+
+def _audio_request_headers(api_key: str) -> Dict[str, str]:
+    """Headers for the audio endpoint (the same headers as the working curl command)"""
+    return {
+        'accept': '*/*',
+        'accept-language': 'en-US,en;q=0.9',
+        'origin': 'https://elevenlabs.io',
+        'priority': 'u=1, i',
+        'referer': 'https://elevenlabs.io/',
+        'sec-ch-ua': '"Not)A;Brand";v="8", "Chromium";v="138", "Google Chrome";v="138"',
+        'sec-ch-ua-mobile': '?0',
+        'sec-ch-ua-platform': '"macOS"',
+        'sec-fetch-dest': 'empty',
+        'sec-fetch-mode': 'cors',
+        'sec-fetch-site': 'cross-site',
+        'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
+        'x-fern-proxy-request-headers': 'xi-api-key',
+        'xi-api-key': api_key
+    }
+
+def _parse_audio_response(conversation_id: str, content_type: str, content: bytes) -> Optional[Dict]:
+    """Turn an audio endpoint response body into a JSON payload or a raw audio result"""
+    # Check if response has content
+    print(f"🔊 AUDIO RESPONSE - Content Length: {len(content)} bytes")
+    print(f"🔊 AUDIO RESPONSE - Content Type: {content_type or 'N/A'}")
+    
+    if not content:
+        print(f"🔊 AUDIO ERROR - No audio data available for conversation {conversation_id}")
+        return None
+    
+    # Check if it's JSON or binary audio data
+    print(f"🔊 AUDIO ANALYSIS - Content Type: {content_type}")
+    
+    if 'application/json' in content_type:
+        print(f"🔊 AUDIO ANALYSIS - Detected JSON response")
+        json_data = json.loads(content)
+        print(f"🔊 AUDIO ANALYSIS - JSON Data: {json_data}")
+        return json_data
+    elif 'audio' in content_type or 'application/octet-stream' in content_type:
+        print(f"🔊 AUDIO ANALYSIS - Detected binary audio data")
+        print(f"🔊 AUDIO ANALYSIS - Raw content first 100 bytes: {content[:100]}")
+        print(f"🔊 AUDIO ANALYSIS - Raw content last 100 bytes: {content[-100:]}")
+        print(f"🔊 AUDIO ANALYSIS - Content is binary: {isinstance(content, bytes)}")
+        
+        # Binary audio data - return the actual audio content
+        result = {
+            'raw_data': content,  # Return the actual binary data
+            'content_type': content_type,
+            'size_bytes': len(content),
+            'filename': f"conversation_{conversation_id}.{content_type.split('/')[-1] if '/' in content_type else 'audio'}"
+        }
+        print(f"🔊 AUDIO RESULT - Returning binary data with size: {len(content)} bytes")
+        print(f"🔊 AUDIO RESULT - Filename: {result['filename']}")
+        return result
+    else:
+        print(f"🔊 AUDIO ANALYSIS - Unknown content type, trying JSON first")
+        # Try to parse as JSON, but handle gracefully if it fails
+        try:
+            json_data = json.loads(content)
+            print(f"🔊 AUDIO ANALYSIS - Successfully parsed as JSON: {json_data}")
+            return json_data
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"🔊 AUDIO ANALYSIS - Failed to parse as JSON: {e}")
+            print(f"🔊 AUDIO ANALYSIS - Assuming binary data")
+            print(f"🔊 AUDIO ANALYSIS - Raw content first 100 bytes: {content[:100]}")
+            print(f"🔊 AUDIO ANALYSIS - Raw content last 100 bytes: {content[-100:]}")
+            
+            # Assume it's binary audio data
+            result = {
+                'raw_data': content,  # Return the actual binary data
+                'content_type': content_type,
+                'size_bytes': len(content),
+                'filename': f"conversation_{conversation_id}.audio"
+            }
+            print(f"🔊 AUDIO RESULT - Returning binary data with size: {len(content)} bytes")
+            return result
+
+class PoolSettings:
+    """Connection pool and timeout settings shared by the API clients"""
+    
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry_secs: float = 30.0,
+        connect_timeout_secs: float = 5.0,
+        read_timeout_secs: float = 30.0
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry_secs = keepalive_expiry_secs
+        self.connect_timeout_secs = connect_timeout_secs
+        self.read_timeout_secs = read_timeout_secs
+    
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        """Read pool settings from ELEVENLABS_* environment variables, falling back to the defaults"""
+        defaults = cls()
+        return cls(
+            max_connections=int(os.getenv('ELEVENLABS_MAX_CONNECTIONS', defaults.max_connections)),
+            max_keepalive_connections=int(os.getenv('ELEVENLABS_POOL_MAXSIZE', defaults.max_keepalive_connections)),
+            keepalive_expiry_secs=float(os.getenv('ELEVENLABS_KEEPALIVE_EXPIRY', defaults.keepalive_expiry_secs)),
+            connect_timeout_secs=float(os.getenv('ELEVENLABS_CONNECT_TIMEOUT', defaults.connect_timeout_secs)),
+            read_timeout_secs=float(os.getenv('ELEVENLABS_READ_TIMEOUT', defaults.read_timeout_secs))
+        )
+    
+    def to_dict(self) -> Dict:
+        return {
+            'max_connections': self.max_connections,
+            'max_keepalive_connections': self.max_keepalive_connections,
+            'keepalive_expiry_secs': self.keepalive_expiry_secs,
+            'connect_timeout_secs': self.connect_timeout_secs,
+            'read_timeout_secs': self.read_timeout_secs
+        }
+
 class ElevenLabsAPI:
     """Class to handle ElevenLabs API interactions"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, pool_settings: Optional[PoolSettings] = None):
         """Initialize the API client"""
         self.api_key = api_key or os.getenv('ELEVENLABS_API_KEY') or "sk_467eaffa636aa327e1710b5079372557aa112eac1ed4890e"
         if not self.api_key:
@@ -30,70 +200,89 @@ class ElevenLabsAPI:
             "xi-api-key": self.api_key,
             "Content-Type": "application/json"
         }
+        
+        # One shared session so connections are kept alive and reused across calls
+        self.pool_settings = pool_settings or PoolSettings.from_env()
+        self.timeout = (self.pool_settings.connect_timeout_secs, self.pool_settings.read_timeout_secs)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_settings.max_keepalive_connections
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
     
-    def get_conversations(self) -> List[Dict]:
-        """Retrieve all conversations from ElevenLabs ConvAI"""
-        try:
-            url = f"{self.base_url}/convai/conversations"
-            response = requests.get(url, headers=self.headers)
+    def close(self) -> None:
+        """Close the pooled session"""
+        self.session.close()
+    
+    def pool_stats(self) -> Dict:
+        """Connection pool statistics: active (checked out), idle (kept alive) and created connections"""
+        stats = {'active': 0, 'idle': 0, 'created': 0, 'requests': 0}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                if pool.pool is None:  # pool already closed
+                    continue
+                # The queue holds one slot per allowed connection: a slot is either an
+                # idle connection, None (never opened) or missing (checked out)
+                stats['active'] += max(0, pool.pool.maxsize - pool.pool.qsize())
+                stats['idle'] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                stats['created'] += pool.num_connections
+                stats['requests'] += pool.num_requests
+        stats['settings'] = self.pool_settings.to_dict()
+        return stats
+    
+    def iter_conversations(self, call_start_after: Optional[int] = None, page_size: int = CONVERSATIONS_PAGE_SIZE) -> Iterator[Dict]:
+        """
+        Lazily walk every page of /convai/conversations by following next_cursor
+        
+        Args:
+            call_start_after: Only yield calls started after this Unix timestamp (for incremental syncs)
+            page_size: Conversations requested per upstream page
+            
+        Yields:
+            Conversation summaries, newest first
+            
+        Raises:
+            requests.exceptions.RequestException: if any page fails, so callers can tell a
+            partial walk from a complete one
+        """
+        url = f"{self.base_url}/convai/conversations"
+        params = _conversation_page_params(call_start_after, page_size)
+        while True:
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
-            conversations = data.get('conversations', [])
-            print(f"Found {len(conversations)} conversations")
-            return conversations
+            yield from data.get('conversations', [])
+            
+            next_cursor = data.get('next_cursor')
+            if not data.get('has_more') or not next_cursor:
+                return
+            params['cursor'] = next_cursor
+    
+    def get_conversations(self, call_start_after: Optional[int] = None) -> List[Dict]:
+        """Retrieve all conversations from ElevenLabs ConvAI"""
+        conversations = []
+        try:
+            for conversation in self.iter_conversations(call_start_after=call_start_after):
+                conversations.append(conversation)
         except requests.exceptions.RequestException as e:
             print(f"Error retrieving conversations: {e}")
-            return []
+        print(f"Found {len(conversations)} conversations")
+        return conversations
     
     def get_conversation_details(self, conversation_id: str) -> Optional[Dict]:
         """Get detailed information about a specific conversation"""
         try:
             url = f"{self.base_url}/convai/conversations/{conversation_id}"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             
-            data = response.json()
-            
-            # Print detailed metadata information
-            metadata = data.get('metadata', {})
-            print(f"📋 METADATA DETAILS for conversation {conversation_id}:")
-            print(f"   Metadata keys: {list(metadata.keys())}")
-            print(f"   Full metadata: {metadata}")
-            
-            # Extract phone number information if available (from metadata)
-            phone_call = metadata.get('phone_call', {})
-            if phone_call:
-                print(f"📞 Found phone_call data: {phone_call}")
-                phone_info = {
-                    'direction': phone_call.get('direction'),
-                    'phone_number_id': phone_call.get('phone_number_id'),
-                    'agent_number': phone_call.get('agent_number'),
-                    'external_number': phone_call.get('external_number'),
-                    'type': phone_call.get('type'),
-                    'stream_sid': phone_call.get('stream_sid'),
-                    'call_sid': phone_call.get('call_sid')
-                }
-                data['extracted_phone_info'] = phone_info
-            else:
-                print(f"❌ No phone_call data found in metadata")
-            
-            # Also check for phone_number data (from phone_numbers endpoint)
-            phone_number_data = metadata.get('phone_number', {})
-            if phone_number_data:
-                print(f"📱 Found phone_number data:")
-                print(f"   Phone Number: {phone_number_data.get('phone_number', 'N/A')}")
-                print(f"   Label: {phone_number_data.get('label', 'N/A')}")
-                print(f"   Supports Inbound: {phone_number_data.get('supports_inbound', 'N/A')}")
-                print(f"   Supports Outbound: {phone_number_data.get('supports_outbound', 'N/A')}")
-                print(f"   Provider: {phone_number_data.get('provider', 'N/A')}")
-                if phone_number_data.get('assigned_agent'):
-                    agent = phone_number_data.get('assigned_agent', {})
-                    print(f"   Assigned Agent: {agent.get('agent_name', 'N/A')} (ID: {agent.get('agent_id', 'N/A')})")
-            else:
-                print(f"❌ No phone_number data found in metadata")
-            
-            return data
+            return _extract_phone_info(conversation_id, response.json())
         except requests.exceptions.RequestException as e:
             print(f"Error retrieving conversation {conversation_id}: {e}")
             return None
@@ -104,89 +293,15 @@ class ElevenLabsAPI:
             url = f"{self.base_url}/convai/conversations/{conversation_id}/audio"
             print(f"🔊 AUDIO REQUEST - URL: {url}")
             print(f"🔊 AUDIO REQUEST - Conversation ID: {conversation_id}")
-            
-            # Use the same headers as the working curl command
-            headers = {
-                'accept': '*/*',
-                'accept-language': 'en-US,en;q=0.9',
-                'origin': 'https://elevenlabs.io',
-                'priority': 'u=1, i',
-                'referer': 'https://elevenlabs.io/',
-                'sec-ch-ua': '"Not)A;Brand";v="8", "Chromium";v="138", "Google Chrome";v="138"',
-                'sec-ch-ua-mobile': '?0',
-                'sec-ch-ua-platform': '"macOS"',
-                'sec-fetch-dest': 'empty',
-                'sec-fetch-mode': 'cors',
-                'sec-fetch-site': 'cross-site',
-                'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-                'x-fern-proxy-request-headers': 'xi-api-key',
-                'xi-api-key': self.api_key
-            }
-            
-            print(f"🔊 AUDIO REQUEST - Headers: {headers}")
             print(f"🔊 AUDIO REQUEST - API Key: {self.api_key[:10]}...")
             
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=_audio_request_headers(self.api_key), timeout=self.timeout)
             print(f"🔊 AUDIO RESPONSE - Status Code: {response.status_code}")
             print(f"🔊 AUDIO RESPONSE - Headers: {dict(response.headers)}")
             
             response.raise_for_status()
             
-            # Check if response has content
-            print(f"🔊 AUDIO RESPONSE - Content Length: {len(response.content)} bytes")
-            print(f"🔊 AUDIO RESPONSE - Content Type: {response.headers.get('content-type', 'N/A')}")
-            
-            if response.content:
-                # Check if it's JSON or binary audio data
-                content_type = response.headers.get('content-type', '')
-                print(f"🔊 AUDIO ANALYSIS - Content Type: {content_type}")
-                
-                if 'application/json' in content_type:
-                    print(f"🔊 AUDIO ANALYSIS - Detected JSON response")
-                    json_data = response.json()
-                    print(f"🔊 AUDIO ANALYSIS - JSON Data: {json_data}")
-                    return json_data
-                elif 'audio' in content_type or 'application/octet-stream' in content_type:
-                    print(f"🔊 AUDIO ANALYSIS - Detected binary audio data")
-                    print(f"🔊 AUDIO ANALYSIS - Raw content first 100 bytes: {response.content[:100]}")
-                    print(f"🔊 AUDIO ANALYSIS - Raw content last 100 bytes: {response.content[-100:]}")
-                    print(f"🔊 AUDIO ANALYSIS - Content is binary: {isinstance(response.content, bytes)}")
-                    
-                    # Binary audio data - return the actual audio content
-                    result = {
-                        'raw_data': response.content,  # Return the actual binary data
-                        'content_type': content_type,
-                        'size_bytes': len(response.content),
-                        'filename': f"conversation_{conversation_id}.{content_type.split('/')[-1] if '/' in content_type else 'audio'}"
-                    }
-                    print(f"🔊 AUDIO RESULT - Returning binary data with size: {len(response.content)} bytes")
-                    print(f"🔊 AUDIO RESULT - Filename: {result['filename']}")
-                    return result
-                else:
-                    print(f"🔊 AUDIO ANALYSIS - Unknown content type, trying JSON first")
-                    # Try to parse as JSON, but handle gracefully if it fails
-                    try:
-                        json_data = response.json()
-                        print(f"🔊 AUDIO ANALYSIS - Successfully parsed as JSON: {json_data}")
-                        return json_data
-                    except json.JSONDecodeError as e:
-                        print(f"🔊 AUDIO ANALYSIS - Failed to parse as JSON: {e}")
-                        print(f"🔊 AUDIO ANALYSIS - Assuming binary data")
-                        print(f"🔊 AUDIO ANALYSIS - Raw content first 100 bytes: {response.content[:100]}")
-                        print(f"🔊 AUDIO ANALYSIS - Raw content last 100 bytes: {response.content[-100:]}")
-                        
-                        # Assume it's binary audio data
-                        result = {
-                            'raw_data': response.content,  # Return the actual binary data
-                            'content_type': content_type,
-                            'size_bytes': len(response.content),
-                            'filename': f"conversation_{conversation_id}.audio"
-                        }
-                        print(f"🔊 AUDIO RESULT - Returning binary data with size: {len(response.content)} bytes")
-                        return result
-            else:
-                print(f"🔊 AUDIO ERROR - No audio data available for conversation {conversation_id}")
-                return None
+            return _parse_audio_response(conversation_id, response.headers.get('content-type', ''), response.content)
         except requests.exceptions.RequestException as e:
             print(f"🔊 AUDIO ERROR - Request failed for conversation {conversation_id}: {e}")
             return None
@@ -195,7 +310,7 @@ class ElevenLabsAPI:
         """Get the transcript for a specific conversation"""
         try:
             url = f"{self.base_url}/convai/conversations/{conversation_id}/transcript"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             return response.json()
@@ -207,7 +322,7 @@ class ElevenLabsAPI:
         """Get available phone numbers"""
         try:
             url = f"{self.base_url}/convai/phone-numbers"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -220,6 +335,329 @@ class ElevenLabsAPI:
             print(f"Error retrieving phone numbers: {e}")
             return []
 
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that reports once when it is closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+        await self.stream.aclose()
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper counting requests whose response is still open (i.e. connections in use)"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self._release),
+            extensions=response.extensions
+        )
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+class AsyncElevenLabsAPI:
+    """
+    asyncio counterpart of ElevenLabsAPI for use inside async web handlers
+    
+    All requests share one pooled httpx.AsyncClient with keep-alive, so awaiting an
+    upstream call never blocks the event loop. Call aclose() (or use it as an async
+    context manager) to release the pooled connections.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        pool_settings: Optional[PoolSettings] = None,
+        details_cache: Optional[TTLCache] = None
+    ):
+        """Initialize the API client"""
+        self.api_key = api_key or os.getenv('ELEVENLABS_API_KEY') or "sk_467eaffa636aa327e1710b5079372557aa112eac1ed4890e"
+        if not self.api_key:
+            raise ValueError("API key is required. Set ELEVENLABS_API_KEY environment variable or pass it to the constructor.")
+        
+        self.base_url = "https://api.elevenlabs.io/v1"
+        self.headers = {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+        
+        # Details and transcripts of finished calls never change, so they are cached for
+        # a long time; calls still in progress get a short TTL
+        self.cache_ttl_done_secs = float(os.getenv('CONVERSATION_CACHE_TTL_DONE', '86400'))
+        self.cache_ttl_active_secs = float(os.getenv('CONVERSATION_CACHE_TTL_ACTIVE', '10'))
+        if details_cache is None:
+            details_cache = TTLCache(
+                max_entries=int(os.getenv('CONVERSATION_CACHE_MAX_ENTRIES', '2000')),
+                max_bytes=int(os.getenv('CONVERSATION_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+                stale_while_revalidate_secs=float(os.getenv('CONVERSATION_CACHE_STALE_SECS', '300'))
+            )
+        self.details_cache = details_cache
+        # Identical concurrent upstream requests share one in-flight call
+        self.single_flight = SingleFlight()
+        
+        self.pool_settings = pool_settings or PoolSettings.from_env()
+        self.transport = CountingTransport(httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=self.pool_settings.max_connections,
+                max_keepalive_connections=self.pool_settings.max_keepalive_connections,
+                keepalive_expiry=self.pool_settings.keepalive_expiry_secs
+            )
+        ))
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            transport=self.transport,
+            timeout=httpx.Timeout(
+                self.pool_settings.read_timeout_secs,
+                connect=self.pool_settings.connect_timeout_secs
+            )
+        )
+        self.connections_created = 0
+    
+    async def __aenter__(self) -> "AsyncElevenLabsAPI":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
+    
+    async def _trace(self, event_name: str, info: Dict) -> None:
+        """httpcore trace hook used to count newly opened upstream connections"""
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_created += 1
+    
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """GET through the shared pool with connection tracing enabled"""
+        return await self.client.get(url, extensions={"trace": self._trace}, **kwargs)
+    
+    def pool_stats(self) -> Dict:
+        """Connection pool statistics: active (serving a request), idle (kept alive) and created connections"""
+        stats = {'active': self.transport.in_flight, 'idle': None, 'created': self.connections_created}
+        # httpx has no public view of idle pooled connections; report None if its internals change
+        try:
+            stats['idle'] = sum(1 for connection in self.transport.transport._pool.connections if connection.is_idle())
+        except (AttributeError, TypeError):
+            pass
+        stats['settings'] = self.pool_settings.to_dict()
+        return stats
+    
+    async def iter_conversations(self, call_start_after: Optional[int] = None, page_size: int = CONVERSATIONS_PAGE_SIZE) -> AsyncIterator[Dict]:
+        """
+        Lazily walk every page of /convai/conversations by following next_cursor
+        
+        Same contract as ElevenLabsAPI.iter_conversations; raises httpx.HTTPError if a page fails.
+        Concurrent walks requesting the same page share one upstream call.
+        """
+        url = f"{self.base_url}/convai/conversations"
+        params = _conversation_page_params(call_start_after, page_size)
+        while True:
+            page_params = dict(params)
+            data = await self.single_flight.do(
+                ('conversations', tuple(sorted(page_params.items()))),
+                lambda: self._fetch_conversations_page(url, page_params)
+            )
+            for conversation in data.get('conversations', []):
+                yield conversation
+            
+            next_cursor = data.get('next_cursor')
+            if not data.get('has_more') or not next_cursor:
+                return
+            params['cursor'] = next_cursor
+    
+    async def _fetch_conversations_page(self, url: str, params: Dict) -> Dict:
+        response = await self._get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+    
+    async def get_conversations(self, call_start_after: Optional[int] = None) -> List[Dict]:
+        """Retrieve all conversations from ElevenLabs ConvAI"""
+        conversations = []
+        try:
+            async for conversation in self.iter_conversations(call_start_after=call_start_after):
+                conversations.append(conversation)
+        except httpx.HTTPError as e:
+            print(f"Error retrieving conversations: {e}")
+        print(f"Found {len(conversations)} conversations")
+        return conversations
+    
+    def _details_ttl(self, details: Dict) -> float:
+        return self.cache_ttl_done_secs if details.get('status') == 'done' else self.cache_ttl_active_secs
+    
+    def _transcript_ttl(self, conversation_id: str) -> float:
+        # The transcript payload has no status of its own; go by the cached details
+        details = self.details_cache.peek(('details', conversation_id))
+        return self._details_ttl(details) if details else self.cache_ttl_active_secs
+    
+    async def get_conversation_details(self, conversation_id: str) -> Optional[Dict]:
+        """Get detailed information about a specific conversation (cached)"""
+        return await self.details_cache.get_or_load(
+            ('details', conversation_id),
+            lambda: self.single_flight.do(('details', conversation_id), lambda: self._fetch_conversation_details(conversation_id)),
+            self._details_ttl
+        )
+    
+    async def _fetch_conversation_details(self, conversation_id: str) -> Optional[Dict]:
+        try:
+            response = await self._get(f"{self.base_url}/convai/conversations/{conversation_id}")
+            response.raise_for_status()
+            
+            return _extract_phone_info(conversation_id, response.json())
+        except httpx.HTTPError as e:
+            print(f"Error retrieving conversation {conversation_id}: {e}")
+            return None
+    
+    async def get_conversation_audio(self, conversation_id: str) -> Optional[Dict]:
+        """Get audio information for a specific conversation"""
+        return await self.single_flight.do(('audio', conversation_id), lambda: self._fetch_conversation_audio(conversation_id))
+    
+    async def _fetch_conversation_audio(self, conversation_id: str) -> Optional[Dict]:
+        try:
+            url = f"{self.base_url}/convai/conversations/{conversation_id}/audio"
+            print(f"🔊 AUDIO REQUEST - URL: {url}")
+            
+            response = await self._get(url, headers=_audio_request_headers(self.api_key))
+            print(f"🔊 AUDIO RESPONSE - Status Code: {response.status_code}")
+            
+            response.raise_for_status()
+            
+            return _parse_audio_response(conversation_id, response.headers.get('content-type', ''), response.content)
+        except httpx.HTTPError as e:
+            print(f"🔊 AUDIO ERROR - Request failed for conversation {conversation_id}: {e}")
+            return None
+    
+    async def probe_conversation_audio(self, conversation_id: str) -> Optional[Dict]:
+        """
+        Get a recording's content type and size without downloading it (cached)
+
+        Asks upstream for the first byte only and reads the total size from the
+        Content-Range header, so the probe costs a single byte of body.
+
+        Returns:
+            Dictionary with has_audio, content_type, size_bytes and filename, or None if the probe failed
+        """
+        return await self.details_cache.get_or_load(
+            ('audio-probe', conversation_id),
+            lambda: self.single_flight.do(('audio-probe', conversation_id), lambda: self._probe_conversation_audio(conversation_id)),
+            # A recording never changes once it exists, but a missing one may still appear
+            lambda probe: self.cache_ttl_done_secs if probe['has_audio'] else self.cache_ttl_active_secs
+        )
+
+    async def _probe_conversation_audio(self, conversation_id: str) -> Optional[Dict]:
+        try:
+            response = await self.open_conversation_audio_stream(conversation_id, 'bytes=0-0')
+        except httpx.HTTPError as e:
+            print(f"🔊 AUDIO ERROR - Probe failed for conversation {conversation_id}: {e}")
+            return None
+        try:
+            content_type = response.headers.get('content-type', '')
+            if response.status_code in (404, 416) or 'application/json' in content_type:
+                return {'has_audio': False, 'content_type': None, 'size_bytes': None, 'filename': None}
+            response.raise_for_status()
+
+            size_bytes = None
+            if response.status_code == 206:
+                total = response.headers.get('content-range', '').rpartition('/')[2]
+                size_bytes = int(total) if total.isdigit() else None
+            elif response.headers.get('content-length', '').isdigit():
+                # Range ignored; the full body is on its way but is never read
+                size_bytes = int(response.headers['content-length'])
+            if size_bytes == 0:
+                return {'has_audio': False, 'content_type': None, 'size_bytes': None, 'filename': None}
+            return {
+                'has_audio': True,
+                'content_type': content_type or None,
+                'size_bytes': size_bytes,
+                'filename': f"conversation_{conversation_id}.{content_type.split('/')[-1] if '/' in content_type else 'audio'}"
+            }
+        except httpx.HTTPError as e:
+            print(f"🔊 AUDIO ERROR - Probe failed for conversation {conversation_id}: {e}")
+            return None
+        finally:
+            await response.aclose()
+
+    async def open_conversation_audio_stream(self, conversation_id: str, range_header: Optional[str] = None) -> httpx.Response:
+        """
+        Start streaming a conversation's audio without reading the body
+
+        Args:
+            conversation_id: Conversation whose recording to stream
+            range_header: Optional HTTP Range header forwarded upstream
+
+        Returns:
+            The open upstream response; the caller reads it with aiter_bytes() and must aclose() it
+        """
+        headers = _audio_request_headers(self.api_key)
+        if range_header:
+            headers['range'] = range_header
+        request = self.client.build_request(
+            "GET",
+            f"{self.base_url}/convai/conversations/{conversation_id}/audio",
+            headers=headers,
+            extensions={"trace": self._trace}
+        )
+        return await self.client.send(request, stream=True)
+
+    async def get_conversation_transcript(self, conversation_id: str) -> Optional[Dict]:
+        """Get the transcript for a specific conversation (cached)"""
+        return await self.details_cache.get_or_load(
+            ('transcript', conversation_id),
+            lambda: self.single_flight.do(('transcript', conversation_id), lambda: self._fetch_conversation_transcript(conversation_id)),
+            lambda transcript: self._transcript_ttl(conversation_id)
+        )
+    
+    async def _fetch_conversation_transcript(self, conversation_id: str) -> Optional[Dict]:
+        try:
+            response = await self._get(f"{self.base_url}/convai/conversations/{conversation_id}/transcript")
+            response.raise_for_status()
+            
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Error retrieving transcript for conversation {conversation_id}: {e}")
+            return None
+    
+    async def get_phone_numbers(self) -> List[Dict]:
+        """Get available phone numbers"""
+        return await self.single_flight.do(('phone-numbers',), self._fetch_phone_numbers)
+    
+    async def _fetch_phone_numbers(self) -> List[Dict]:
+        try:
+            response = await self._get(f"{self.base_url}/convai/phone-numbers")
+            response.raise_for_status()
+            
+            data = response.json()
+            print(f"📱 PHONE NUMBERS API RESPONSE: {len(data)} entries")
+            
+            return data
+        except httpx.HTTPError as e:
+            print(f"Error retrieving phone numbers: {e}")
+            return []
+
 class ConversationDisplay:
     """Class to handle displaying conversation information"""
     
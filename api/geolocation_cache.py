@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of phone geolocation lookups
+
+The paid lookup providers (NumVerify, Abstract API) have small monthly quotas
+and answer slowly, while the same callers ring again and again. Results are
+kept in the conversation store keyed by E.164 number, with an in-memory LRU in
+front, so each number is looked up at most once per TTL however often it is
+displayed. Numbers the providers had nothing for are cached too, for a shorter
+time.
+
+Lookups come from the event loop and from worker threads (provider calls,
+backfills), so the in-memory LRU is only touched under a lock.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+from cache import TTLCache
+
+DEFAULT_POSITIVE_TTL_SECS = 90 * 86400
+DEFAULT_NEGATIVE_TTL_SECS = 7 * 86400
+
+class PhoneLocationCache:
+    """Provider lookup results by E.164 number: memory first, then the store"""
+
+    def __init__(
+        self,
+        store,
+        positive_ttl_secs: Optional[float] = None,
+        negative_ttl_secs: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.store = store
+        self.positive_ttl_secs = positive_ttl_secs if positive_ttl_secs is not None else float(
+            os.getenv('PHONE_LOCATION_TTL_SECS', str(DEFAULT_POSITIVE_TTL_SECS))
+        )
+        self.negative_ttl_secs = negative_ttl_secs if negative_ttl_secs is not None else float(
+            os.getenv('PHONE_LOCATION_NEGATIVE_TTL_SECS', str(DEFAULT_NEGATIVE_TTL_SECS))
+        )
+        self.memory = TTLCache(
+            max_entries=max_entries if max_entries is not None else int(os.getenv('PHONE_LOCATION_CACHE_SIZE', '10000')),
+            stale_while_revalidate_secs=0
+        )
+        # TTLCache itself is not thread-safe
+        self._lock = threading.Lock()
+        self.store_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def get(self, phone_number: str) -> Optional[Dict]:
+        """
+        Cached lookup for an E.164 number
+
+        Returns:
+            None on a miss, else {'location': provider result, or None if the providers had nothing}
+        """
+        with self._lock:
+            entry = self.memory.get(phone_number)
+        if entry is not None:
+            return entry
+
+        stored = self.store.get_phone_location(phone_number)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            location, expires_at = stored
+            entry = {'location': location}
+            # Expire from memory together with the stored row
+            self.memory.set(phone_number, entry, max(0.0, expires_at - time.time()))
+            self.store_hits += 1
+        return entry
+
+    def put(self, phone_number: str, location: Optional[Dict]) -> None:
+        """Remember a provider result (None when the providers had nothing for the number)"""
+        ttl_secs = self.positive_ttl_secs if location is not None else self.negative_ttl_secs
+        self.store.save_phone_location(phone_number, location, ttl_secs)
+        with self._lock:
+            self.memory.set(phone_number, {'location': location}, ttl_secs)
+            self.writes += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory.hits + self.store_hits + self.misses
+            return {
+                'memory_entries': len(self.memory),
+                'memory_hits': self.memory.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'hit_rate': (self.memory.hits + self.store_hits) / lookups if lookups else 0.0
+            }
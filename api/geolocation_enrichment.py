@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Background phone geolocation enrichment
+
+Conversation lists show the area-code location straight away; numbers the paid
+geolocation providers have not been asked about yet are queued here instead of
+being looked up inside the request. A background task takes the queued numbers
+in batches (each number once, however many rows or pages it appears on),
+resolves them concurrently, and writes the richer location back to the
+conversations table, where store listeners and later page loads pick it up.
+
+Provider calls are rate limited per provider (see RateLimiter) so a burst of new
+numbers cannot exhaust a monthly quota; numbers a provider had no budget for are
+simply retried the next time they are seen. Lookups and the write-back both run
+in worker threads.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """Token bucket: up to burst calls at once, refilled at rate_per_sec"""
+
+    def __init__(self, rate_per_sec: float, burst: float = 1.0, initial_tokens: Optional[float] = None):
+        self.rate_per_sec = rate_per_sec
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst if initial_tokens is None else min(self.burst, max(0.0, initial_tokens))
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.denied = 0
+
+    @classmethod
+    def per_day(cls, requests_per_day: float, saved: Optional[Dict] = None) -> "RateLimiter":
+        """
+        Limiter allowing requests_per_day on average, saving up at most a day's worth
+
+        Args:
+            requests_per_day: Average number of calls allowed per day
+            saved: saved_state() of the previous process, so a restart carries on with
+                the tokens that were left (plus the refill since) instead of a full
+                bucket; without it the bucket starts full
+        """
+        rate_per_sec = requests_per_day / 86400
+        initial_tokens = None
+        if saved:
+            try:
+                elapsed = max(0.0, time.time() - float(saved['at']))
+                initial_tokens = float(saved['tokens']) + elapsed * rate_per_sec
+            except (KeyError, TypeError, ValueError):
+                initial_tokens = None
+        return cls(rate_per_sec, burst=requests_per_day, initial_tokens=initial_tokens)
+
+    def saved_state(self) -> Dict:
+        """Token count as of now, for per_day(saved=...) after a restart"""
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_sec)
+            return {'tokens': tokens, 'at': time.time()}
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available; never waits"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_sec)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.granted += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self) -> Dict:
+        return {'granted': self.granted, 'denied': self.denied, 'tokens': round(self._tokens, 2)}
+
+class PhoneLocationEnricher:
+    """Deduplicating queue of numbers to resolve, drained by one background task"""
+
+    def __init__(self, service, store, concurrency: int = 4, batch_size: int = 100):
+        """
+        Args:
+            service: PhoneGeolocationService (providers, cache and number normalization)
+            store: ConversationStore the resolved locations are written to
+            concurrency: Maximum number of provider lookups in flight at once
+            batch_size: Numbers taken from the queue per round
+        """
+        self.service = service
+        self.store = store
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        # E.164 number -> raw caller_phone values seen for it
+        self._pending: Dict[str, Set[str]] = {}
+        self._in_flight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.resolved = 0
+        self.unresolved = 0
+        self.already_cached = 0
+        self.rows_updated = 0
+
+    def on_row_change(self, old_row: Optional[Dict], new_row: Optional[Dict]) -> None:
+        """Store listener: queue the caller number of new conversations (or ones whose number changed)"""
+        if new_row is None or not new_row.get('caller_phone'):
+            return
+        if old_row is not None and old_row.get('caller_phone') == new_row['caller_phone']:
+            return
+        self.enqueue([new_row['caller_phone']])
+
+    def enqueue(self, phone_numbers: Iterable[str]) -> int:
+        """
+        Queue numbers for a provider lookup
+
+        Invalid numbers and numbers already queued or being resolved are skipped.
+        Nothing here touches the cache or the store: store listeners call this while
+        holding the store lock, and the list endpoint calls it on the event loop.
+        Numbers with a cached result are dropped by the background task instead.
+        Safe to call from any thread.
+
+        Returns:
+            Number of newly queued numbers
+        """
+        if not self.service.providers_configured:
+            return 0
+        added = 0
+        with self._lock:
+            for raw in phone_numbers:
+                e164 = self.service.lookup_key(raw)
+                if e164 is None:
+                    continue
+                if e164 in self._pending:
+                    self._pending[e164].add(raw)
+                    continue
+                if e164 in self._in_flight:
+                    continue
+                self._pending[e164] = {raw}
+                added += 1
+        if added and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return added
+
+    def _take_batch(self) -> Dict[str, Set[str]]:
+        with self._lock:
+            batch = {}
+            for e164 in list(self._pending)[:self.batch_size]:
+                batch[e164] = self._pending.pop(e164)
+                self._in_flight.add(e164)
+            return batch
+
+    async def _resolve(self, e164: str, raw_numbers: Set[str], semaphore: asyncio.Semaphore) -> None:
+        try:
+            async with semaphore:
+                # A cached number's conversations were already located from the cache
+                if await asyncio.to_thread(self.service.is_cached, e164):
+                    self.already_cached += 1
+                    return
+                # Provider clients and the store write (with its listeners) are blocking
+                rows_updated = await asyncio.to_thread(self._resolve_and_store, e164, raw_numbers)
+            if rows_updated is None:
+                self.unresolved += 1
+                return
+            self.resolved += 1
+            self.rows_updated += rows_updated
+        except Exception as e:
+            logger.error(f"Geolocation enrichment failed for {e164}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(e164)
+
+    def _resolve_and_store(self, e164: str, raw_numbers: Set[str]) -> Optional[int]:
+        """Look a number up and write its region to its conversations; rows updated, or None if unresolved"""
+        location = self.service.resolve(e164)
+        region = location.get('region') if location else None
+        if not region:
+            return None
+        return self.store.set_caller_location(sorted(raw_numbers), region)
+
+    async def run_forever(self) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                logger.info(f"Resolving locations for {len(batch)} phone numbers")
+                await asyncio.gather(*(self._resolve(e164, raws, semaphore) for e164, raws in batch.items()))
+
+    def start(self) -> None:
+        """Start the background task (call from the event loop)"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            if self._pending:
+                self._wake.set()
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending, in_flight = len(self._pending), len(self._in_flight)
+        return {
+            'pending': pending,
+            'in_flight': in_flight,
+            'resolved': self.resolved,
+            'unresolved': self.unresolved,
+            'already_cached': self.already_cached,
+            'rows_updated': self.rows_updated
+        }
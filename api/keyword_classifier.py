@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Single-pass keyword classification of transcript text
+
+All keywords from a rule set are compiled into one regular expression shaped like
+a trie (shared prefixes are matched once). One left-to-right scan of the text finds
+every rule keyword, however many rules there are, with the same "keyword occurs
+anywhere in the text" semantics as a substring test, including keywords that
+overlap or contain one another.
+
+Rules are plain data (see DEFAULT_RULES) and can be replaced with a JSON file
+named by TRANSCRIPT_RULES_PATH.
+"""
+
+import os
+import re
+import json
+import zlib
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES: Dict = {
+    # First matching outcome wins
+    'outcomes': [
+        {'label': 'Appointment Scheduled', 'keywords': ['appointment']},
+        {'label': 'Information Inquiry', 'keywords': ['information']},
+        {'label': 'Appointment Rescheduled', 'keywords': ['reschedule']},
+    ],
+    'default_outcome': 'General Inquiry',
+    'sentiment': {
+        'positive': ['good', 'great', 'excellent', 'happy', 'satisfied'],
+        'negative': ['bad', 'terrible', 'unhappy', 'dissatisfied', 'angry'],
+    },
+    # Tags of every matching rule are added, in rule order
+    'tags': [
+        {'keywords': ['appointment'], 'tags': ['Appointments', '#appointment']},
+        {'keywords': ['dr.', 'doctor'], 'tags': ['#doctor']},
+        {'keywords': ['urgent', 'emergency'], 'tags': ['#urgent']},
+    ],
+    'default_tags': ['#general'],
+}
+
+def load_rules(path: Optional[str] = None) -> Dict:
+    """Rules from the JSON file at path (or TRANSCRIPT_RULES_PATH), else DEFAULT_RULES"""
+    path = path or os.getenv('TRANSCRIPT_RULES_PATH')
+    if not path:
+        return DEFAULT_RULES
+    with open(path, 'r') as f:
+        rules = json.load(f)
+    logger.info(f"Loaded transcript classification rules from {path}")
+    return {**DEFAULT_RULES, **rules}
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Regex source matching any of keywords, longest first, with common prefixes factored out"""
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: Dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        alternation = f"(?:{'|'.join(branches)})"
+        # A keyword ends here too; the greedy '?' still prefers the longer keywords
+        return alternation + '?' if '' in node else alternation
+
+    return render(trie)
+
+class KeywordMatcher:
+    """Finds which of a fixed set of keywords occur in a text, in one pass"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: FrozenSet[str] = frozenset(keyword.lower() for keyword in keywords if keyword)
+        self._pattern = re.compile(_trie_pattern(self.keywords)) if self.keywords else None
+        # At any one position only the longest keyword is reported; the shorter
+        # keywords it starts with are present as well
+        self._implied: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset(other for other in self.keywords if keyword.startswith(other))
+            for keyword in self.keywords
+        }
+
+    def find_all(self, text: str) -> Set[str]:
+        """Keywords occurring anywhere in text (which must already be lowercase)"""
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+        search = self._pattern.search
+        match = search(text)
+        while match is not None:
+            keyword = match.group()
+            if keyword not in found:
+                found.update(self._implied[keyword])
+                if len(found) == len(self.keywords):
+                    break
+            # Resume one character after the match start so overlapping keywords are seen too
+            match = search(text, match.start() + 1)
+        return found
+
+class KeywordClassifier:
+    """Outcome, sentiment and tags for a transcript from one keyword scan"""
+
+    def __init__(self, rules: Optional[Dict] = None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.outcomes = [(rule['label'], [k.lower() for k in rule['keywords']]) for rule in self.rules.get('outcomes', [])]
+        self.default_outcome = self.rules.get('default_outcome')
+        sentiment = self.rules.get('sentiment', {})
+        self.positive = frozenset(k.lower() for k in sentiment.get('positive', []))
+        self.negative = frozenset(k.lower() for k in sentiment.get('negative', []))
+        self.tag_rules = [([k.lower() for k in rule['keywords']], list(rule['tags'])) for rule in self.rules.get('tags', [])]
+        self.default_tags = list(self.rules.get('default_tags', []))
+
+        keywords: Set[str] = set(self.positive) | set(self.negative)
+        for _, rule_keywords in self.outcomes:
+            keywords.update(rule_keywords)
+        for rule_keywords, _ in self.tag_rules:
+            keywords.update(rule_keywords)
+        self.matcher = KeywordMatcher(keywords)
+        # Identifies the rule set, so stored results can be recomputed when it changes
+        self.fingerprint = zlib.crc32(json.dumps(self.rules, sort_keys=True).encode('utf-8'))
+
+    def classify(self, text: str) -> Dict:
+        """
+        Classify a text
+
+        Returns:
+            Dictionary with outcome, sentiment, positive_count, negative_count, tags and
+            the set of matched keywords
+        """
+        found = self.matcher.find_all(text.lower())
+
+        outcome = self.default_outcome
+        for label, rule_keywords in self.outcomes:
+            if any(keyword in found for keyword in rule_keywords):
+                outcome = label
+                break
+
+        positive_count = len(found & self.positive)
+        negative_count = len(found & self.negative)
+        if positive_count > negative_count:
+            sentiment = "Positive"
+        elif negative_count > positive_count:
+            sentiment = "Negative"
+        else:
+            sentiment = "Neutral"
+
+        tags: List[str] = []
+        for rule_keywords, rule_tags in self.tag_rules:
+            if any(keyword in found for keyword in rule_keywords):
+                tags.extend(rule_tags)
+        tags.extend(self.default_tags)
+
+        return {
+            'outcome': outcome,
+            'sentiment': sentiment,
+            'positive_count': positive_count,
+            'negative_count': negative_count,
+            'tags': tags,
+            'keywords': found
+        }
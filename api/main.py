@@ -8,17 +8,31 @@ making it accessible to web applications.
 
 import os
 import sys
+import json
+import asyncio
 import logging
 import traceback
+import time
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, Query
+from typing import AsyncIterator, List, Optional, Dict, Any, Set, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import requests
-from elevenlabs_conversations import ElevenLabsAPI
-from area_code_mapping import get_location_from_phone_number
+from elevenlabs_conversations import AsyncElevenLabsAPI
+from conversation_store import ConversationStore, InvalidCursor
+from stats_engine import StatsEngine
+from rollups import AnalyticsRollups
+from columnar import ColumnarSnapshotCache
+from geolocation_cache import PhoneLocationCache
+from geolocation_enrichment import PhoneLocationEnricher, RateLimiter
+from phone_utils import INTERNATIONAL, analyze_phone_numbers, canonical_phone_number, phone_number_cache_stats
+from conversation_ingestion import ConversationIngestor
+from audio_cache import AudioCache
+from query_language import QueryError, parse_query
 
 # Configure logging
 logging.basicConfig(
@@ -31,20 +45,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Add the parent directory to the path so we can import the ElevenLabsAPI
+# Add the parent directory to the path so we can import the AsyncElevenLabsAPI
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
-    from elevenlabs_conversations import ElevenLabsAPI
-    logger.info("Successfully imported ElevenLabsAPI from parent directory")
+    from elevenlabs_conversations import AsyncElevenLabsAPI
+    logger.info("Successfully imported AsyncElevenLabsAPI from parent directory")
 except ImportError:
     # Try importing from the current directory if the above fails
     import sys
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     try:
-        from elevenlabs_conversations import ElevenLabsAPI
-        logger.info("Successfully imported ElevenLabsAPI from current directory")
+        from elevenlabs_conversations import AsyncElevenLabsAPI
+        logger.info("Successfully imported AsyncElevenLabsAPI from current directory")
     except ImportError as e:
-        logger.error(f"Failed to import ElevenLabsAPI: {e}")
+        logger.error(f"Failed to import AsyncElevenLabsAPI: {e}")
         raise
 
 # Load environment variables
@@ -139,6 +153,22 @@ class PhoneNumber(BaseModel):
 
 class SearchResponse(BaseModel):
     conversations: List[ConversationSummary]
+    total_count: Optional[int] = None  # not counted for cursor requests
+    page: int
+    page_size: int
+    next_cursor: Optional[str] = None
+
+class TranscriptSearchHit(BaseModel):
+    conversation_id: str
+    agent_name: Optional[str] = None
+    start_time: str
+    message_index: int
+    role: Optional[str] = None
+    time_in_call_secs: Optional[float] = None
+    snippet: str
+
+class TranscriptSearchResponse(BaseModel):
+    hits: List[TranscriptSearchHit]
     total_count: int
     page: int
     page_size: int
@@ -148,7 +178,7 @@ try:
     # Use the same API key as in elevenlabs_conversations.py
     api_key = os.getenv('ELEVENLABS_API_KEY') or "sk_467eaffa636aa327e1710b5079372557aa112eac1ed4890e"
     logger.info(f"Initializing ElevenLabs API client with key: {api_key[:20]}...")
-    api_client = ElevenLabsAPI(api_key=api_key)
+    api_client = AsyncElevenLabsAPI(api_key=api_key)
     logger.info("✓ Successfully initialized ElevenLabs API client")
 except Exception as e:
     logger.error(f"Failed to initialize ElevenLabs API client: {e}")
@@ -157,7 +187,10 @@ except Exception as e:
 
 # Phone number geolocation service
 class PhoneGeolocationService:
-    def __init__(self):
+    def __init__(self, cache: Optional[PhoneLocationCache] = None):
+        # Provider results by E.164 number, so repeat callers do not spend quota again
+        self.cache = cache
+        
         # NumVerify API (free tier: 100 requests/month)
         self.numverify_api_key = os.getenv("NUMVERIFY_API_KEY")
         self.numverify_url = "http://apilayer.net/api/validate"
@@ -169,90 +202,423 @@ class PhoneGeolocationService:
         # OpenCage for reverse geocoding (free tier: 2,500 requests/day)
         self.opencage_api_key = os.getenv("OPENCAGE_API_KEY")
         self.opencage_url = "https://api.opencagedata.com/geocode/v1/json"
+        
+        # Spread each provider's monthly quota (100 requests) evenly over the month;
+        # the token counts are kept in the store so restarts do not refill them
+        self.limiters = {
+            "NumVerify": self._load_limiter("NumVerify", float(os.getenv("NUMVERIFY_REQUESTS_PER_DAY", str(100 / 30)))),
+            "Abstract": self._load_limiter("Abstract", float(os.getenv("ABSTRACT_REQUESTS_PER_DAY", str(100 / 30)))),
+        }
+    
+    def _load_limiter(self, name: str, requests_per_day: float) -> RateLimiter:
+        saved = None
+        if self.cache is not None:
+            try:
+                saved = json.loads(self.cache.store.get_state(f"rate_limiter:{name}") or 'null')
+            except ValueError:
+                logger.warning(f"Ignoring unreadable saved {name} rate limit state")
+        return RateLimiter.per_day(requests_per_day, saved if isinstance(saved, dict) else None)
+    
+    def _save_limiter(self, name: str) -> None:
+        if self.cache is not None:
+            self.cache.store.set_state(f"rate_limiter:{name}", json.dumps(self.limiters[name].saved_state()))
+    
+    @property
+    def providers_configured(self) -> bool:
+        return bool(self.numverify_api_key or self.abstract_api_key)
+    
+    def lookup_key(self, phone_number: Optional[str]) -> Optional[str]:
+        """E.164 form of a number worth asking the providers about, else None"""
+        return canonical_phone_number(phone_number).key
+    
+    def is_cached(self, e164: str) -> bool:
+        return self.cache is not None and self.cache.get(e164) is not None
     
     def get_phone_location(self, phone_number: str) -> Optional[dict]:
-        """Get location information for a phone number"""
+        """Get location information for a phone number (may call the providers; blocking)"""
         try:
-            # Try NumVerify first
-            if self.numverify_api_key:
-                location = self._try_numverify(phone_number)
-                if location:
-                    return location
-            
-            # Try Abstract API as fallback
-            if self.abstract_api_key:
-                location = self._try_abstract_api(phone_number)
-                if location:
-                    return location
-            
+            e164 = self.lookup_key(phone_number) if self.providers_configured else None
+            location = self.resolve(e164) if e164 else None
             # Use comprehensive area code mapping as final fallback
-            return self._area_code_fallback(phone_number)
+            return location or self._area_code_fallback(phone_number)
             
         except Exception as e:
             logger.error(f"Error getting phone location for {phone_number}: {e}")
             return self._area_code_fallback(phone_number)
     
+    def cached_location(self, phone_number: str) -> dict:
+        """Location from the cache or the area code mapping; never calls the providers"""
+        e164 = self.lookup_key(phone_number) if self.providers_configured else None
+        cached = self.cache.get(e164) if e164 and self.cache else None
+        if cached is not None and cached['location']:
+            return cached['location']
+        return self._area_code_fallback(phone_number)
+    
+    def local_region(self, phone_number: str) -> str:
+        """Region for the conversations table: a cached provider region, else the area code location"""
+        return self.cached_location(phone_number).get('region') or canonical_phone_number(phone_number).location
+    
+    def local_regions(self, phone_numbers: List[str]) -> List[str]:
+        """
+        local_region for many numbers, normalized and located in one batch
+        
+        Provider results are read from the store in bulk rather than through the
+        cache, so a backfill over every stored number does not flood its LRU.
+        """
+        batch = analyze_phone_numbers(phone_numbers)
+        if not (self.providers_configured and self.cache):
+            return batch.locations
+        stored = self.cache.store.get_phone_locations(e164 for e164 in batch.keys if e164)
+        regions = []
+        for e164, location in zip(batch.keys, batch.locations):
+            provider = stored.get(e164) if e164 else None
+            regions.append((provider or {}).get('region') or location)
+        return regions
+    
+    def resolve(self, e164: str) -> Optional[dict]:
+        """Provider result for an E.164 number, from the cache or the providers (blocking); None if unknown"""
+        cached = self.cache.get(e164) if self.cache else None
+        if cached is not None:
+            return cached['location']
+        
+        location, definitive = self._lookup_providers(e164)
+        # Provider errors (timeouts, exhausted quota or rate budget) are retried later
+        if definitive and self.cache:
+            self.cache.put(e164, location)
+        return location
+    
+    def _lookup_providers(self, phone_number: str) -> Tuple[Optional[dict], bool]:
+        """
+        Ask the configured providers in turn (NumVerify first, then Abstract API)
+        
+        Returns:
+            (location or None, whether the answer is definitive, i.e. no provider failed)
+        """
+        providers = []
+        if self.numverify_api_key:
+            providers.append(("NumVerify", self._try_numverify))
+        if self.abstract_api_key:
+            providers.append(("Abstract", self._try_abstract_api))
+        
+        definitive = True
+        for name, lookup in providers:
+            if not self.limiters[name].try_acquire():
+                logger.info(f"{name} request budget used up; {phone_number} will be retried later")
+                definitive = False
+                continue
+            self._save_limiter(name)
+            try:
+                location = lookup(phone_number)
+            except Exception as e:
+                logger.error(f"{name} API error: {e}")
+                definitive = False
+                continue
+            if location:
+                return location, True
+        return None, definitive
+    
     def _try_numverify(self, phone_number: str) -> Optional[dict]:
-        """Try NumVerify API"""
-        try:
-            params = {
-                'access_key': self.numverify_api_key,
-                'number': phone_number,
-                'format': 1
+        """Try NumVerify API; raises if the lookup itself failed"""
+        params = {
+            'access_key': self.numverify_api_key,
+            'number': phone_number,
+            'format': 1
+        }
+        response = requests.get(self.numverify_url, params=params, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        # Quota and key errors come back as HTTP 200 with an error object
+        if data.get('error'):
+            raise RuntimeError(data['error'].get('info') or data['error'])
+        
+        if data.get('valid'):
+            return {
+                'country': data.get('country_name'),
+                'region': data.get('location'),
+                'carrier': data.get('carrier'),
+                'line_type': data.get('line_type'),
+                'formatted': data.get('international_format')
             }
-            response = requests.get(self.numverify_url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('valid'):
-                return {
-                    'country': data.get('country_name'),
-                    'region': data.get('location'),
-                    'carrier': data.get('carrier'),
-                    'line_type': data.get('line_type'),
-                    'formatted': data.get('international_format')
-                }
-        except Exception as e:
-            logger.error(f"NumVerify API error: {e}")
         return None
     
     def _try_abstract_api(self, phone_number: str) -> Optional[dict]:
-        """Try Abstract API"""
-        try:
-            params = {
-                'api_key': self.abstract_api_key,
-                'phone': phone_number
+        """Try Abstract API; raises if the lookup itself failed"""
+        params = {
+            'api_key': self.abstract_api_key,
+            'phone': phone_number
+        }
+        response = requests.get(self.abstract_url, params=params, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get('valid'):
+            return {
+                'country': data.get('country', {}).get('name'),
+                'region': data.get('region', {}).get('name'),
+                'carrier': data.get('carrier'),
+                'line_type': data.get('type'),
+                'formatted': data.get('format', {}).get('international')
             }
-            response = requests.get(self.abstract_url, params=params, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('valid'):
-                return {
-                    'country': data.get('country', {}).get('name'),
-                    'region': data.get('region', {}).get('name'),
-                    'carrier': data.get('carrier'),
-                    'line_type': data.get('type'),
-                    'formatted': data.get('format', {}).get('international')
-                }
-        except Exception as e:
-            logger.error(f"Abstract API error: {e}")
         return None
     
     def _area_code_fallback(self, phone_number: str) -> dict:
         """Use comprehensive area code mapping"""
-        location = get_location_from_phone_number(phone_number)
+        phone = canonical_phone_number(phone_number)
+        location = phone.location
         
         return {
-            'country': 'United States',
+            # Outside the NANP the prefix table only knows the country
+            'country': location if phone.category == INTERNATIONAL else 'United States',
             'region': location,
             'carrier': 'Unknown',
             'line_type': 'mobile',
             'formatted': phone_number
         }
 
-# Initialize geolocation service
-geolocation_service = PhoneGeolocationService()
+def build_conversation_summary(conv: Dict, details: Optional[Dict], analysis: Optional[Dict] = None) -> ConversationSummary:
+    """
+    Build the list-view summary for a conversation
+    
+    Args:
+        conv: Conversation summary from the list endpoint
+        details: Conversation details (the transcript is not needed)
+        analysis: Stored transcript analysis from transcript_analysis.analyze_transcript
+    """
+    conv_id = conv.get('conversation_id', 'unknown')
+    
+    # Extract caller information from metadata
+    caller_name = None
+    caller_phone = None
+    location = None
+    analysis = analysis or {}
+    summary = analysis.get('summary')
+    outcome = analysis.get('outcome')
+    sentiment = analysis.get('sentiment')
+    rating = analysis.get('rating')
+    tags = list(analysis.get('tags') or [])
+    
+    if details:
+        logger.info(f"Retrieved details for conversation {conv_id}")
+        logger.info(f"Details keys: {list(details.keys())}")
+
+        # Print detailed metadata information from detailed conversation
+        details_metadata = details.get('metadata', {})
+        logger.info(f"📋 DETAILED METADATA for conversation {conv_id}:")
+        logger.info(f"   Metadata keys: {list(details_metadata.keys())}")
+        logger.info(f"   Full metadata: {details_metadata}")
+
+        # Show user-friendly phone information from detailed data
+        if details_metadata.get('phone_number'):
+            phone_number_data = details_metadata.get('phone_number', {})
+            logger.info(f"📱 DETAILED PHONE NUMBER INFO:")
+            logger.info(f"   Phone Number: {phone_number_data.get('phone_number', 'N/A')}")
+            logger.info(f"   Label: {phone_number_data.get('label', 'N/A')}")
+            logger.info(f"   Provider: {phone_number_data.get('provider', 'N/A')}")
+            if phone_number_data.get('assigned_agent'):
+                agent = phone_number_data.get('assigned_agent', {})
+                logger.info(f"   Assigned Agent: {agent.get('agent_name', 'N/A')}")
+        else:
+            logger.info(f"❌ No phone_number data found in detailed metadata")
+
+        if details_metadata.get('phone_call'):
+            logger.info(f"📞 Found phone_call in details metadata: {details_metadata.get('phone_call')}")
+        else:
+            logger.info(f"❌ No phone_call in details metadata for {conv_id}")
+    elif conv_id:
+        logger.warning(f"No details found for conversation {conv_id}")
+    
+    # Generate caller name from agent name or conversation ID
+    agent_name = conv.get('agent_name', 'Unknown')
+    if agent_name == 'Eric':
+        caller_name = f"Caller {conv.get('conversation_id', '')[-4:]}"
+    elif agent_name == 'Emma':
+        caller_name = f"Patient {conv.get('conversation_id', '')[-4:]}"
+    else:
+        caller_name = f"User {conv.get('conversation_id', '')[-4:]}"
+
+    # Generate phone number from conversation details or use a placeholder
+    # In real implementation, this would come from the phone_call data
+    caller_phone = None
+
+    # Debug: Log what's in the conversation object
+    logger.info(f"Conversation {conv_id} keys: {list(conv.keys())}")
+
+    # Print detailed metadata information
+    metadata = conv.get('metadata', {})
+    logger.info(f"📋 METADATA DETAILS for conversation {conv_id}:")
+    logger.info(f"   Metadata keys: {list(metadata.keys())}")
+    logger.info(f"   Full metadata: {metadata}")
+
+    # Show user-friendly phone information
+    if metadata.get('phone_number'):
+        phone_number_data = metadata.get('phone_number', {})
+        logger.info(f"📱 PHONE NUMBER INFO:")
+        logger.info(f"   Phone Number: {phone_number_data.get('phone_number', 'N/A')}")
+        logger.info(f"   Label: {phone_number_data.get('label', 'N/A')}")
+        logger.info(f"   Provider: {phone_number_data.get('provider', 'N/A')}")
+        if phone_number_data.get('assigned_agent'):
+            agent = phone_number_data.get('assigned_agent', {})
+            logger.info(f"   Assigned Agent: {agent.get('agent_name', 'N/A')}")
+    else:
+        logger.info(f"❌ No phone_number data found in metadata")
+
+    if metadata.get('phone_call'):
+        logger.info(f"📞 Found phone_call data in metadata: {metadata.get('phone_call')}")
+    else:
+        logger.info(f"❌ No phone_call data found in metadata for conversation {conv_id}")
+
+    # Try to get phone number from conversation metadata
+    if conv.get('metadata', {}).get('phone_call'):
+        phone_call = conv.get('metadata', {}).get('phone_call', {})
+        caller_phone = phone_call.get('external_number') or phone_call.get('agent_number')
+        logger.info(f"Extracted phone number from metadata: {caller_phone}")
+
+    # If we have detailed conversation data, try to get phone number from there
+    if not caller_phone and details and details.get('metadata', {}).get('phone_call'):
+        phone_call = details.get('metadata', {}).get('phone_call', {})
+        caller_phone = phone_call.get('external_number') or phone_call.get('agent_number')
+        logger.info(f"Extracted phone number from details metadata: {caller_phone}")
+
+    # If no phone number found, use a generic placeholder
+    if not caller_phone:
+        caller_phone = "+1-XXX-XXX-XXXX"  # Generic placeholder
+        logger.info(f"Using placeholder phone number: {caller_phone}")
+
+    # Cached provider location or the area code mapping; numbers not looked up yet are
+    # resolved in the background (see PhoneLocationEnricher) and show up on a later load
+    try:
+        location_info = geolocation_service.cached_location(caller_phone)
+        location = location_info.get('region', 'Unknown Location')
+        logger.debug(f"Location for {caller_phone}: {location}")
+    except Exception as e:
+        logger.warning(f"Failed to get location for {caller_phone}: {e}")
+        location = "Unknown Location"
+
+    # Convert call_successful from string to boolean
+    call_successful_raw = conv.get('call_successful', False)
+    if isinstance(call_successful_raw, str):
+        call_successful = call_successful_raw.lower() in ['success', 'true', '1', 'yes']
+    else:
+        call_successful = bool(call_successful_raw)
+
+    # Extract phone call information from conversation details
+    phone_call_info = None
+    phone_call_data = None
+
+    # Try to get phone call data from conversation metadata
+    if conv.get('metadata', {}).get('phone_call'):
+        phone_call_data = conv.get('metadata', {}).get('phone_call', {})
+        logger.info(f"Using phone_call from conversation metadata: {phone_call_data}")
+
+    # If not available in conversation metadata, try detailed data metadata
+    elif details and details.get('metadata', {}).get('phone_call'):
+        phone_call_data = details.get('metadata', {}).get('phone_call', {})
+        logger.info(f"Using phone_call from detailed data metadata: {phone_call_data}")
+
+    # Create PhoneCallInfo if we have data
+    if phone_call_data:
+        phone_call_info = PhoneCallInfo(
+            direction=phone_call_data.get('direction'),
+            phone_number_id=phone_call_data.get('phone_number_id'),
+            agent_number=phone_call_data.get('agent_number'),
+            external_number=phone_call_data.get('external_number'),
+            type=phone_call_data.get('type'),
+            stream_sid=phone_call_data.get('stream_sid'),
+            call_sid=phone_call_data.get('call_sid')
+        )
+        logger.info(f"Created PhoneCallInfo: {phone_call_info}")
+    else:
+        logger.info(f"No phone_call data available in metadata for conversation {conv_id}")
+
+    return ConversationSummary(
+        conversation_id=conv.get('conversation_id', ''),
+        agent_id=conv.get('agent_id', ''),
+        agent_name=agent_name,
+        start_time=datetime.fromtimestamp(conv.get('start_time_unix_secs', 0)).strftime("%Y-%m-%d %H:%M:%S UTC"),
+        call_duration_secs=conv.get('call_duration_secs', 0),
+        message_count=conv.get('message_count', 0),
+        status=conv.get('status', 'unknown'),
+        call_successful=call_successful,
+        caller_name=caller_name,
+        caller_phone=caller_phone,
+        location=location,
+        summary=summary,
+        outcome=outcome,
+        sentiment=sentiment,
+        rating=rating,
+        tags=tags,
+        phone_call=phone_call_info
+    )
+
+# Local conversation store, kept current by a background ingestion task
+conversation_store = ConversationStore()
+ingestor = ConversationIngestor(
+    api_client,
+    conversation_store,
+    # Maximum number of conversation detail requests in flight at once
+    details_concurrency=int(os.getenv('DETAILS_FETCH_CONCURRENCY', '10')),
+    # Per-conversation timeout (seconds) so one slow upstream call cannot stall a whole batch
+    details_timeout=float(os.getenv('DETAILS_FETCH_TIMEOUT', '15'))
+)
+# Running totals for /api/stats, built from the store now and updated as conversations are written
+stats_engine = StatsEngine()
+stats_engine.attach(conversation_store)
+# Minute/hour/day buckets behind /api/analytics/timeseries, maintained the same way
+analytics_rollups = AnalyticsRollups()
+analytics_rollups.attach(conversation_store)
+# NumPy column snapshot for ad-hoc dashboard aggregates, rebuilt when stale
+columnar_snapshots = ColumnarSnapshotCache(conversation_store)
+# Geolocation lookups are cached in the store, so it is created after it
+geolocation_service = PhoneGeolocationService(PhoneLocationCache(conversation_store))
+# Stored locations use cached provider results where there is one
+conversation_store.location_resolver = geolocation_service.local_region
+# Provider lookups for new numbers (from ingestion or page views) run in the background
+phone_enricher = PhoneLocationEnricher(
+    geolocation_service,
+    conversation_store,
+    concurrency=int(os.getenv('GEOLOCATION_CONCURRENCY', '4'))
+)
+conversation_store.add_listener(phone_enricher.on_row_change)
+# How long a request waits for the first ingestion pass after startup before serving what is stored
+INGEST_READY_TIMEOUT = float(os.getenv('INGEST_READY_TIMEOUT', '30'))
+
+# Recordings are downloaded once and then served from local disk
+audio_cache = AudioCache()
+
+# Stored locations are recomputed once per start, picking up prefix data and cached
+# provider results that changed since the rows were written
+location_backfill_task: Optional[asyncio.Task] = None
+
+async def backfill_locations():
+    try:
+        changed = await asyncio.to_thread(conversation_store.backfill_locations, geolocation_service.local_regions)
+        logger.info(f"Location backfill updated {changed} conversations")
+    except Exception as e:
+        logger.error(f"Location backfill failed: {e}")
+
+@app.on_event("startup")
+async def start_ingestion():
+    """Start keeping the local conversation store in sync with ElevenLabs"""
+    global location_backfill_task
+    location_backfill_task = asyncio.create_task(backfill_locations())
+    phone_enricher.start()
+    if api_client:
+        ingestor.start()
+        logger.info("Started background conversation ingestion")
+
+@app.on_event("shutdown")
+async def close_api_client():
+    """Stop ingestion and release pooled upstream connections on shutdown"""
+    await ingestor.stop()
+    await phone_enricher.stop()
+    if location_backfill_task:
+        # The backfill runs in a worker thread; let it finish before the store closes
+        await location_backfill_task
+    if api_client:
+        await api_client.aclose()
+        logger.info("Closed ElevenLabs API client")
+    conversation_store.close()
+    await asyncio.to_thread(audio_cache.flush)
 
 @app.options("/{full_path:path}")
 async def preflight_handler(full_path: str):
@@ -266,297 +632,142 @@ async def root():
     logger.info("Health check endpoint accessed")
     return {"message": "ElevenLabs API Server is running", "status": "healthy"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Runtime metrics for sizing the server (upstream connection pool usage)"""
+    logger.info("GET /api/metrics called")
+
+    if not api_client:
+        logger.error("API client not initialized")
+        raise HTTPException(status_code=500, detail="API client not initialized")
+
+    return {
+        "upstream_pool": api_client.pool_stats(),
+        "details_cache": api_client.details_cache.stats(),
+        "single_flight": api_client.single_flight.stats(),
+        "audio_cache": audio_cache.stats(),
+        "analytics_buckets": analytics_rollups.stats(),
+        "phone_location_cache": geolocation_service.cache.stats(),
+        "phone_numbers": phone_number_cache_stats(),
+        "phone_enrichment": {
+            **phone_enricher.stats(),
+            "rate_limits": {name: limiter.stats() for name, limiter in geolocation_service.limiters.items()}
+        },
+        "ingestion": ingestor.last_sync
+    }
+
 @app.get("/api/conversations", response_model=SearchResponse)
 async def get_conversations(
     page: int = Query(default=1, ge=1, description="Page number"),
     page_size: int = Query(default=20, ge=1, le=100, description="Number of conversations per page"),
     search: Optional[str] = Query(default=None, description="Search query for conversations"),
     status: Optional[str] = Query(default=None, description="Filter by conversation status"),
-    agent_id: Optional[str] = Query(default=None, description="Filter by agent ID")
+    agent_id: Optional[str] = Query(default=None, description="Filter by agent ID"),
+    direction: Optional[str] = Query(default=None, description="Filter by call direction (inbound/outbound)"),
+    location: Optional[str] = Query(default=None, description='Filter by caller location, e.g. "San Jose, CA"'),
+    start_after: Optional[int] = Query(default=None, description="Only calls started at or after this Unix time"),
+    start_before: Optional[int] = Query(default=None, description="Only calls started before this Unix time"),
+    q: Optional[str] = Query(default=None, description='Structured query, e.g. duration>120 sentiment:negative location:"San Jose, CA" after:2024-05-01 sort:-duration'),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page; replaces page")
 ):
     """Get all conversations with optional filtering and pagination"""
-    logger.info(f"GET /api/conversations called with params: page={page}, page_size={page_size}, search={search}, status={status}, agent_id={agent_id}")
+    logger.info(f"GET /api/conversations called with params: page={page}, page_size={page_size}, search={search}, status={status}, agent_id={agent_id}, direction={direction}, location={location}, start_after={start_after}, start_before={start_before}, q={q}, cursor={cursor}")
     
     if not api_client:
         logger.error("API client not initialized")
         raise HTTPException(status_code=500, detail="API client not initialized")
     
     try:
-        logger.info("Retrieving conversations from ElevenLabs API...")
-        conversations = api_client.get_conversations()
-        logger.info(f"Retrieved {len(conversations)} conversations from API")
-        
-        # Apply filters
-        filtered_conversations = conversations
-        logger.info(f"Starting with {len(filtered_conversations)} conversations")
-        
-        if status:
-            filtered_conversations = [c for c in filtered_conversations if c.get('status') == status]
-            logger.info(f"After status filter '{status}': {len(filtered_conversations)} conversations")
-        
-        if agent_id:
-            filtered_conversations = [c for c in filtered_conversations if c.get('agent_id') == agent_id]
-            logger.info(f"After agent_id filter '{agent_id}': {len(filtered_conversations)} conversations")
-        
-        if search:
-            # Simple text search in conversation data
-            search_lower = search.lower()
-            filtered_conversations = [
-                c for c in filtered_conversations
-                if (search_lower in str(c.get('agent_name', '')).lower() or
-                    search_lower in str(c.get('conversation_id', '')).lower())
-            ]
-            logger.info(f"After search filter '{search}': {len(filtered_conversations)} conversations")
-        
-        # Apply pagination
-        total_count = len(filtered_conversations)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_conversations = filtered_conversations[start_idx:end_idx]
-        logger.info(f"Pagination: showing {len(paginated_conversations)} conversations (page {page}, size {page_size})")
-        
-        # Convert to response format
-        conversation_summaries = []
-        for i, conv in enumerate(paginated_conversations):
-            try:
-                conv_id = conv.get('conversation_id', 'unknown')
-                logger.info(f"Processing conversation {i+1}/{len(paginated_conversations)}: {conv_id}")
-                
-                # Extract caller information from transcript or metadata
-                caller_name = None
-                caller_phone = None
-                location = None
-                summary = None
-                outcome = None
-                sentiment = None
-                rating = None
-                tags = []
-                
-                # Try to get more details for this conversation
-                if conv_id:
-                    logger.info(f"Getting details for conversation: {conv_id}")
-                    details = api_client.get_conversation_details(conv_id)
-                    if details:
-                        logger.info(f"Retrieved details for conversation {conv_id}")
-                        logger.info(f"Details keys: {list(details.keys())}")
-                        
-                        # Print detailed metadata information from detailed conversation
-                        details_metadata = details.get('metadata', {})
-                        logger.info(f"📋 DETAILED METADATA for conversation {conv_id}:")
-                        logger.info(f"   Metadata keys: {list(details_metadata.keys())}")
-                        logger.info(f"   Full metadata: {details_metadata}")
-                        
-                        # Show user-friendly phone information from detailed data
-                        if details_metadata.get('phone_number'):
-                            phone_number_data = details_metadata.get('phone_number', {})
-                            logger.info(f"📱 DETAILED PHONE NUMBER INFO:")
-                            logger.info(f"   Phone Number: {phone_number_data.get('phone_number', 'N/A')}")
-                            logger.info(f"   Label: {phone_number_data.get('label', 'N/A')}")
-                            logger.info(f"   Provider: {phone_number_data.get('provider', 'N/A')}")
-                            if phone_number_data.get('assigned_agent'):
-                                agent = phone_number_data.get('assigned_agent', {})
-                                logger.info(f"   Assigned Agent: {agent.get('agent_name', 'N/A')}")
-                        else:
-                            logger.info(f"❌ No phone_number data found in detailed metadata")
-                        
-                        if details_metadata.get('phone_call'):
-                            logger.info(f"📞 Found phone_call in details metadata: {details_metadata.get('phone_call')}")
-                        else:
-                            logger.info(f"❌ No phone_call in details metadata for {conv_id}")
-                        
-                        # Extract summary and other details from transcript
-                        transcript = details.get('transcript', [])
-                        if transcript:
-                            logger.info(f"Processing transcript with {len(transcript)} messages")
-                            # Generate a simple summary from the first few messages
-                            messages = [msg.get('message', '') or '' for msg in transcript[:3]]
-                            summary = " ".join(messages)[:100] + "..." if messages and any(messages) else None
-                            
-                            # Determine outcome based on conversation content
-                            full_text = " ".join([msg.get('message', '') or '' for msg in transcript]).lower()
-                            if 'appointment' in full_text:
-                                outcome = "Appointment Scheduled"
-                            elif 'information' in full_text:
-                                outcome = "Information Inquiry"
-                            elif 'reschedule' in full_text:
-                                outcome = "Appointment Rescheduled"
-                            else:
-                                outcome = "General Inquiry"
-                            
-                            # Simple sentiment analysis
-                            positive_words = ['good', 'great', 'excellent', 'happy', 'satisfied']
-                            negative_words = ['bad', 'terrible', 'unhappy', 'dissatisfied', 'angry']
-                            
-                            positive_count = sum(1 for word in positive_words if word in full_text)
-                            negative_count = sum(1 for word in negative_words if word in full_text)
-                            
-                            if positive_count > negative_count:
-                                sentiment = "Positive"
-                            elif negative_count > positive_count:
-                                sentiment = "Negative"
-                            else:
-                                sentiment = "Neutral"
-                            
-                            # Generate a random rating (in real implementation, this would come from actual data)
-                            import random
-                            rating = round(random.uniform(3.5, 5.0), 1)
-                            
-                            # Generate tags based on content
-                            if 'appointment' in full_text:
-                                tags.extend(['Appointments', '#appointment'])
-                            if 'dr.' in full_text or 'doctor' in full_text:
-                                tags.extend(['#doctor'])
-                            if 'urgent' in full_text or 'emergency' in full_text:
-                                tags.extend(['#urgent'])
-                            tags.extend(['#general'])
-                            
-                            logger.info(f"Generated summary for {conv_id}: outcome={outcome}, sentiment={sentiment}, rating={rating}")
-                    else:
-                        logger.warning(f"No details found for conversation {conv_id}")
-                
-                # Generate caller name from agent name or conversation ID
-                agent_name = conv.get('agent_name', 'Unknown')
-                if agent_name == 'Eric':
-                    caller_name = f"Caller {conv.get('conversation_id', '')[-4:]}"
-                elif agent_name == 'Emma':
-                    caller_name = f"Patient {conv.get('conversation_id', '')[-4:]}"
-                else:
-                    caller_name = f"User {conv.get('conversation_id', '')[-4:]}"
-                
-                # Generate phone number from conversation details or use a placeholder
-                # In real implementation, this would come from the phone_call data
-                caller_phone = None
-                
-                # Debug: Log what's in the conversation object
-                logger.info(f"Conversation {conv_id} keys: {list(conv.keys())}")
-                
-                # Print detailed metadata information
-                metadata = conv.get('metadata', {})
-                logger.info(f"📋 METADATA DETAILS for conversation {conv_id}:")
-                logger.info(f"   Metadata keys: {list(metadata.keys())}")
-                logger.info(f"   Full metadata: {metadata}")
-                
-                # Show user-friendly phone information
-                if metadata.get('phone_number'):
-                    phone_number_data = metadata.get('phone_number', {})
-                    logger.info(f"📱 PHONE NUMBER INFO:")
-                    logger.info(f"   Phone Number: {phone_number_data.get('phone_number', 'N/A')}")
-                    logger.info(f"   Label: {phone_number_data.get('label', 'N/A')}")
-                    logger.info(f"   Provider: {phone_number_data.get('provider', 'N/A')}")
-                    if phone_number_data.get('assigned_agent'):
-                        agent = phone_number_data.get('assigned_agent', {})
-                        logger.info(f"   Assigned Agent: {agent.get('agent_name', 'N/A')}")
-                else:
-                    logger.info(f"❌ No phone_number data found in metadata")
-                
-                if metadata.get('phone_call'):
-                    logger.info(f"📞 Found phone_call data in metadata: {metadata.get('phone_call')}")
-                else:
-                    logger.info(f"❌ No phone_call data found in metadata for conversation {conv_id}")
-                
-                # Try to get phone number from conversation metadata
-                if conv.get('metadata', {}).get('phone_call'):
-                    phone_call = conv.get('metadata', {}).get('phone_call', {})
-                    caller_phone = phone_call.get('external_number') or phone_call.get('agent_number')
-                    logger.info(f"Extracted phone number from metadata: {caller_phone}")
-                
-                # If we have detailed conversation data, try to get phone number from there
-                if not caller_phone and details and details.get('metadata', {}).get('phone_call'):
-                    phone_call = details.get('metadata', {}).get('phone_call', {})
-                    caller_phone = phone_call.get('external_number') or phone_call.get('agent_number')
-                    logger.info(f"Extracted phone number from details metadata: {caller_phone}")
-                
-                # If no phone number found, use a generic placeholder
-                if not caller_phone:
-                    caller_phone = "+1-XXX-XXX-XXXX"  # Generic placeholder
-                    logger.info(f"Using placeholder phone number: {caller_phone}")
-                
-                # Get real location from phone number using comprehensive area code mapping
-                try:
-                    location_info = geolocation_service.get_phone_location(caller_phone)
-                    location = location_info.get('region', 'Unknown Location')
-                    logger.debug(f"Location for {caller_phone}: {location}")
-                except Exception as e:
-                    logger.warning(f"Failed to get location for {caller_phone}: {e}")
-                    location = "Unknown Location"
-                
-                # Convert call_successful from string to boolean
-                call_successful_raw = conv.get('call_successful', False)
-                if isinstance(call_successful_raw, str):
-                    call_successful = call_successful_raw.lower() in ['success', 'true', '1', 'yes']
-                else:
-                    call_successful = bool(call_successful_raw)
-                
-                # Extract phone call information from conversation details
-                phone_call_info = None
-                phone_call_data = None
-                
-                # Try to get phone call data from conversation metadata
-                if conv.get('metadata', {}).get('phone_call'):
-                    phone_call_data = conv.get('metadata', {}).get('phone_call', {})
-                    logger.info(f"Using phone_call from conversation metadata: {phone_call_data}")
-                
-                # If not available in conversation metadata, try detailed data metadata
-                elif details and details.get('metadata', {}).get('phone_call'):
-                    phone_call_data = details.get('metadata', {}).get('phone_call', {})
-                    logger.info(f"Using phone_call from detailed data metadata: {phone_call_data}")
-                
-                # Create PhoneCallInfo if we have data
-                if phone_call_data:
-                    phone_call_info = PhoneCallInfo(
-                        direction=phone_call_data.get('direction'),
-                        phone_number_id=phone_call_data.get('phone_number_id'),
-                        agent_number=phone_call_data.get('agent_number'),
-                        external_number=phone_call_data.get('external_number'),
-                        type=phone_call_data.get('type'),
-                        stream_sid=phone_call_data.get('stream_sid'),
-                        call_sid=phone_call_data.get('call_sid')
-                    )
-                    logger.info(f"Created PhoneCallInfo: {phone_call_info}")
-                else:
-                    logger.info(f"No phone_call data available in metadata for conversation {conv_id}")
-                
-                conversation_summaries.append(ConversationSummary(
-                    conversation_id=conv.get('conversation_id', ''),
-                    agent_id=conv.get('agent_id', ''),
-                    agent_name=agent_name,
-                    start_time=datetime.fromtimestamp(conv.get('start_time_unix_secs', 0)).strftime("%Y-%m-%d %H:%M:%S UTC"),
-                    call_duration_secs=conv.get('call_duration_secs', 0),
-                    message_count=conv.get('message_count', 0),
-                    status=conv.get('status', 'unknown'),
-                    call_successful=call_successful,
-                    caller_name=caller_name,
-                    caller_phone=caller_phone,
-                    location=location,
-                    summary=summary,
-                    outcome=outcome,
-                    sentiment=sentiment,
-                    rating=rating,
-                    tags=tags,
-                    phone_call=phone_call_info
-                ))
-                logger.debug(f"Successfully processed conversation {conv_id}")
-            except Exception as conv_error:
-                logger.error(f"Error processing conversation {conv.get('conversation_id', 'unknown')}: {str(conv_error)}")
-                logger.error(f"Traceback for conversation error: {traceback.format_exc()}")
-                # Skip this conversation and continue with the next one
-                continue
+        parsed_query = parse_query(q) if q else None
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+    
+    try:
+        await ingestor.wait_until_ready(INGEST_READY_TIMEOUT)
+        
+        # Filter and paginate in the local store, in a worker thread: ingestion writes
+        # hold the store lock, and the event loop must not wait for them
+        # Cursor pages seek straight to their first row and skip the full count
+        page_rows, total_count, next_cursor = await asyncio.to_thread(
+            conversation_store.list_conversations,
+            status=status,
+            agent_id=agent_id,
+            search=search,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            query=parsed_query,
+            direction=direction,
+            location=location,
+            start_after=start_after,
+            start_before=start_before,
+            cursor=cursor,
+            count_total=cursor is None
+        )
+        logger.info(f"Store query matched {total_count} conversations, showing {len(page_rows)} (page {page}, size {page_size})")
+        paginated_conversations = [conv for conv, _, _ in page_rows]
+        details_list = [details for _, details, _ in page_rows]
+        analysis_list = [analysis for _, _, analysis in page_rows]
+        
+        # Details that have not been ingested yet are fetched concurrently and stored (analysis included)
+        missing = [i for i, details in enumerate(details_list) if details is None]
+        if missing:
+            fetched = await ingestor.fetch_and_store_details(
+                [paginated_conversations[i].get('conversation_id') for i in missing]
+            )
+            for i, details in zip(missing, fetched):
+                details_list[i] = details
+            # Analyses of the newly stored details, read back in one query
+            analyzed = [paginated_conversations[i].get('conversation_id') for i, details in zip(missing, fetched) if details]
+            if analyzed:
+                analyses = await asyncio.to_thread(conversation_store.get_analyses, analyzed)
+                for i in missing:
+                    if details_list[i]:
+                        analysis_list[i] = analyses.get(paginated_conversations[i].get('conversation_id'))
+        
+        # Convert to response format; cached locations may be read from the store
+        conversation_summaries = await asyncio.to_thread(
+            build_conversation_summaries, paginated_conversations, details_list, analysis_list
+        )
         
         logger.info(f"Successfully processed {len(conversation_summaries)} conversations")
+        # Numbers on this page without a provider lookup yet are resolved in the background
+        phone_enricher.enqueue(summary.caller_phone for summary in conversation_summaries)
         response = SearchResponse(
             conversations=conversation_summaries,
             total_count=total_count,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            next_cursor=next_cursor
         )
         logger.info(f"Returning response with {len(conversation_summaries)} conversations")
         return response
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in get_conversations: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error retrieving conversations: {str(e)}")
 
+def build_conversation_summaries(
+    conversations: List[Dict],
+    details_list: List[Optional[Dict]],
+    analysis_list: List[Optional[Dict]]
+) -> List[ConversationSummary]:
+    """build_conversation_summary for a page of conversations, skipping any that fail"""
+    conversation_summaries = []
+    for i, (conv, details, analysis) in enumerate(zip(conversations, details_list, analysis_list)):
+        try:
+            logger.info(f"Processing conversation {i+1}/{len(conversations)}: {conv.get('conversation_id', 'unknown')}")
+            conversation_summaries.append(build_conversation_summary(conv, details, analysis))
+            logger.debug(f"Successfully processed conversation {conv.get('conversation_id', 'unknown')}")
+        except Exception as conv_error:
+            logger.error(f"Error processing conversation {conv.get('conversation_id', 'unknown')}: {str(conv_error)}")
+            logger.error(f"Traceback for conversation error: {traceback.format_exc()}")
+            # Skip this conversation and continue with the next one
+            continue
+    return conversation_summaries
+
 @app.get("/api/conversations/{conversation_id}", response_model=ConversationDetails)
 async def get_conversation_details(conversation_id: str):
     """Get detailed information about a specific conversation"""
@@ -568,7 +779,10 @@ async def get_conversation_details(conversation_id: str):
     
     try:
         logger.info(f"Retrieving details for conversation: {conversation_id}")
-        details = api_client.get_conversation_details(conversation_id)
+        details = await asyncio.to_thread(conversation_store.get_details, conversation_id)
+        if not details:
+            # Not ingested yet: fetch from ElevenLabs and keep it
+            details = (await ingestor.fetch_and_store_details([conversation_id]))[0]
         if not details:
             logger.warning(f"Conversation not found: {conversation_id}")
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -651,6 +865,58 @@ async def get_conversation_details(conversation_id: str):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error retrieving conversation details: {str(e)}")
 
+@app.get("/api/search/transcripts", response_model=TranscriptSearchResponse)
+async def search_transcripts(
+    q: str = Query(..., min_length=1, description='Search text; "quoted text" matches an exact phrase'),
+    near: Optional[int] = Query(default=None, ge=0, le=100, description="Maximum distance in words between the phrases and words of q"),
+    conversation_id: Optional[str] = Query(default=None, description="Only search this conversation"),
+    page: int = Query(default=1, ge=1, description="Page number"),
+    page_size: int = Query(default=20, ge=1, le=100, description="Number of hits per page")
+):
+    """
+    Find the transcript messages matching a phrase or proximity query
+    
+    Each hit carries the message's role and time_in_call_secs, so the caller can
+    seek the recording straight to it, and an HTML-escaped snippet with the matches
+    wrapped in <mark></mark>; full transcripts are not returned.
+    """
+    logger.info(f"GET /api/search/transcripts called with q={q}, near={near}, conversation_id={conversation_id}, page={page}, page_size={page_size}")
+    
+    try:
+        await ingestor.wait_until_ready(INGEST_READY_TIMEOUT)
+        
+        hits, total_count = await asyncio.to_thread(
+            conversation_store.search_messages,
+            q,
+            near=near,
+            conversation_id=conversation_id,
+            limit=page_size,
+            offset=(page - 1) * page_size
+        )
+        logger.info(f"Transcript search matched {total_count} messages, showing {len(hits)}")
+        return TranscriptSearchResponse(
+            hits=[
+                TranscriptSearchHit(
+                    conversation_id=hit['conversation_id'],
+                    agent_name=hit['agent_name'],
+                    start_time=datetime.fromtimestamp(hit['start_time_unix_secs'] or 0).strftime("%Y-%m-%d %H:%M:%S UTC"),
+                    message_index=hit['message_index'],
+                    role=hit['role'],
+                    time_in_call_secs=hit['time_in_call_secs'],
+                    snippet=hit['snippet']
+                )
+                for hit in hits
+            ],
+            total_count=total_count,
+            page=page,
+            page_size=page_size
+        )
+        
+    except Exception as e:
+        logger.error(f"Error searching transcripts: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Error searching transcripts: {str(e)}")
+
 @app.get("/api/conversations/{conversation_id}/transcript")
 async def get_conversation_transcript(conversation_id: str):
     """Get the transcript for a specific conversation"""
@@ -662,7 +928,11 @@ async def get_conversation_transcript(conversation_id: str):
     
     try:
         logger.info(f"Retrieving transcript for conversation: {conversation_id}")
-        transcript_data = api_client.get_conversation_transcript(conversation_id)
+        transcript = await asyncio.to_thread(conversation_store.get_transcript, conversation_id)
+        if transcript is not None:
+            transcript_data = {"conversation_id": conversation_id, "transcript": transcript}
+        else:
+            transcript_data = await api_client.get_conversation_transcript(conversation_id)
         if not transcript_data:
             logger.warning(f"Transcript not found for conversation: {conversation_id}")
             raise HTTPException(status_code=404, detail="Transcript not found")
@@ -677,97 +947,288 @@ async def get_conversation_transcript(conversation_id: str):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error retrieving transcript: {str(e)}")
 
+# Bytes per chunk when streaming audio to the client
+AUDIO_STREAM_CHUNK_SIZE = 64 * 1024
+
+def parse_range_header(range_header: str, total_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" Range header against a body of total_size bytes
+    
+    Returns:
+        Inclusive (start, end) byte positions, or None if the range cannot be satisfied
+        
+    Raises:
+        ValueError: if the header is malformed or asks for multiple ranges
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        raise ValueError(f"Unsupported Range header: {range_header}")
+    start_text, _, end_text = spec.strip().partition('-')
+    if not start_text:
+        # Suffix range: the last N bytes
+        suffix = int(end_text)
+        if suffix <= 0:
+            return None
+        return max(0, total_size - suffix), total_size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else total_size - 1
+    if start >= total_size or end < start:
+        return None
+    return start, min(end, total_size - 1)
+
+async def slice_byte_stream(chunks: AsyncIterator[bytes], start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield only bytes start..end (inclusive) of a chunked body, stopping once end is reached"""
+    position = 0
+    async for chunk in chunks:
+        chunk_end = position + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(0, start - position):end + 1 - position]
+        position = chunk_end
+        if position > end:
+            break
+
+def is_complete_body(status_code: int, content_range: Optional[str]) -> bool:
+    """Whether an upstream audio response carries the entire recording"""
+    if status_code == 200:
+        return True
+    # e.g. "bytes 0-1023/1024", as sent for the browser's initial "Range: bytes=0-"
+    byte_range, _, total = (content_range or '').replace('bytes', '').strip().partition('/')
+    start, _, end = byte_range.partition('-')
+    try:
+        return int(start) == 0 and int(end) == int(total) - 1
+    except ValueError:
+        return False
+
+# Background downloads that fill the audio cache after a ranged request missed it
+audio_cache_fill_tasks: Set[asyncio.Task] = set()
+
+async def fill_audio_cache(conversation_id: str) -> None:
+    """Download a whole recording into the audio cache"""
+    upstream = await api_client.open_conversation_audio_stream(conversation_id)
+    try:
+        content_type = upstream.headers.get('content-type', 'audio/mpeg')
+        if upstream.status_code != 200 or 'application/json' in content_type:
+            return
+        content_length = upstream.headers.get('content-length')
+        await audio_cache.fill(
+            conversation_id,
+            content_type,
+            upstream.aiter_bytes(AUDIO_STREAM_CHUNK_SIZE),
+            int(content_length) if content_length is not None else None
+        )
+    finally:
+        await upstream.aclose()
+
+def schedule_audio_cache_fill(conversation_id: str) -> None:
+    """Start one background download of a recording unless it is cached or already being written"""
+    if audio_cache.peek(conversation_id) or audio_cache.is_filling(conversation_id):
+        return
+
+    async def fill() -> None:
+        try:
+            await api_client.single_flight.do(('audio-cache-fill', conversation_id), lambda: fill_audio_cache(conversation_id))
+        except Exception as e:
+            logger.warning(f"Background audio cache fill failed for {conversation_id}: {e}")
+
+    task = asyncio.create_task(fill())
+    audio_cache_fill_tasks.add(task)
+    task.add_done_callback(audio_cache_fill_tasks.discard)
+
 @app.get("/api/conversations/{conversation_id}/audio/file")
-async def get_conversation_audio_file(conversation_id: str):
-    """Get the actual audio file for a specific conversation"""
-    logger.info(f"GET /api/conversations/{conversation_id}/audio/file called")
+async def get_conversation_audio_file(conversation_id: str, request: Request):
+    """
+    Stream the audio file for a specific conversation
+    
+    Recordings in the local audio cache are served straight from disk. Otherwise
+    bytes are relayed from ElevenLabs as they arrive instead of being buffered (and
+    written to the cache on the way), and single-range Range requests are answered
+    with 206 Partial Content so the audio player can seek without downloading the
+    whole recording.
+    """
+    range_header = request.headers.get('range')
+    logger.info(f"GET /api/conversations/{conversation_id}/audio/file called (range={range_header})")
+    
+    # get() checks that the file is still on disk
+    cached = await asyncio.to_thread(audio_cache.get, conversation_id)
+    if cached:
+        logger.info(f"Serving cached audio file for {conversation_id} ({cached.size_bytes} bytes)")
+        # FileResponse answers Range requests itself
+        return FileResponse(
+            cached.path,
+            media_type=cached.content_type,
+            headers={
+                "Content-Disposition": f"attachment; filename={cached.filename}",
+                "Cache-Control": "public, max-age=3600"
+            }
+        )
     
     if not api_client:
         logger.error("API client not initialized")
         raise HTTPException(status_code=500, detail="API client not initialized")
     
     try:
-        logger.info(f"Retrieving audio file for conversation: {conversation_id}")
-        audio_data = api_client.get_conversation_audio(conversation_id)
-        
-        logger.info(f"AUDIO FILE ENDPOINT - Raw audio_data keys: {list(audio_data.keys()) if audio_data else 'None'}")
+        upstream = await api_client.open_conversation_audio_stream(conversation_id, range_header)
+    except Exception as e:
+        logger.error(f"Error opening audio stream for {conversation_id}: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Error serving audio file: {str(e)}")
+    
+    tee = None
+    try:
+        content_type = upstream.headers.get('content-type', 'audio/mpeg')
+        logger.info(f"AUDIO FILE ENDPOINT - Upstream status={upstream.status_code}, content_type={content_type}, content_length={upstream.headers.get('content-length')}")
         
-        if not audio_data:
+        if upstream.status_code == 416:
+            await upstream.aclose()
+            return Response(status_code=416, headers={"Content-Range": upstream.headers.get('content-range', 'bytes */*')})
+        if upstream.status_code == 404 or 'application/json' in content_type:
+            # A JSON body means ElevenLabs has no recording for this conversation
+            await upstream.aclose()
             logger.warning(f"No audio data found for conversation: {conversation_id}")
             raise HTTPException(status_code=404, detail="Audio file not found")
+        upstream.raise_for_status()
         
-        # Check for raw audio data
-        raw_data = audio_data.get('raw_data')
-        logger.info(f"AUDIO FILE ENDPOINT - Raw data type: {type(raw_data)}")
-        logger.info(f"AUDIO FILE ENDPOINT - Raw data length: {len(raw_data) if raw_data else 0}")
+        filename = f"conversation_{conversation_id}.{content_type.split('/')[-1] if '/' in content_type else 'audio'}"
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Cache-Control": "public, max-age=3600"
+        }
+        status_code = upstream.status_code
+        body = upstream.aiter_bytes(AUDIO_STREAM_CHUNK_SIZE)
+        content_length = upstream.headers.get('content-length')
         
-        if raw_data:
-            logger.info(f"AUDIO FILE ENDPOINT - Raw data first 50 bytes: {raw_data[:50]}")
-            logger.info(f"AUDIO FILE ENDPOINT - Raw data last 50 bytes: {raw_data[-50:]}")
-            logger.info(f"AUDIO FILE ENDPOINT - Raw data is bytes: {isinstance(raw_data, bytes)}")
+        if is_complete_body(status_code, upstream.headers.get('content-range')):
+            # The whole recording is coming down, even if the client only asked for part
+            # of it; keep a copy as it streams past. The writer opens here, so a
+            # concurrent request sees the fill at once.
+            if not audio_cache.is_filling(conversation_id):
+                body = tee = audio_cache.tee(
+                    conversation_id,
+                    content_type,
+                    body,
+                    int(content_length) if content_length is not None else None
+                )
+        else:
+            # Upstream only sent part of the recording; fetch all of it for next time
+            schedule_audio_cache_fill(conversation_id)
         
-        if not raw_data:
-            logger.warning(f"No raw audio data found for conversation: {conversation_id}")
-            logger.warning(f"AUDIO FILE ENDPOINT - Available keys: {list(audio_data.keys())}")
-            raise HTTPException(status_code=404, detail="Audio file not found")
+        sliced = False
+        if status_code == 206:
+            # Upstream honoured the range; relay it as is
+            headers["Content-Range"] = upstream.headers.get('content-range', '')
+        elif range_header and content_length is not None:
+            # Upstream sent the whole file; cut the requested range out of the stream
+            total_size = int(content_length)
+            try:
+                byte_range = parse_range_header(range_header, total_size)
+            except ValueError:
+                byte_range = (0, total_size - 1)  # Unsupported ranges are ignored and the full body is sent
+            else:
+                if byte_range is None:
+                    if tee is not None:
+                        await tee.aclose()
+                    await upstream.aclose()
+                    return Response(status_code=416, headers={"Content-Range": f"bytes */{total_size}"})
+            start, end = byte_range
+            if (start, end) != (0, total_size - 1):
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{total_size}"
+                content_length = str(end - start + 1)
+                body = slice_byte_stream(body, start, end)
+                sliced = True
         
-        content_type = audio_data.get('content_type', 'audio/mpeg')
-        filename = audio_data.get('filename', f"conversation_{conversation_id}.audio")
+        if content_length is not None:
+            headers["Content-Length"] = content_length
         
-        logger.info(f"Serving audio file for {conversation_id}: content_type={content_type}, size={len(raw_data)}")
-        logger.info(f"AUDIO FILE ENDPOINT - Filename: {filename}")
+        async def close_upstream() -> None:
+            # Also runs when the client disconnects, possibly before the body was read at all
+            try:
+                if tee is not None:
+                    if sliced:
+                        # The client got its range; read the rest of the recording into the cache
+                        await tee.drain()
+                    await tee.aclose()
+            except Exception as e:
+                logger.warning(f"Caching audio for {conversation_id} failed: {e}")
+            finally:
+                await upstream.aclose()
         
-        # Return the audio file as a streaming response
-        from fastapi.responses import Response
-        return Response(
-            content=raw_data,
+        logger.info(f"Streaming audio file for {conversation_id}: status={status_code}, content_type={content_type}, length={content_length}")
+        return StreamingResponse(
+            body,
+            status_code=status_code,
             media_type=content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Cache-Control": "public, max-age=3600"
-            }
+            headers=headers,
+            background=BackgroundTask(close_upstream)
         )
         
     except HTTPException:
         raise
     except Exception as e:
+        if tee is not None:
+            await tee.aclose()
+        await upstream.aclose()
         logger.error(f"Error serving audio file for {conversation_id}: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error serving audio file: {str(e)}")
 
 @app.get("/api/conversations/{conversation_id}/audio", response_model=AudioInfo)
 async def get_conversation_audio(conversation_id: str):
-    """Get audio information for a specific conversation"""
+    """
+    Get audio information for a specific conversation
+    
+    The recording itself is never downloaded here. The answer comes from the local
+    audio cache index, the has_audio flag in the stored details, or a one-byte
+    ranged probe of the upstream audio endpoint, in that order.
+    """
     logger.info(f"GET /api/conversations/{conversation_id}/audio called")
     
     if not api_client:
         logger.error("API client not initialized")
         raise HTTPException(status_code=500, detail="API client not initialized")
     
+    cached = audio_cache.peek(conversation_id)
+    if cached:
+        logger.info(f"Audio info for {conversation_id} from the audio cache")
+        return AudioInfo(
+            conversation_id=conversation_id,
+            has_audio=True,
+            content_type=cached.content_type,
+            size_bytes=cached.size_bytes,
+            filename=cached.filename
+        )
+    
     try:
-        logger.info(f"Retrieving audio info for conversation: {conversation_id}")
-        audio_info = api_client.get_conversation_audio(conversation_id)
-        
-        logger.info(f"AUDIO INFO ENDPOINT - Raw audio_info keys: {list(audio_info.keys()) if audio_info else 'None'}")
-        
-        if not audio_info:
-            logger.info(f"No audio found for conversation {conversation_id}")
+        details = (
+            await asyncio.to_thread(conversation_store.get_details, conversation_id)
+            or api_client.details_cache.peek(('details', conversation_id))
+        )
+        details_has_audio = details.get('has_audio') if details else None
+        if details_has_audio is False:
+            logger.info(f"No audio for conversation {conversation_id} according to its details")
             return AudioInfo(
                 conversation_id=conversation_id,
                 has_audio=False
             )
         
-        has_audio = bool(audio_info.get('raw_data'))
-        logger.info(f"Audio info for {conversation_id}: has_audio={has_audio}, content_type={audio_info.get('content_type')}, size_bytes={audio_info.get('size_bytes')}")
-        logger.info(f"AUDIO INFO ENDPOINT - Has raw_data: {bool(audio_info.get('raw_data'))}")
-        logger.info(f"AUDIO INFO ENDPOINT - Raw data length: {len(audio_info.get('raw_data', b''))}")
+        logger.info(f"Probing audio for conversation: {conversation_id}")
+        probe = await api_client.probe_conversation_audio(conversation_id)
+        if not probe:
+            # Probe failed; report what the details said, without size information
+            logger.warning(f"Audio probe failed for conversation {conversation_id}")
+            return AudioInfo(
+                conversation_id=conversation_id,
+                has_audio=bool(details_has_audio)
+            )
         
+        logger.info(f"Audio info for {conversation_id}: has_audio={probe['has_audio']}, content_type={probe['content_type']}, size_bytes={probe['size_bytes']}")
         return AudioInfo(
             conversation_id=conversation_id,
-            has_audio=has_audio,
-            content_type=audio_info.get('content_type'),
-            size_bytes=audio_info.get('size_bytes'),
-            filename=audio_info.get('filename')
+            has_audio=probe['has_audio'],
+            content_type=probe['content_type'],
+            size_bytes=probe['size_bytes'],
+            filename=probe['filename']
         )
         
     except Exception as e:
@@ -786,7 +1247,7 @@ async def get_phone_numbers():
     
     try:
         logger.info("Retrieving phone numbers from ElevenLabs API")
-        phone_numbers = api_client.get_phone_numbers()
+        phone_numbers = await api_client.get_phone_numbers()
         logger.info(f"Retrieved {len(phone_numbers)} phone numbers")
         logger.info(f"Phone numbers data: {phone_numbers}")
         logger.info(f"Phone numbers type: {type(phone_numbers)}")
@@ -886,30 +1347,11 @@ async def get_stats():
         raise HTTPException(status_code=500, detail="API client not initialized")
     
     try:
-        logger.info("Retrieving conversations for statistics calculation")
-        conversations = api_client.get_conversations()
-        logger.info(f"Retrieved {len(conversations)} conversations for stats")
-        
-        total_conversations = len(conversations)
-        successful_calls = sum(1 for c in conversations if c.get('call_successful', False))
-        total_duration = sum(c.get('call_duration_secs', 0) for c in conversations)
-        total_messages = sum(c.get('message_count', 0) for c in conversations)
-        
-        success_rate = (successful_calls / total_conversations * 100) if total_conversations > 0 else 0
-        avg_duration = total_duration / total_conversations if total_conversations > 0 else 0
-        avg_messages = total_messages / total_conversations if total_conversations > 0 else 0
-        
-        stats = {
-            "total_conversations": total_conversations,
-            "successful_calls": successful_calls,
-            "success_rate": success_rate,
-            "total_duration_seconds": total_duration,
-            "total_messages": total_messages,
-            "average_duration_seconds": avg_duration,
-            "average_messages_per_conversation": avg_messages
-        }
+        await ingestor.wait_until_ready(INGEST_READY_TIMEOUT)
+        # Maintained incrementally by the stats engine; totals plus per agent/status/direction/location breakdowns
+        stats = stats_engine.snapshot()
         
-        logger.info(f"Calculated stats: total_conversations={total_conversations}, successful_calls={successful_calls}, success_rate={success_rate:.2f}%")
+        logger.info(f"Returning stats: total_conversations={stats['total_conversations']}, successful_calls={stats['successful_calls']}, success_rate={stats['success_rate']:.2f}%")
         return stats
         
     except Exception as e:
@@ -917,6 +1359,51 @@ async def get_stats():
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error retrieving statistics: {str(e)}")
 
+@app.get("/api/analytics/timeseries")
+async def get_analytics_timeseries(
+    start: Optional[int] = Query(default=None, description="Window start (Unix seconds); defaults to 7 days before end"),
+    end: Optional[int] = Query(default=None, description="Window end (Unix seconds, exclusive); defaults to now"),
+    resolution: Optional[str] = Query(default=None, description="minute, hour or day; picked from the window length when omitted")
+):
+    """Call volume, success rate, outcome/sentiment mix and duration/message percentiles over time"""
+    logger.info(f"GET /api/analytics/timeseries called with params: start={start}, end={end}, resolution={resolution}")
+    
+    end = end if end is not None else int(time.time())
+    start = start if start is not None else end - 7 * 86400
+    try:
+        await ingestor.wait_until_ready(INGEST_READY_TIMEOUT)
+        # Read from pre-aggregated buckets; the raw conversation rows are not touched
+        return analytics_rollups.timeseries(start, end, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving analytics time series: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving analytics time series: {str(e)}")
+
+@app.get("/api/analytics/dashboard")
+async def get_analytics_dashboard(
+    start: Optional[int] = Query(default=None, description="Window start (Unix seconds); defaults to 7 days before end"),
+    end: Optional[int] = Query(default=None, description="Window end (Unix seconds, exclusive); defaults to now"),
+    bucket_seconds: int = Query(default=3600, ge=60, description="Width of the call volume buckets")
+):
+    """Totals, percentiles, per agent/status/direction/location breakdowns, volume and duration histogram for a window"""
+    logger.info(f"GET /api/analytics/dashboard called with params: start={start}, end={end}, bucket_seconds={bucket_seconds}")
+    
+    end = end if end is not None else int(time.time())
+    start = start if start is not None else end - 7 * 86400
+    try:
+        await ingestor.wait_until_ready(INGEST_READY_TIMEOUT)
+        # Snapshot rebuilds and the vectorized passes run off the event loop
+        snapshot = await asyncio.to_thread(columnar_snapshots.get)
+        return await asyncio.to_thread(snapshot.dashboard, start, end, bucket_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error computing analytics dashboard: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Error computing analytics dashboard: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting ElevenLabs API Server on host=0.0.0.0, port=8000")
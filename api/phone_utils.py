@@ -3,7 +3,35 @@
 Phone number utilities for ElevenLabs conversation data
 """
 
-from typing import Dict, Optional, List, Tuple
+import os
+import sys
+import threading
+import weakref
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, List, Tuple
+
+from area_code_mapping import (
+    UNKNOWN_LOCATION,
+    dialable_characters,
+    get_prefix_table,
+    international_digits_from_dialable
+)
+
+# Phone number categories (see classify_phone_number)
+TOLL_FREE = 'toll_free'
+SPECIAL = 'special'
+GEOGRAPHIC = 'geographic'
+INTERNATIONAL = 'international'
+UNKNOWN = 'unknown'
+INVALID = 'invalid'
+
+# NANP area codes that do not belong to a place
+TOLL_FREE_AREA_CODES = frozenset({'800', '822', '833', '844', '855', '866', '877', '888'})
+SPECIAL_AREA_CODES = frozenset(
+    {f'{n}11' for n in range(2, 10)}  # N11 service codes
+    | {'500', '521', '522', '523', '524', '525', '526', '527', '528', '529', '533', '544', '566', '577', '588'}
+    | {'555', '700', '710', '900', '976', '999'}
+)
 
 def extract_phone_info_from_conversation(conversation_details: Dict) -> Optional[Dict]:
     """
@@ -53,6 +81,91 @@ def get_primary_phone_number(phone_info: Dict) -> Optional[str]:
         # Default to external number if direction is unknown
         return phone_info.get('external_number') or phone_info.get('agent_number')
 
+class CanonicalPhoneNumber:
+    """
+    A phone number normalized once, with its derived fields
+    
+    Get instances from canonical_phone_number, which memoizes them by raw value
+    and interns valid numbers by formatted value, so numbers written alike share
+    one object. formatted is for display and keeps the input's international
+    prefix; key is the E.164 form ('+' and the international digits), the same
+    for every spelling of a number (+44..., 0044..., 01144...), and is the
+    dedup key. Valid numbers whose country cannot be told have no key.
+    """
+    
+    __slots__ = ('formatted', 'key', 'valid', 'category', 'location', 'area_code', 'display', '__weakref__')
+    
+    def __init__(self, formatted: str, valid: bool, category: str, location: str, digits: Optional[str]):
+        self.formatted = formatted
+        # Interned, so equal keys from different spellings are one string
+        self.key = sys.intern('+' + digits) if valid and digits else None
+        self.valid = valid
+        self.category = category
+        self.location = location
+        nanp = digits is not None and len(digits) == 11 and digits[0] == '1'
+        self.area_code = digits[1:4] if nanp else None
+        self.display = f"({digits[1:4]}) {digits[4:7]}-{digits[7:]}" if nanp and valid else formatted
+    
+    @property
+    def is_toll_free(self) -> bool:
+        return self.category == TOLL_FREE
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CanonicalPhoneNumber):
+            return NotImplemented
+        return self.formatted == other.formatted and self.valid == other.valid
+    
+    def __hash__(self) -> int:
+        return hash(self.formatted)
+    
+    def __repr__(self) -> str:
+        return f"CanonicalPhoneNumber({self.formatted!r}, {self.category}, {self.location!r})"
+
+# Valid numbers by formatted value, for as long as something still holds them
+_interned: "weakref.WeakValueDictionary[str, CanonicalPhoneNumber]" = weakref.WeakValueDictionary()
+_interned_lock = threading.Lock()
+
+@lru_cache(maxsize=int(os.getenv('PHONE_NUMBER_CACHE_SIZE', '65536')))
+def canonical_phone_number(phone_number: Optional[str]) -> CanonicalPhoneNumber:
+    """
+    The canonical form of a raw phone number (memoized; repeat numbers cost a dict lookup)
+    
+    Args:
+        phone_number: Raw phone number string (None or empty for missing)
+        
+    Returns:
+        CanonicalPhoneNumber, shared by every raw spelling of the same valid number
+    """
+    if not phone_number:
+        return CanonicalPhoneNumber("N/A", False, INVALID, UNKNOWN_LOCATION, None)
+    
+    cleaned = dialable_characters(phone_number)
+    formatted = _format_dialable(cleaned)
+    valid = _valid_dialable(cleaned)
+    # Stray '+' signs inside a number make its fields depend on more than the formatted value
+    shared = valid and '+' not in cleaned[1:]
+    if shared:
+        phone = _interned.get(formatted)
+        if phone is not None:
+            return phone
+    
+    digits = international_digits_from_dialable(cleaned)
+    location = (get_prefix_table().lookup(digits) if digits else None) or UNKNOWN_LOCATION
+    phone = CanonicalPhoneNumber(formatted, valid, _category(digits) if valid else INVALID, location, digits)
+    if shared:
+        with _interned_lock:
+            phone = _interned.setdefault(formatted, phone)
+    return phone
+
+def phone_number_cache_stats() -> Dict:
+    info = canonical_phone_number.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'entries': info.currsize,
+        'interned': len(_interned)
+    }
+
 def format_phone_number(phone_number: str) -> str:
     """
     Format phone number for display
@@ -65,10 +178,10 @@ def format_phone_number(phone_number: str) -> str:
     """
     if not phone_number:
         return "N/A"
-    
-    # Remove any non-digit characters except +
-    cleaned = ''.join(c for c in phone_number if c.isdigit() or c == '+')
-    
+    return canonical_phone_number(phone_number).formatted
+
+def _format_dialable(cleaned: str) -> str:
+    """format_phone_number for a number already reduced to its digits and '+' signs"""
     # If it starts with +, it's already international format
     if cleaned.startswith('+'):
         return cleaned
@@ -120,13 +233,12 @@ def validate_phone_number(phone_number: str) -> bool:
     """
     if not phone_number:
         return False
-    
-    # Remove formatting characters
-    cleaned = ''.join(c for c in phone_number if c.isdigit() or c == '+')
-    
+    return canonical_phone_number(phone_number).valid
+
+def _valid_dialable(cleaned: str) -> bool:
+    """validate_phone_number for a number already reduced to its digits and '+' signs"""
     # Must have at least 10 digits
-    digits = ''.join(c for c in cleaned if c.isdigit())
-    if len(digits) < 10:
+    if len(cleaned) - cleaned.count('+') < 10:
         return False
     
     # Must start with + or be a reasonable length
@@ -135,6 +247,118 @@ def validate_phone_number(phone_number: str) -> bool:
     else:
         return len(cleaned) >= 10  # At least 10 digits
 
+def classify_phone_number(phone_number: str) -> str:
+    """
+    Classify a phone number
+    
+    Args:
+        phone_number: Raw phone number string
+        
+    Returns:
+        TOLL_FREE, SPECIAL or GEOGRAPHIC for NANP numbers, INTERNATIONAL for other
+        countries, UNKNOWN if the country cannot be told, INVALID if not a number
+    """
+    return canonical_phone_number(phone_number).category
+
+def _category(digits: Optional[str]) -> str:
+    """Category of a valid number from its international digits"""
+    if digits is None:
+        return UNKNOWN
+    if len(digits) != 11 or digits[0] != '1':
+        return INTERNATIONAL
+    area_code = digits[1:4]
+    if area_code in TOLL_FREE_AREA_CODES:
+        return TOLL_FREE
+    if area_code in SPECIAL_AREA_CODES:
+        return SPECIAL
+    return GEOGRAPHIC
+
+class PhoneNumberBatch:
+    """Per-number results of analyze_phone_numbers, as lists aligned with the input"""
+    
+    __slots__ = ('formatted', 'keys', 'valid', 'categories', 'locations')
+    
+    def __init__(
+        self,
+        formatted: List[Optional[str]],
+        keys: List[Optional[str]],
+        valid: List[bool],
+        categories: List[str],
+        locations: List[str]
+    ):
+        self.formatted = formatted
+        self.keys = keys
+        self.valid = valid
+        self.categories = categories
+        self.locations = locations
+    
+    def __len__(self) -> int:
+        return len(self.formatted)
+
+def analyze_phone_numbers(phone_numbers: Iterable[Optional[str]]) -> PhoneNumberBatch:
+    """
+    Normalize, validate, classify and locate many phone numbers in one pass
+    
+    Meant for one-off columns such as a location backfill over every stored
+    call. Each distinct raw value is cleaned once with a precompiled translate
+    table, and the prefix table is consulted once per distinct leading digits
+    (only the first max_length digits can affect a match), so columns of repeat
+    callers cost little more than their distinct numbers. Unlike
+    canonical_phone_number nothing is kept between calls, so such a column does
+    not evict the numbers in everyday use. Results match
+    canonical_phone_number's formatted, key, valid, category and location.
+    
+    Args:
+        phone_numbers: Raw phone number strings (None or empty for missing)
+        
+    Returns:
+        PhoneNumberBatch with formatted and keys (None unless valid), valid,
+        categories and locations, one entry per input number
+    """
+    table = get_prefix_table()
+    # Results per distinct raw value, column by column; codes index them per input number
+    index: Dict[Optional[str], int] = {}
+    formatted: List[Optional[str]] = []
+    keys: List[Optional[str]] = []
+    valid: List[bool] = []
+    categories: List[str] = []
+    locations: List[str] = []
+    by_prefix: Dict[str, str] = {}
+    codes = []
+    for raw in phone_numbers:
+        code = index.get(raw)
+        if code is None:
+            code = index[raw] = len(formatted)
+            formatted_number, key, is_valid, category, location = None, None, False, INVALID, UNKNOWN_LOCATION
+            if raw:
+                cleaned = dialable_characters(raw)
+                digits = international_digits_from_dialable(cleaned)
+                if digits:
+                    location = by_prefix.get(digits[:table.max_length])
+                    if location is None:
+                        location = by_prefix[digits[:table.max_length]] = table.lookup(digits) or UNKNOWN_LOCATION
+                is_valid = _valid_dialable(cleaned)
+                if is_valid:
+                    formatted_number = _format_dialable(cleaned)
+                    key = '+' + digits if digits else None
+                    category = _category(digits)
+            formatted.append(formatted_number)
+            keys.append(key)
+            valid.append(is_valid)
+            categories.append(category)
+            locations.append(location)
+        codes.append(code)
+    
+    if len(formatted) == len(codes):
+        return PhoneNumberBatch(formatted, keys, valid, categories, locations)
+    return PhoneNumberBatch(
+        [formatted[code] for code in codes],
+        [keys[code] for code in codes],
+        [valid[code] for code in codes],
+        [categories[code] for code in codes],
+        [locations[code] for code in codes]
+    )
+
 def extract_phone_numbers_from_conversations(conversations: List[Dict]) -> List[Dict]:
     """
     Extract phone numbers from a list of conversations
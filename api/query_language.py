@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Conversation query language
+
+Parses search-box queries such as
+
+    duration>120 sentiment:negative location:"San Jose, CA" after:2024-05-01 sort:-duration refund
+
+into SQL predicates over the conversations table (aliased "c") plus free-text
+words for the full-text index, so the store can answer the whole query in one
+indexed SQL statement.
+
+Syntax:
+    field:value           equality (case-insensitive for text fields)
+    field:"two words"     quoted value
+    -field:value          negation (conversations without a value match too)
+    field>N, >=, <, <=    comparison on numeric and date fields
+    after:DATE            start time on or after DATE (before: is exclusive)
+    date:DATE             calls on that day
+    sort:field            ascending sort; sort:-field for descending
+    anything else         full-text words ("quoted phrase" keeps words together)
+    -word, -"phrase"      excludes conversations containing the word or phrase
+
+Unknown field names are searched for as text rather than rejected.
+
+Dates are YYYY-MM-DD, YYYY-MM-DDTHH:MM[:SS] (UTC), Unix seconds, or relative
+ages like 7d, 12h, 30m.
+"""
+
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+class QueryError(ValueError):
+    """Raised for queries that cannot be parsed"""
+
+class Field:
+    """How a query field maps onto the conversations table"""
+
+    def __init__(self, column: str, kind: str, sortable: bool = True, nullable: bool = False):
+        self.column = column
+        self.kind = kind  # 'text', 'id', 'number', 'bool', 'date' or 'tag'
+        self.sortable = sortable
+        self.nullable = nullable
+
+    @property
+    def sort_expression(self) -> str:
+        """Column as used in ORDER BY; NULLs become the lowest value so keyset cursors can compare them"""
+        if not self.nullable:
+            return self.column
+        return f"IFNULL({self.column}, {'-1e308' if self.kind == 'number' else repr('')})"
+
+FIELDS: Dict[str, Field] = {
+    'status': Field('c.status', 'text', nullable=True),
+    'agent': Field('c.agent_name', 'text', nullable=True),
+    'agent_name': Field('c.agent_name', 'text', nullable=True),
+    'agent_id': Field('c.agent_id', 'id', nullable=True),
+    'direction': Field('c.direction', 'text', nullable=True),
+    'location': Field('c.location', 'text', nullable=True),
+    'phone': Field('c.caller_phone', 'text', nullable=True),
+    'sentiment': Field('c.sentiment', 'text', nullable=True),
+    'outcome': Field('c.outcome', 'text', nullable=True),
+    'tag': Field('c.tags_json', 'tag', sortable=False),
+    'successful': Field('c.call_successful', 'bool'),
+    'duration': Field('c.call_duration_secs', 'number'),
+    'messages': Field('c.message_count', 'number'),
+    'rating': Field('c.rating', 'number', nullable=True),
+    'start_time': Field('c.start_time_unix_secs', 'date'),
+    'date': Field('c.start_time_unix_secs', 'date'),
+    'conversation_id': Field('c.conversation_id', 'id'),
+}
+
+# Shorthands accepted in addition to the names above
+FIELD_ALIASES = {
+    'call_duration_secs': 'duration',
+    'message_count': 'messages',
+    'call_successful': 'successful',
+    'start_time_unix_secs': 'start_time',
+    'tags': 'tag',
+    'time': 'start_time',
+}
+
+TRUE_VALUES = {'true', 'yes', '1', 'success', 'successful'}
+FALSE_VALUES = {'false', 'no', '0', 'failure', 'failed'}
+
+RELATIVE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# One query term: optional negation, field name, operator and (possibly quoted) value; or a bare word/phrase
+TOKEN_RE = re.compile(
+    r'\s*(?:'
+    r'(?P<neg>-)?(?P<field>[A-Za-z_]+)(?P<op>:|>=|<=|!=|>|<|=)(?:"(?P<qvalue>[^"]*)"|(?P<value>[^\s"]*))'
+    r'|(?P<pneg>-)?"(?P<phrase>[^"]*)"'
+    r'|(?P<word>[^\s"]+)'
+    r')'
+)
+
+class ParsedQuery:
+    """SQL predicates, full-text words and sort order compiled from a query string"""
+
+    def __init__(self):
+        self.clauses: List[str] = []
+        self.params: List[Any] = []
+        self.text_terms: List[str] = []
+        self.excluded_terms: List[str] = []  # Words and "phrases" that must not occur
+        self.sort: Optional[Tuple[str, bool]] = None  # (ORDER BY expression, descending)
+
+    @property
+    def text(self) -> str:
+        """Free-text part of the query, for the full-text index"""
+        return ' '.join(self.text_terms)
+
+def parse_date(value: str, now: Optional[float] = None) -> float:
+    """Unix time for an absolute date, Unix seconds, or a relative age such as 7d"""
+    value = value.strip()
+    relative = re.fullmatch(r'(\d+)([mhdw])', value.lower())
+    if relative:
+        return (now if now is not None else time.time()) - int(relative.group(1)) * RELATIVE_UNITS[relative.group(2)]
+    if re.fullmatch(r'\d{9,}', value):
+        return float(value)
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    raise QueryError(f"Invalid date: {value}")
+
+def _lookup_field(name: str) -> Optional[Field]:
+    name = name.lower()
+    return FIELDS.get(FIELD_ALIASES.get(name, name))
+
+def _resolve_field(name: str) -> Field:
+    field = _lookup_field(name)
+    if field is None:
+        raise QueryError(f"Unknown field: {name}")
+    return field
+
+def _number(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        raise QueryError(f"Expected a number, got: {value}")
+
+def _predicate(field: Field, op: str, value: str, now: Optional[float]) -> Tuple[str, List[Any]]:
+    """SQL for one field/operator/value triple"""
+    column = field.column
+    if op == '=':
+        op = ':'
+    if field.kind == 'tag':
+        if op not in (':', '!='):
+            raise QueryError("Tags only support tag:value")
+        sql = f"EXISTS (SELECT 1 FROM json_each({column}) WHERE json_each.value = ? COLLATE NOCASE)"
+        return (sql if op == ':' else f"NOT {sql}"), [value]
+    if field.kind == 'bool':
+        if op not in (':', '!='):
+            raise QueryError(f"{column} only supports field:true or field:false")
+        lowered = value.lower()
+        if lowered not in TRUE_VALUES | FALSE_VALUES:
+            raise QueryError(f"Expected true or false, got: {value}")
+        flag = int(lowered in TRUE_VALUES)
+        return f"{column} {'=' if op == ':' else '!='} ?", [flag]
+    if field.kind == 'date':
+        if op == ':':
+            # A whole day (or the given instant for relative/Unix values)
+            start = parse_date(value, now)
+            if re.fullmatch(r'\d{4}-\d{2}-\d{2}', value):
+                return f"{column} >= ? AND {column} < ?", [int(start), int(start) + 86400]
+            return f"{column} >= ?", [int(start)]
+        if op == '!=':
+            raise QueryError("Dates support :, >, >=, < and <=")
+        return f"{column} {op} ?", [int(parse_date(value, now))]
+    if field.kind == 'number':
+        if op == ':':
+            return f"{column} = ?", [_number(value)]
+        return f"{column} {op} ?", [_number(value)]
+    # Text; IDs are compared exactly, everything else case-insensitively
+    if op in ('>', '>=', '<', '<='):
+        raise QueryError(f"Comparison is not supported on text field {column}")
+    collation = '' if field.kind == 'id' else ' COLLATE NOCASE'
+    return f"{column} {'=' if op == ':' else '!='} ?{collation}", [value]
+
+def parse_query(query: str, now: Optional[float] = None) -> ParsedQuery:
+    """
+    Compile a query string
+
+    Args:
+        query: Query in the syntax described in the module docstring
+        now: Reference time for relative dates (defaults to the current time)
+
+    Raises:
+        QueryError: if a value is invalid for its field or the sort field is unknown
+    """
+    parsed = ParsedQuery()
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN_RE.match(query, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Cannot parse query near: {query[position:]}")
+        position = match.end()
+
+        if match.group('phrase') is not None:
+            if match.group('phrase').strip():
+                terms = parsed.excluded_terms if match.group('pneg') else parsed.text_terms
+                terms.append(f'"{match.group("phrase").strip()}"')
+            continue
+        if match.group('word') is not None:
+            word = match.group('word')
+            if word.startswith('-') and len(word) > 1:
+                parsed.excluded_terms.append(word[1:])
+            else:
+                parsed.text_terms.append(word)
+            continue
+
+        name = match.group('field').lower()
+        op = match.group('op')
+        value = match.group('qvalue') if match.group('qvalue') is not None else match.group('value')
+        negate = bool(match.group('neg'))
+        if name not in ('sort', 'after', 'before', 'since', 'until') and _lookup_field(name) is None:
+            # Not a field (e.g. "re:appointment"); search for it as text
+            parsed.text_terms.append(match.group(0).strip())
+            continue
+        if not value:
+            raise QueryError(f"Missing value for {name}")
+
+        if name == 'sort' and op == ':':
+            descending = value.startswith('-')
+            field_name, _, direction = value.lstrip('-+').partition(':')
+            field = _resolve_field(field_name)
+            if not field.sortable:
+                raise QueryError(f"Cannot sort by {field_name}")
+            if direction:
+                if direction.lower() not in ('asc', 'desc'):
+                    raise QueryError(f"Invalid sort direction: {direction}")
+                descending = direction.lower() == 'desc'
+            parsed.sort = (field.sort_expression, descending)
+            continue
+        if name in ('after', 'before', 'since', 'until') and op == ':':
+            start = int(parse_date(value, now))
+            parsed.clauses.append(f"c.start_time_unix_secs {'>=' if name in ('after', 'since') else '<'} ?")
+            parsed.params.append(start)
+            continue
+
+        sql, params = _predicate(_resolve_field(name), op, value, now)
+        # A comparison with NULL is NULL, so NOT alone would drop rows that have no value
+        parsed.clauses.append(f"NOT IFNULL(({sql}), 0)" if negate else f"({sql})")
+        parsed.params.extend(params)
+    return parsed
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Time-bucketed analytics rollups
+
+Calls are pre-aggregated into minute, hour and day buckets (UTC, by call start
+time) holding call and success counts, the outcome and sentiment mix, and
+DDSketch quantile sketches of call duration and message count. A chart over any
+window reads one bucket per point instead of the raw rows, and percentiles for
+the whole window come from merging the buckets' sketches.
+
+Like the stats engine, the rollups follow the store's (old row, new row) change
+notifications, so a call whose status, outcome or duration changes is moved
+rather than counted twice. Minute and hour buckets are only kept for a limited
+time (ANALYTICS_MINUTE_RETENTION_DAYS, ANALYTICS_HOUR_RETENTION_DAYS); day
+buckets are kept for good.
+"""
+
+import os
+import math
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Resolution name -> bucket width in seconds, finest first
+RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+# Automatic resolution picks the finest one giving at most this many buckets
+TARGET_BUCKETS = 400
+# Upper bound on buckets returned for an explicitly requested resolution
+MAX_BUCKETS = 2000
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Bucket for rows without an outcome or sentiment (not analyzed yet)
+UNKNOWN_KEY = 'unknown'
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (Masson et al., VLDB 2019)
+
+    Values are counted in logarithmically sized bins, so any quantile estimate is
+    within relative_accuracy of a true value. Sketches with the same accuracy
+    merge exactly, and adding a value with a negative count removes it again.
+    """
+
+    __slots__ = ('gamma', '_log_gamma', 'bins', 'zero_count', 'count')
+
+    # Values at or below this (e.g. zero-second calls) are counted separately
+    MIN_INDEXABLE = 1e-9
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Count value (count times); a negative count removes earlier additions"""
+        self.count += count
+        if value <= self.MIN_INDEXABLE:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        total = self.bins.get(key, 0) + count
+        if total:
+            self.bins[key] = total
+        else:
+            del self.bins[key]
+
+    def merge(self, other: "DDSketch") -> None:
+        """Add all of other's values (other must use the same accuracy)"""
+        for key, count in other.bins.items():
+            total = self.bins.get(key, 0) + count
+            if total:
+                self.bins[key] = total
+            else:
+                del self.bins[key]
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q (0..1), or None when empty"""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if rank < cumulative:
+            return 0.0
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                # Midpoint (in relative terms) of the bin (gamma^(key-1), gamma^key]
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1) if self.bins else 0.0
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Dict[str, Optional[float]]:
+        return {f"p{round(q * 100)}": self.quantile(q) for q in qs}
+
+class Bucket:
+    """Aggregates for the calls that started within one time bucket"""
+
+    __slots__ = ('calls', 'successful', 'duration_seconds', 'messages', 'outcomes', 'sentiments',
+                 'duration_sketch', 'message_sketch')
+
+    def __init__(self):
+        self.calls = 0
+        self.successful = 0
+        self.duration_seconds = 0
+        self.messages = 0
+        self.outcomes: Dict[str, int] = {}
+        self.sentiments: Dict[str, int] = {}
+        self.duration_sketch = DDSketch()
+        self.message_sketch = DDSketch()
+
+    def add(self, row: Dict, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) one conversation row"""
+        duration = row.get('call_duration_secs') or 0
+        messages = row.get('message_count') or 0
+        self.calls += sign
+        self.successful += sign * (1 if row.get('call_successful') else 0)
+        self.duration_seconds += sign * duration
+        self.messages += sign * messages
+        _count(self.outcomes, row.get('outcome') or UNKNOWN_KEY, sign)
+        _count(self.sentiments, row.get('sentiment') or UNKNOWN_KEY, sign)
+        self.duration_sketch.add(duration, sign)
+        self.message_sketch.add(messages, sign)
+
+    def merge(self, other: "Bucket") -> None:
+        self.calls += other.calls
+        self.successful += other.successful
+        self.duration_seconds += other.duration_seconds
+        self.messages += other.messages
+        for key, count in other.outcomes.items():
+            _count(self.outcomes, key, count)
+        for key, count in other.sentiments.items():
+            _count(self.sentiments, key, count)
+        self.duration_sketch.merge(other.duration_sketch)
+        self.message_sketch.merge(other.message_sketch)
+
+    def to_dict(self) -> Dict:
+        calls = self.calls
+        return {
+            "calls": calls,
+            "successful_calls": self.successful,
+            "failed_calls": calls - self.successful,
+            "success_rate": (self.successful / calls * 100) if calls > 0 else 0,
+            "average_duration_seconds": self.duration_seconds / calls if calls > 0 else 0,
+            "average_messages": self.messages / calls if calls > 0 else 0,
+            "outcomes": dict(sorted(self.outcomes.items())),
+            "sentiments": dict(sorted(self.sentiments.items())),
+            "duration_seconds": self.duration_sketch.quantiles(),
+            "message_count": self.message_sketch.quantiles()
+        }
+
+def _count(counts: Dict[str, int], key: str, delta: int) -> None:
+    total = counts.get(key, 0) + delta
+    if total:
+        counts[key] = total
+    else:
+        del counts[key]
+
+def _retention_seconds(env_name: str, default_days: float) -> float:
+    return float(os.getenv(env_name, str(default_days))) * 86400
+
+class AnalyticsRollups:
+    """Minute/hour/day buckets of call aggregates, updated from store change notifications"""
+
+    def __init__(self, retention: Optional[Dict[str, Optional[float]]] = None):
+        # Seconds each resolution is kept for; None keeps buckets indefinitely
+        self.retention: Dict[str, Optional[float]] = retention if retention is not None else {
+            'minute': _retention_seconds('ANALYTICS_MINUTE_RETENTION_DAYS', 2),
+            'hour': _retention_seconds('ANALYTICS_HOUR_RETENTION_DAYS', 90),
+            'day': None,
+        }
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[int, Bucket]] = {name: {} for name in RESOLUTIONS}
+        self._last_prune = 0.0
+
+    def attach(self, store) -> None:
+        """Build the buckets from everything in store and follow its changes from then on"""
+        store.add_listener(self.apply, initialize=self.rebuild)
+
+    def rebuild(self, rows: Iterable[Dict]) -> None:
+        """Replace all buckets with ones computed from rows"""
+        with self._lock:
+            self._buckets = {name: {} for name in RESOLUTIONS}
+            cutoffs = self._cutoffs(time.time())
+            for row in rows:
+                self._add(row, 1, cutoffs)
+
+    def apply(self, old_row: Optional[Dict], new_row: Optional[Dict]) -> None:
+        """Account for one conversation row changing from old_row to new_row (None for absent)"""
+        now = time.time()
+        with self._lock:
+            cutoffs = self._cutoffs(now)
+            if old_row is not None:
+                self._add(old_row, -1, cutoffs)
+            if new_row is not None:
+                self._add(new_row, 1, cutoffs)
+            if now - self._last_prune >= 60:
+                self._prune(cutoffs)
+                self._last_prune = now
+
+    def _cutoffs(self, now: float) -> Dict[str, Optional[float]]:
+        """Oldest bucket start kept per resolution"""
+        return {name: (now - keep if keep is not None else None) for name, keep in self.retention.items()}
+
+    def _add(self, row: Dict, sign: int, cutoffs: Dict[str, Optional[float]]) -> None:
+        start_time = row.get('start_time_unix_secs') or 0
+        for name, width in RESOLUTIONS.items():
+            bucket_start = start_time - start_time % width
+            cutoff = cutoffs[name]
+            if cutoff is not None and bucket_start + width <= cutoff:
+                continue
+            buckets = self._buckets[name]
+            bucket = buckets.get(bucket_start)
+            if bucket is None:
+                bucket = buckets[bucket_start] = Bucket()
+            bucket.add(row, sign)
+            if bucket.calls == 0:
+                del buckets[bucket_start]
+
+    def _prune(self, cutoffs: Dict[str, Optional[float]]) -> None:
+        for name, width in RESOLUTIONS.items():
+            cutoff = cutoffs[name]
+            if cutoff is None:
+                continue
+            buckets = self._buckets[name]
+            for bucket_start in [start for start in buckets if start + width <= cutoff]:
+                del buckets[bucket_start]
+
+    def choose_resolution(self, start: int, end: int, now: Optional[float] = None) -> str:
+        """Finest resolution that still covers start and needs at most TARGET_BUCKETS buckets"""
+        cutoffs = self._cutoffs(now if now is not None else time.time())
+        for name, width in RESOLUTIONS.items():
+            cutoff = cutoffs[name]
+            if (cutoff is None or start >= cutoff) and math.ceil((end - start) / width) <= TARGET_BUCKETS:
+                return name
+        return 'day'
+
+    def timeseries(self, start: int, end: int, resolution: Optional[str] = None) -> Dict:
+        """
+        Aggregates per bucket for calls started in [start, end), plus the whole window
+
+        Args:
+            start: Window start (Unix seconds), rounded down to a bucket boundary
+            end: Window end (Unix seconds, exclusive)
+            resolution: 'minute', 'hour' or 'day'; None picks one (see choose_resolution)
+
+        Returns:
+            Dictionary with resolution, bucket_seconds, start, end, buckets (one per
+            bucket in the window, empty ones included) and summary (the whole window,
+            with percentiles from the merged sketches)
+
+        Raises:
+            ValueError: for an unknown resolution or a window needing more than MAX_BUCKETS buckets
+        """
+        if end <= start:
+            raise ValueError("end must be after start")
+        if resolution is None:
+            resolution = self.choose_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        width = RESOLUTIONS[resolution]
+        first = start - start % width
+        bucket_starts = range(first, end, width)
+        if len(bucket_starts) > MAX_BUCKETS:
+            raise ValueError(f"Window needs {len(bucket_starts)} {resolution} buckets; at most {MAX_BUCKETS} are returned")
+
+        points: List[Tuple[int, Dict]] = []
+        summary = Bucket()
+        with self._lock:
+            buckets = self._buckets[resolution]
+            # Walk whichever is smaller: the window's bucket range or the stored buckets
+            if len(buckets) < len(bucket_starts):
+                present = {bucket_start: bucket for bucket_start, bucket in buckets.items() if first <= bucket_start < end}
+            else:
+                present = {bucket_start: buckets[bucket_start] for bucket_start in bucket_starts if bucket_start in buckets}
+            empty = Bucket().to_dict()
+            for bucket_start in bucket_starts:
+                bucket = present.get(bucket_start)
+                if bucket is None:
+                    points.append((bucket_start, empty))
+                    continue
+                summary.merge(bucket)
+                points.append((bucket_start, bucket.to_dict()))
+
+        return {
+            "resolution": resolution,
+            "bucket_seconds": width,
+            "start": first,
+            "end": end,
+            "buckets": [{"start": bucket_start, **values} for bucket_start, values in points],
+            "summary": summary.to_dict()
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {name: len(buckets) for name, buckets in self._buckets.items()}
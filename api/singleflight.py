@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Request coalescing (single-flight) for asyncio
+
+Concurrent callers asking for the same key share one in-flight call and all
+receive its result (or its exception), so a burst of identical requests costs a
+single upstream round-trip.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key"""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() for key unless a call for key is already in flight, in which case wait for that one
+
+        The shared call runs in its own task, so a caller that gets cancelled does not
+        cancel the call for everybody else waiting on it.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight)
+        }
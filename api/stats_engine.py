@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Incremental conversation statistics
+
+Keeps the /api/stats totals (calls, successful calls, duration, messages) as
+running sums, overall and broken down by agent, status, direction and location.
+The store reports every change to a conversation row as an (old row, new row)
+pair, which is undone and redone on the sums, so a call moving from in-progress
+to done is moved between status buckets instead of being counted twice. Reads
+never touch the database.
+"""
+
+import threading
+from typing import Dict, Iterable, Optional
+
+# Breakdown name -> conversations column it groups by
+DIMENSIONS = {
+    'agent': 'agent_name',
+    'status': 'status',
+    'direction': 'direction',
+    'location': 'location',
+}
+
+# Bucket for rows with no value in a breakdown column
+UNKNOWN_KEY = 'unknown'
+
+class Aggregate:
+    """Running totals over a set of conversations"""
+
+    __slots__ = ('conversations', 'successful_calls', 'duration_seconds', 'messages')
+
+    def __init__(self):
+        self.conversations = 0
+        self.successful_calls = 0
+        self.duration_seconds = 0
+        self.messages = 0
+
+    def add(self, row: Dict, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) one conversation row"""
+        self.conversations += sign
+        self.successful_calls += sign * (1 if row.get('call_successful') else 0)
+        self.duration_seconds += sign * (row.get('call_duration_secs') or 0)
+        self.messages += sign * (row.get('message_count') or 0)
+
+    def to_dict(self) -> Dict:
+        count = self.conversations
+        return {
+            "total_conversations": count,
+            "successful_calls": self.successful_calls,
+            "success_rate": (self.successful_calls / count * 100) if count > 0 else 0,
+            "total_duration_seconds": self.duration_seconds,
+            "total_messages": self.messages,
+            "average_duration_seconds": self.duration_seconds / count if count > 0 else 0,
+            "average_messages_per_conversation": self.messages / count if count > 0 else 0
+        }
+
+class StatsEngine:
+    """Overall and per-dimension aggregates, updated from store change notifications"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = Aggregate()
+        self.breakdowns: Dict[str, Dict[str, Aggregate]] = {name: {} for name in DIMENSIONS}
+        self._snapshot: Optional[Dict] = None
+
+    def attach(self, store) -> None:
+        """Build the aggregates from everything in store and follow its changes from then on"""
+        store.add_listener(self.apply, initialize=self.rebuild)
+
+    def rebuild(self, rows: Iterable[Dict]) -> None:
+        """Replace the aggregates with ones computed from rows"""
+        with self._lock:
+            self.totals = Aggregate()
+            self.breakdowns = {name: {} for name in DIMENSIONS}
+            for row in rows:
+                self._add(row, 1)
+            self._snapshot = None
+
+    def apply(self, old_row: Optional[Dict], new_row: Optional[Dict]) -> None:
+        """Account for one conversation row changing from old_row to new_row (None for absent)"""
+        with self._lock:
+            if old_row is not None:
+                self._add(old_row, -1)
+            if new_row is not None:
+                self._add(new_row, 1)
+            self._snapshot = None
+
+    def _add(self, row: Dict, sign: int) -> None:
+        self.totals.add(row, sign)
+        for name, column in DIMENSIONS.items():
+            buckets = self.breakdowns[name]
+            key = row.get(column) or UNKNOWN_KEY
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = Aggregate()
+            bucket.add(row, sign)
+            if bucket.conversations == 0:
+                del buckets[key]
+
+    def snapshot(self) -> Dict:
+        """Totals plus breakdowns; cached until the next change"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = {
+                    **self.totals.to_dict(),
+                    "breakdowns": {
+                        name: {key: bucket.to_dict() for key, bucket in sorted(buckets.items())}
+                        for name, buckets in self.breakdowns.items()
+                    }
+                }
+            return self._snapshot
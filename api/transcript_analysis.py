@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Transcript analysis
+
+Derives the list-view fields (summary, outcome, sentiment, rating and tags) from a
+conversation transcript. The ingestor runs this once when a conversation's details
+are stored, and the API serves the stored results. Keyword rules live in
+keyword_classifier.py.
+"""
+
+import random
+from typing import Dict, List, Optional
+from keyword_classifier import KeywordClassifier, load_rules
+
+# Bump whenever the analysis logic below changes; stored analyses from other versions are recomputed
+ANALYSIS_VERSION = 2
+
+_classifier: Optional[KeywordClassifier] = None
+
+def get_classifier() -> KeywordClassifier:
+    """Classifier for the configured rule set, built on first use"""
+    global _classifier
+    if _classifier is None:
+        _classifier = KeywordClassifier(load_rules())
+    return _classifier
+
+def analysis_version() -> int:
+    """Version stored with each analysis; changes with ANALYSIS_VERSION or the rule set"""
+    return (ANALYSIS_VERSION << 32) | get_classifier().fingerprint
+
+def analyze_transcript(transcript: Optional[List[Dict]]) -> Dict:
+    """
+    Analyze a transcript
+
+    Args:
+        transcript: List of transcript messages (dicts with a 'message' key)
+
+    Returns:
+        Dictionary with version, summary, outcome, sentiment, rating and tags. All
+        fields except version are empty when there is no transcript.
+    """
+    analysis = {
+        'version': analysis_version(),
+        'summary': None,
+        'outcome': None,
+        'sentiment': None,
+        'rating': None,
+        'tags': []
+    }
+    if not transcript:
+        return analysis
+
+    # Generate a simple summary from the first few messages
+    messages = [msg.get('message', '') or '' for msg in transcript[:3]]
+    analysis['summary'] = " ".join(messages)[:100] + "..." if messages and any(messages) else None
+
+    # Outcome, sentiment and tags from a single keyword scan of the whole conversation
+    full_text = " ".join([msg.get('message', '') or '' for msg in transcript])
+    classification = get_classifier().classify(full_text)
+    analysis['outcome'] = classification['outcome']
+    analysis['sentiment'] = classification['sentiment']
+    analysis['tags'] = classification['tags']
+
+    # Generate a random rating (in real implementation, this would come from actual data)
+    analysis['rating'] = round(random.uniform(3.5, 5.0), 1)
+
+    return analysis
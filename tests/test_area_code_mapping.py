@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from area_code_mapping import MAX_DIGITS, PrefixTable, get_prefix_table, international_digits
+
+def naive_lookup(entries, digits):
+    """Longest prefix of digits among entries by brute force (later duplicates win)"""
+    best = None
+    for prefix, location in entries:
+        if digits.startswith(prefix) and (best is None or len(prefix) >= len(best[0])):
+            best = (prefix, location)
+    return best[1] if best else None
+
+def random_digits(rng, max_length):
+    return ''.join(rng.choice('0123456789') for _ in range(rng.randint(1, max_length)))
+
+@pytest.mark.parametrize('seed', range(20))
+def test_prefix_table_matches_naive_longest_prefix(seed):
+    rng = random.Random(seed)
+    # Few distinct digits so prefixes nest often, plus zeros that packing pads with
+    alphabet = '0120' if seed % 2 else '0123456789'
+    entries = [
+        (''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))), f"L{i}")
+        for i in range(rng.randint(1, 200))
+    ]
+    table = PrefixTable(entries)
+    for _ in range(500):
+        digits = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, MAX_DIGITS)))
+        assert table.lookup(digits) == naive_lookup(entries, digits), digits
+
+def test_prefix_table_trailing_zeros_are_distinct_prefixes():
+    table = PrefixTable([('1', 'one'), ('10', 'ten'), ('100', 'hundred')])
+    assert table.lookup('1') == 'one'
+    assert table.lookup('10') == 'ten'
+    assert table.lookup('1000') == 'hundred'
+    assert table.lookup('1099') == 'ten'
+    assert table.lookup('19') == 'one'
+    assert table.lookup('2') is None
+
+def test_prefix_table_full_length_prefixes():
+    rng = random.Random(7)
+    entries = [(random_digits(rng, MAX_DIGITS), str(i)) for i in range(300)]
+    table = PrefixTable(entries)
+    for prefix, _ in entries:
+        assert table.lookup(prefix) == naive_lookup(entries, prefix)
+
+def test_prefix_table_rejects_bad_input():
+    with pytest.raises(ValueError):
+        PrefixTable([('12a', 'x')])
+    with pytest.raises(ValueError):
+        PrefixTable([('1' * (MAX_DIGITS + 1), 'x')])
+    table = PrefixTable([('1', 'x')])
+    assert table.lookup('') is None
+    assert table.lookup('1' * (MAX_DIGITS + 1)) is None
+
+def test_bundled_prefix_file():
+    table = get_prefix_table()
+    assert len(table) > 0
+    assert table.lookup('1408') == 'San Jose, CA'
+
+@pytest.mark.parametrize('raw, digits', [
+    ('+44 7911 123456', '447911123456'),
+    ('0044 7911 123456', '447911123456'),
+    ('011 44 7911 123456', '447911123456'),
+    ('(408) 555-0123', '14085550123'),
+    ('1-408-555-0123', '14085550123'),
+    ('555-0123', None),
+])
+def test_international_digits(raw, digits):
+    assert international_digits(raw) == digits
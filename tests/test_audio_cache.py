@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+from audio_cache import AudioCache
+
+RECORDING = b''.join(bytes([i]) * 1000 for i in range(10))
+
+async def chunks():
+    for start in range(0, len(RECORDING), 1000):
+        await asyncio.sleep(0)
+        yield RECORDING[start:start + 1000]
+
+def test_tee_keeps_a_complete_stream(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10 ** 6)
+
+    async def stream():
+        tee = cache.tee('c1', 'audio/mpeg', chunks(), len(RECORDING))
+        # Seen as filling before the first byte, without touching the disk yet
+        assert cache.is_filling('c1')
+        assert os.listdir(cache.tmp_dir) == []
+        body = b''.join([chunk async for chunk in tee])
+        await tee.aclose()
+        return body
+
+    assert asyncio.run(stream()) == RECORDING
+    entry = cache.get('c1')
+    assert entry.size_bytes == len(RECORDING) and not cache.is_filling('c1')
+    with open(entry.path, 'rb') as f:
+        assert f.read() == RECORDING
+
+def test_tee_discards_unread_and_partial_streams(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10 ** 6)
+
+    async def stream():
+        unread = cache.tee('c1', 'audio/mpeg', chunks(), len(RECORDING))
+        await unread.aclose()
+        partial = cache.tee('c2', 'audio/mpeg', chunks(), len(RECORDING))
+        await partial.__aiter__().__anext__()
+        await partial.aclose()
+
+    asyncio.run(stream())
+    assert cache.peek('c1') is None and cache.peek('c2') is None
+    assert not cache.is_filling('c1') and not cache.is_filling('c2')
+    assert os.listdir(cache.tmp_dir) == []
+
+def test_drain_finishes_a_partly_read_stream(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10 ** 6)
+
+    async def stream():
+        tee = cache.tee('c1', 'audio/mpeg', chunks(), len(RECORDING))
+        await tee.__aiter__().__anext__()
+        await tee.drain()
+        await tee.aclose()
+
+    asyncio.run(stream())
+    assert cache.peek('c1').size_bytes == len(RECORDING)
+
+def test_get_drops_entries_whose_file_is_gone(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10 ** 6)
+    entry = cache.put('c1', 'audio/mpeg', RECORDING)
+    os.remove(entry.path)
+    assert cache.get('c1') is None
+    assert cache.peek('c1') is None
@@ -0,0 +1,94 @@
+import pytest
+
+from conversation_store import ConversationStore, InvalidCursor, encode_cursor
+from query_language import parse_query
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(str(tmp_path / 'conversations.db'))
+    # Repeated start times make the conversation ID the tie-breaker
+    store.upsert_summaries([
+        {'conversation_id': f"c{i:03d}", 'start_time_unix_secs': 1000 + i // 3, 'agent_name': 'Agent', 'status': 'done'}
+        for i in range(50)
+    ])
+    return store
+
+def page_ids(rows):
+    return [summary['conversation_id'] for summary, _, _ in rows]
+
+def save_transcript(store, conversation_id, text):
+    store.save_details(conversation_id, {
+        'conversation_id': conversation_id,
+        'transcript': [{'role': 'user', 'message': text, 'time_in_call_secs': 1}]
+    })
+
+def test_search_snippets_escape_transcript_text(store):
+    save_transcript(store, 'c000', 'hi <script>alert(1)</script> I need a refund & more')
+    hits, total = store.search_messages('refund')
+    assert total == 1
+    assert hits[0]['snippet'] == 'hi &lt;script&gt;alert(1)&lt;/script&gt; I need a <mark>refund</mark> &amp; more'
+
+def test_negated_words_exclude_conversations(store):
+    save_transcript(store, 'c000', 'I want a refund')
+    save_transcript(store, 'c001', 'billing question')
+    save_transcript(store, 'c002', 'refund for billing')
+    with_details = parse_query('messages>0 -refund')
+    assert page_ids(store.list_conversations(query=with_details, limit=50)[0]) == ['c001']
+    assert page_ids(store.list_conversations(query=parse_query('billing -refund'), limit=50)[0]) == ['c001']
+    excluded_phrase = parse_query('messages>0 -"billing question"')
+    assert sorted(page_ids(store.list_conversations(query=excluded_phrase, limit=50)[0])) == ['c000', 'c002']
+
+def test_negated_field_keeps_rows_without_a_value(store):
+    # Locations come from the caller number; the other conversations have none
+    store.upsert_summaries([
+        {'conversation_id': conversation_id, 'start_time_unix_secs': 1000, 'agent_name': 'Agent', 'status': 'done',
+         'metadata': {'phone_call': {'direction': 'inbound', 'external_number': number}}}
+        for conversation_id, number in (('c000', '+14085550123'), ('c001', '+16175550123'))
+    ])
+    rows, total, _ = store.list_conversations(query=parse_query('-location:"San Jose, CA"'), limit=50)
+    assert total == 49
+    assert 'c000' not in page_ids(rows)
+    assert 'c001' in page_ids(rows)
+
+def test_cursor_pages_cover_every_row_once(store):
+    seen = []
+    cursor = None
+    while True:
+        rows, total, cursor = store.list_conversations(limit=7, cursor=cursor)
+        seen.extend(page_ids(rows))
+        if cursor is None:
+            break
+    assert total == 50
+    assert seen == page_ids(store.list_conversations(limit=50)[0])
+    assert len(set(seen)) == 50
+
+def test_cursor_pages_with_query_sort(store):
+    query = parse_query('sort:conversation_id')
+    seen = []
+    cursor = None
+    while True:
+        rows, _, cursor = store.list_conversations(query=query, limit=9, cursor=cursor)
+        seen.extend(page_ids(rows))
+        if cursor is None:
+            break
+    assert seen == [f"c{i:03d}" for i in range(50)]
+
+def test_cursor_for_another_sort_order_is_rejected(store):
+    _, _, cursor = store.list_conversations(limit=5)
+    with pytest.raises(InvalidCursor):
+        store.list_conversations(query=parse_query('sort:duration'), limit=5, cursor=cursor)
+    with pytest.raises(InvalidCursor):
+        store.list_conversations(limit=5, cursor='not a cursor')
+    with pytest.raises(InvalidCursor):
+        store.list_conversations(limit=5, cursor=encode_cursor({'v': 1}))
+
+def test_get_analyses_matches_get_analysis(store):
+    store.save_details('c000', {'conversation_id': 'c000', 'transcript': []}, {
+        'summary': 'Caller booked an appointment', 'outcome': 'Appointment Scheduled', 'sentiment': 'Positive',
+        'rating': 4.5, 'tags': ['#appointment'], 'version': 3
+    })
+    ids = ['c000', 'c001', 'missing']
+    analyses = store.get_analyses(ids)
+    assert set(analyses) == {'c000', 'c001'}
+    assert analyses == {conversation_id: store.get_analysis(conversation_id) for conversation_id in ('c000', 'c001')}
+    assert analyses['c000']['outcome'] == 'Appointment Scheduled'
@@ -0,0 +1,25 @@
+import time
+
+from geolocation_enrichment import RateLimiter
+
+def test_per_day_limiter_starts_full_without_saved_state():
+    limiter = RateLimiter.per_day(3)
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_per_day_limiter_restores_saved_tokens():
+    limiter = RateLimiter.per_day(3)
+    limiter.try_acquire()
+    limiter.try_acquire()
+    restored = RateLimiter.per_day(3, saved=limiter.saved_state())
+    assert [restored.try_acquire() for _ in range(2)] == [True, False]
+
+def test_per_day_limiter_refills_for_time_spent_down():
+    half_a_day_ago = {'tokens': 0, 'at': time.time() - 43200}
+    restored = RateLimiter.per_day(4, saved=half_a_day_ago)
+    assert [restored.try_acquire() for _ in range(3)] == [True, True, False]
+    a_week_ago = {'tokens': 0, 'at': time.time() - 7 * 86400}
+    assert RateLimiter.per_day(4, saved=a_week_ago).saved_state()['tokens'] == 4
+
+def test_per_day_limiter_ignores_malformed_saved_state():
+    limiter = RateLimiter.per_day(2, saved={'tokens': 'x'})
+    assert [limiter.try_acquire() for _ in range(3)] == [True, True, False]
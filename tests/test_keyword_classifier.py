@@ -0,0 +1,25 @@
+import random
+
+import pytest
+
+from keyword_classifier import KeywordMatcher
+
+@pytest.mark.parametrize('seed', range(20))
+def test_keyword_matcher_matches_substring_test(seed):
+    rng = random.Random(seed)
+    # A small alphabet makes keywords overlap, nest and share prefixes
+    alphabet = 'ab.' if seed % 2 else 'abc '
+    keywords = {''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 30))}
+    matcher = KeywordMatcher(keywords)
+    for _ in range(200):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert matcher.find_all(text) == {keyword for keyword in keywords if keyword in text}, text
+
+def test_keyword_matcher_overlapping_and_nested_keywords():
+    matcher = KeywordMatcher(['appointment', 'appoint', 'point', 'dr.', 'Doctor'])
+    assert matcher.find_all('please book an appointment') == {'appointment', 'appoint', 'point'}
+    assert matcher.find_all('see dr. smith, the doctor') == {'dr.', 'doctor'}
+    assert matcher.find_all('drive') == set()
+
+def test_keyword_matcher_without_keywords():
+    assert KeywordMatcher(['']).find_all('anything') == set()
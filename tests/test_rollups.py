@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from rollups import DDSketch
+
+def true_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_ddsketch_quantiles_within_relative_accuracy(seed):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(4, 1.5) for _ in range(5000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.0, 0.25, 0.5, 0.95, 0.99, 1.0):
+        expected = true_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected + 1e-9
+
+def test_ddsketch_merge_and_removal():
+    rng = random.Random(1)
+    first, second = DDSketch(), DDSketch()
+    combined = DDSketch()
+    for _ in range(1000):
+        value = rng.randint(0, 600)
+        (first if rng.random() < 0.5 else second).add(value)
+        combined.add(value)
+    first.merge(second)
+    assert (first.bins, first.zero_count, first.count) == (combined.bins, combined.zero_count, combined.count)
+
+    sketch = DDSketch()
+    sketch.add(10)
+    sketch.add(0)
+    sketch.add(10, -1)
+    sketch.add(0, -1)
+    assert sketch.bins == {} and sketch.count == 0 and sketch.quantile(0.5) is None